@@ -0,0 +1,166 @@
+import base64
+import secrets
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Optional
+
+# 이 자릿수까지는 비트맵 + free-list, 그보다 크면 사용 중인 번호만 set 으로 들고 무작위로 찾는다
+BITMAP_MAX_WIDTH = 8
+MAX_WIDTH = 12
+
+
+class _Space:
+    # 같은 자릿수의 번호 공간 [10^(w-1), 10^w). offset = 번호 - lo
+    def __init__(self, width: int):
+        self.width = width
+        self.lo = 10 ** (width - 1)
+        self.size = 10 ** width - self.lo
+        self.used = 0
+        self.dense = width <= BITMAP_MAX_WIDTH
+        self.bitmap = bytearray((self.size + 7) // 8) if self.dense else None
+        self.taken = set() if not self.dense else None
+        self._free: Optional[array] = None
+
+    def contains(self, offset: int) -> bool:
+        if self.dense:
+            return bool(self.bitmap[offset >> 3] & (1 << (offset & 7)))
+        return offset in self.taken
+
+    def mark(self, offset: int) -> bool:
+        if self.contains(offset):
+            return False
+        if self.dense:
+            self.bitmap[offset >> 3] |= 1 << (offset & 7)
+        else:
+            self.taken.add(offset)
+        self.used += 1
+        return True
+
+    def clear(self, offset: int) -> bool:
+        if not self.contains(offset):
+            return False
+        if self.dense:
+            self.bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+            if self._free is not None:
+                self._free.append(offset)
+        else:
+            self.taken.discard(offset)
+        self.used -= 1
+        return True
+
+    def _build_free(self):
+        # 절반을 넘긴 뒤 처음 한 번만 O(공간 크기). 이후 할당은 free-list 에서 무작위 위치를 뽑아 끝과 바꿔 pop 하므로 O(1)
+        self._free = array("I" if self.size < 2 ** 32 else "Q",
+                           (i for i in range(self.size) if not self.contains(i)))
+
+    def take(self) -> Optional[int]:
+        if self.used >= self.size:
+            return None
+        if not self.dense or self.used * 2 < self.size:
+            # 절반 이하로 찼으면 무작위로 찍어도 평균 2번 안에 빈 번호가 나온다
+            while True:
+                offset = secrets.randbelow(self.size)
+                if self.mark(offset):
+                    return offset
+        if self._free is None:
+            self._build_free()
+        free = self._free
+        while free:
+            i = secrets.randbelow(len(free))
+            offset = free[i]
+            free[i] = free[-1]
+            free.pop()
+            # 나중에 reserve 된 번호가 free-list 에 남아 있을 수 있어서 한 번 더 확인
+            if self.mark(offset):
+                return offset
+        return None
+
+    def dump(self) -> Dict[str, Any]:
+        if self.dense:
+            return {"used": self.used, "bitmap": base64.b64encode(zlib.compress(bytes(self.bitmap))).decode("ascii")}
+        return {"used": self.used, "numbers": sorted(self.taken)}
+
+    def load(self, data: Dict[str, Any]):
+        if self.dense and data.get("bitmap"):
+            raw = zlib.decompress(base64.b64decode(data["bitmap"]))
+            if len(raw) == len(self.bitmap):
+                self.bitmap[:] = raw
+                self.used = sum(bin(b).count("1") for b in raw)
+        elif not self.dense:
+            self.taken = {int(x) for x in data.get("numbers", [])}
+            self.used = len(self.taken)
+        self._free = None
+
+
+class AccountAllocator:
+    # 계좌번호 할당기. 현재 자릿수 공간이 max_load 만큼 차면 한 자리 늘려서 계속 발급한다
+    # (기존 4자리 번호는 그대로 두고 새 번호만 5자리부터 나감)
+    def __init__(self, width: int = 4, max_load: float = 0.9):
+        self.min_width = max(1, min(int(width), MAX_WIDTH))
+        self.width = self.min_width
+        self.max_load = min(max(float(max_load), 0.1), 1.0)
+        self.spaces: Dict[int, _Space] = {}
+        self.dirty = False
+
+    def _space(self, width: int) -> _Space:
+        space = self.spaces.get(width)
+        if space is None:
+            space = self.spaces[width] = _Space(width)
+        return space
+
+    @staticmethod
+    def _split(number: Any) -> Optional[tuple]:
+        s = str(number)
+        if not s.isdigit() or s[0] == "0" or len(s) > MAX_WIDTH:
+            return None
+        return len(s), int(s) - 10 ** (len(s) - 1)
+
+    def reserve_existing(self, numbers: Iterable[Any]) -> int:
+        # 원장에 이미 있는 번호를 사용 중으로 표시 (저장된 비트맵과 원장이 어긋나도 원장이 우선)
+        added = 0
+        for number in numbers:
+            parts = self._split(number)
+            if parts and self._space(parts[0]).mark(parts[1]):
+                added += 1
+        if added:
+            self.dirty = True
+        return added
+
+    def allocate(self) -> str:
+        while self.width <= MAX_WIDTH:
+            space = self._space(self.width)
+            if space.used < space.size * self.max_load:
+                offset = space.take()
+                if offset is not None:
+                    self.dirty = True
+                    return str(space.lo + offset)
+            self.width += 1
+            self.dirty = True
+        raise RuntimeError("account number space exhausted")
+
+    def release(self, number: Any):
+        parts = self._split(number)
+        if parts and parts[0] in self.spaces and self.spaces[parts[0]].clear(parts[1]):
+            self.dirty = True
+
+    def is_used(self, number: Any) -> bool:
+        parts = self._split(number)
+        return bool(parts and parts[0] in self.spaces and self.spaces[parts[0]].contains(parts[1]))
+
+    def load(self, state: Optional[Dict[str, Any]]):
+        state = state or {}
+        self.width = max(self.min_width, min(int(state.get("width", self.min_width)), MAX_WIDTH))
+        for key, data in (state.get("spaces") or {}).items():
+            if str(key).isdigit() and 1 <= int(key) <= MAX_WIDTH:
+                self._space(int(key)).load(data)
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return {"width": self.width, "spaces": {str(w): s.dump() for w, s in sorted(self.spaces.items())}}
+
+    def stats(self) -> Dict[str, Any]:
+        space = self._space(self.width)
+        return {"width": self.width, "used": space.used, "capacity": int(space.size * self.max_load),
+                "total_used": sum(s.used for s in self.spaces.values())}
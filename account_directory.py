@@ -0,0 +1,174 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+SORTS = ("account", "balance", "name")
+# 한 번에 이만큼 넘게 바뀌면(일괄 징수 등) 정렬 목록을 하나씩 고치지 않고 다음 조회 때 다시 정렬한다
+BULK_REBUILD = 256
+
+
+class AccountRow(NamedTuple):
+    account: str
+    uid: str
+    name: str
+    balance: int
+    public: bool
+
+
+def _sort_key(sort: str, row: AccountRow) -> Tuple:
+    if sort == "balance":
+        return (-row.balance, row.account)
+    if sort == "name":
+        return (row.name.casefold(), row.account)
+    return (int(row.account) if row.account.isdigit() else float("inf"), row.account)
+
+
+class AccountPage(NamedTuple):
+    rows: List[AccountRow]
+    page: int
+    pages: int
+    matched: int
+    balance_total: int
+
+
+class AccountDirectory:
+    # /계좌목록 용 계좌 색인. 계좌 -> 행, 정렬 기준별 정렬 목록, 총 잔액을 원장 변경 때마다 고쳐 둔다
+    # 정렬 목록은 처음 조회할 때 만들고, 잔액이 바뀌면 잔액순 목록만 bisect 로 빼고 다시 넣는다
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.rows: Dict[str, AccountRow] = {}
+        self.total = 0
+        self.public_total = 0
+        self.public_count = 0
+        self.version = 0
+        self.rebuilds = 0
+        self._sorted: Dict[str, List[Tuple]] = {}
+        self._views: Dict[Tuple, Tuple[List[Tuple], int]] = {}
+        ledger.subscribe(self.on_change)
+        self.rebuild()
+
+    def _row(self, account: str) -> Optional[AccountRow]:
+        uid = self.ledger.uid_for_account(account)
+        data = self.ledger.data.get("users", {}).get(uid) if uid is not None else None
+        if not isinstance(data, dict):
+            return None
+        try:
+            balance = int(data.get("잔액", 0))
+        except Exception:
+            balance = 0
+        public = bool(data.get("공용계좌")) or self.ledger.public_name_for_account(account) is not None
+        return AccountRow(account, uid, str(data.get("이름", "?")), balance, public)
+
+    def _count(self, row: AccountRow, sign: int):
+        self.total += sign * row.balance
+        if row.public:
+            self.public_total += sign * row.balance
+            self.public_count += sign
+
+    def rebuild(self):
+        self.rows = {}
+        self.total = self.public_total = self.public_count = 0
+        for account in self.ledger.uid_by_account:
+            row = self._row(account)
+            if row is not None:
+                self.rows[account] = row
+                self._count(row, 1)
+        self._sorted = {}
+        self._views = {}
+        self.version += 1
+        self.rebuilds += 1
+
+    def on_change(self, accounts: Optional[Iterable[str]]):
+        # accounts=None 이면 원장 전체가 교체된 것
+        if accounts is None:
+            self.rebuild()
+            return
+        accounts = set(accounts)
+        if len(accounts) > BULK_REBUILD:
+            self._sorted = {}
+        for account in accounts:
+            self.update(account)
+
+    def update(self, account: str):
+        account = str(account)
+        old = self.rows.get(account)
+        new = self._row(account)
+        if old == new:
+            return
+        if old is not None:
+            self._count(old, -1)
+        if new is not None:
+            self._count(new, 1)
+            self.rows[account] = new
+        else:
+            self.rows.pop(account, None)
+        for sort, keys in self._sorted.items():
+            old_key = _sort_key(sort, old) if old is not None else None
+            new_key = _sort_key(sort, new) if new is not None else None
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                i = bisect_left(keys, old_key)
+                if i < len(keys) and keys[i] == old_key:
+                    del keys[i]
+            if new_key is not None:
+                insort(keys, new_key)
+        self.version += 1
+        self._views = {}
+
+    def _keys(self, sort: str) -> List[Tuple]:
+        keys = self._sorted.get(sort)
+        if keys is None:
+            keys = self._sorted[sort] = sorted(_sort_key(sort, row) for row in self.rows.values())
+        return keys
+
+    def _view(self, sort: str, frozen: Optional[FrozenSet[str]], public_only: bool,
+              min_balance: Optional[int], max_balance: Optional[int]) -> Tuple[List[Tuple], int]:
+        # 필터 결과는 원장이 바뀌기 전까지 재사용하므로 다음 페이지는 슬라이스 비용만 든다
+        cache_key = (sort, frozen, public_only, min_balance, max_balance)
+        hit = self._views.get(cache_key)
+        if hit is not None:
+            return hit
+        if frozen is not None or public_only:
+            # 동결/공용 계좌는 소수라서 후보만 모아서 정렬한다
+            candidates = frozen if frozen is not None else (a for a, r in self.rows.items() if r.public)
+            rows = [self.rows[a] for a in candidates if a in self.rows]
+            if public_only:
+                rows = [r for r in rows if r.public]
+            keys = sorted(_sort_key(sort, r) for r in rows
+                          if (min_balance is None or r.balance >= min_balance)
+                          and (max_balance is None or r.balance <= max_balance))
+        elif sort == "balance":
+            # 잔액순 목록은 (-잔액, 계좌) 순이라 범위를 bisect 로 바로 자른다
+            keys = self._keys(sort)
+            lo = 0 if max_balance is None else bisect_left(keys, (-max_balance,))
+            hi = len(keys) if min_balance is None else bisect_right(keys, (-min_balance, "￿"))
+            keys = keys[lo:hi]
+        else:
+            keys = [k for k in self._keys(sort)
+                    if (min_balance is None or self.rows[k[-1]].balance >= min_balance)
+                    and (max_balance is None or self.rows[k[-1]].balance <= max_balance)]
+        total = sum(self.rows[k[-1]].balance for k in keys)
+        if len(self._views) >= 16:
+            self._views.clear()
+        self._views[cache_key] = (keys, total)
+        return keys, total
+
+    def page(self, page: int = 0, size: int = 20, sort: str = "account",
+             frozen: Optional[FrozenSet[str]] = None, public_only: bool = False,
+             min_balance: Optional[int] = None, max_balance: Optional[int] = None) -> AccountPage:
+        if sort not in SORTS:
+            raise ValueError(f"unknown sort {sort}")
+        size = max(1, int(size))
+        if frozen is None and not public_only and min_balance is None and max_balance is None:
+            keys, total = self._keys(sort), self.total
+        else:
+            keys, total = self._view(sort, frozen, public_only, min_balance, max_balance)
+        pages = max(1, (len(keys) + size - 1) // size)
+        page = min(max(0, int(page)), pages - 1)
+        rows = [self.rows[k[-1]] for k in keys[page * size:(page + 1) * size]]
+        return AccountPage(rows, page, pages, len(keys), total)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"accounts": len(self.rows), "total": self.total, "public": self.public_count,
+                "public_total": self.public_total, "sorted": sorted(self._sorted), "views": len(self._views),
+                "version": self.version, "rebuilds": self.rebuilds}
@@ -0,0 +1 @@
+# 합성 데이터 + 가짜 Interaction 으로 bot.py 의 주요 명령/API 경로를 재는 벤치마크 (python -m bench)
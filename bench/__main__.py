@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bench.runner import REPO_ROOT
+
+# python -m bench [--scale 1k 10k 100k] [--out 파일] [--compare 이전결과.json]
+# 규모마다 별도 프로세스(bench.runner)에서 가짜 데이터 생성 -> 봇 기동 -> 명령/API 호출을 재고, 결과를 JSON 하나로 모은다
+SCALES = {
+    "1k": (1_000, 10_000),
+    "10k": (10_000, 100_000),
+    "100k": (100_000, 1_000_000),
+}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_scenario(name: str, accounts: int, transactions: int, args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix=f"ssibal-bench-{name}-")
+    out = os.path.join(workdir, "result.json")
+    cmd = [sys.executable, "-m", "bench.runner", "--dir", os.path.join(workdir, "data"),
+           "--accounts", str(accounts), "--transactions", str(transactions),
+           "--iterations", str(args.iterations), "--heavy-iterations", str(args.heavy_iterations),
+           "--concurrency", str(args.concurrency), "--export-format", args.export_format,
+           "--seed", str(args.seed), "--out", out]
+    if args.only:
+        cmd += ["--only", *args.only]
+    print(f"[bench] {name}: {accounts:,} accounts / {transactions:,} transactions ({workdir})", file=sys.stderr)
+    try:
+        # 봇이 찍는 로그는 버리고 결과 파일만 읽는다 (진행 상황은 stderr)
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL if not args.verbose else None)
+        if proc.returncode != 0 or not os.path.exists(out):
+            return {"name": name, "accounts": accounts, "transactions": transactions, "failed": proc.returncode}
+        with open(out, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        result["name"] = name
+        return result
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None):
+    base = {s.get("name"): s for s in (baseline or {}).get("scenarios", [])}
+    for scenario in results:
+        if scenario.get("failed") is not None:
+            print(f"\n== {scenario['name']}: failed (exit {scenario['failed']})")
+            continue
+        print(f"\n== {scenario['name']} ({scenario['accounts']:,} accounts / {scenario['transactions']:,} tx) "
+              f"startup {scenario['startup_s']}s · flush {scenario['flush_s']}s")
+        print(f"{'op':<22}{'ok/n':>10}{'ops/s':>10}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'ack p95':>10}  vs base p95")
+        old_ops = (base.get(scenario["name"]) or {}).get("ops", {})
+        for op, r in scenario["ops"].items():
+            if "latency_ms" not in r:
+                print(f"{op:<22}{r.get('skipped', '-')}")
+                continue
+            lat = r["latency_ms"] or {}
+            ack = r["ack_ms"] or {}
+            delta = ""
+            old = ((old_ops.get(op) or {}).get("latency_ms") or {}).get("p95")
+            if old and lat.get("p95") is not None:
+                delta = f"{(lat['p95'] - old) / old * 100:+.1f}%"
+            print(f"{op:<22}{str(r['ok']) + '/' + str(r['count']):>10}{r['throughput_per_s'] or 0:>10}"
+                  f"{lat.get('p50', '-'):>10}{lat.get('p95', '-'):>10}{lat.get('p99', '-'):>10}{ack.get('p95', '-'):>10}  {delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="ssibal bot benchmark")
+    parser.add_argument("--scale", nargs="*", default=["1k", "10k"], choices=sorted(SCALES),
+                        help="미리 정한 규모 (계좌/거래 수)")
+    parser.add_argument("--accounts", type=int, help="규모 대신 계좌 수를 직접 지정")
+    parser.add_argument("--transactions", type=int, help="--accounts 와 함께 거래 수 지정 (최대 1,000,000 권장)")
+    parser.add_argument("--iterations", type=int, default=200, help="가벼운 명령/API 호출 횟수")
+    parser.add_argument("--heavy-iterations", type=int, default=3, help="세금징수/엑셀내보내기 호출 횟수")
+    parser.add_argument("--concurrency", type=int, default=8, help="송금/거래내역/API 동시 호출 수")
+    parser.add_argument("--export-format", default="xlsx", choices=("xlsx", "csv", "csv.gz"))
+    parser.add_argument("--only", nargs="*", help="이 작업만 실행 (예: transfer_money api_balance)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=f"bench_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--compare", help="이전 결과 JSON 과 p95 비교")
+    parser.add_argument("--keep", action="store_true", help="생성한 데이터 디렉터리를 남김")
+    parser.add_argument("--verbose", action="store_true", help="봇 로그도 출력")
+    args = parser.parse_args()
+
+    if args.accounts:
+        scenarios = [(f"{args.accounts}", args.accounts, args.transactions or args.accounts * 10)]
+    else:
+        scenarios = [(name, *SCALES[name]) for name in args.scale]
+    results = [run_scenario(name, accounts, transactions, args) for name, accounts, transactions in scenarios]
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "scenarios": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    print(f"\n[bench] results -> {args.out}")
+    if any(s.get("failed") is not None for s in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import discord
+
+# 슬래시 명령 콜백을 디스코드 없이 실행하기 위한 가짜 Interaction.
+# 봇 코드가 실제로 쓰는 속성(id, user, extras, response.send_message/defer/is_done/type, followup.send)만 흉내 낸다
+_ids = itertools.count(10 ** 18)
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str = "bench"):
+        self.id = int(user_id)
+        self.name = name
+        self.display_name = name
+        self.global_name = name
+        self.bot = False
+        self.mention = f"<@{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self.kind: Optional[str] = None
+        self.acked_at: Optional[float] = None
+
+    def is_done(self) -> bool:
+        return self.kind is not None
+
+    @property
+    def type(self) -> Optional[discord.InteractionResponseType]:
+        if self.kind is None:
+            return None
+        if self.kind == "deferred":
+            return discord.InteractionResponseType.deferred_channel_message
+        return discord.InteractionResponseType.channel_message
+
+    def _ack(self, kind: str, **payload):
+        if self.kind is not None:
+            raise RuntimeError("interaction already acknowledged")
+        self.kind = kind
+        self.acked_at = time.perf_counter()
+        if payload:
+            self._interaction.messages.append(payload)
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        self._ack("message", content=content, **kwargs)
+
+    async def edit_message(self, **kwargs):
+        self._ack("edit", **kwargs)
+
+    async def defer(self, **kwargs):
+        self._ack("deferred")
+
+    async def send_modal(self, modal):
+        self._ack("modal", modal=modal)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        self._interaction.messages.append({"content": content, **kwargs})
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser):
+        self.id = next(_ids)
+        self.user = user
+        self.guild = None
+        self.guild_id = None
+        self.channel = None
+        self.command = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.messages: List[Any] = []
+        self.extras: Dict[str, Any] = {}
+
+    @property
+    def ack_seconds(self) -> Optional[float]:
+        if self.response.acked_at is None:
+            return None
+        return self.response.acked_at - self.started
+
+    def text(self) -> str:
+        # 응답 내용(오류 메시지 확인용)
+        out = []
+        for m in self.messages:
+            if m.get("content"):
+                out.append(str(m["content"]))
+            embed = m.get("embed")
+            if embed is not None and getattr(embed, "title", None):
+                out.append(str(embed.title))
+        return " / ".join(out)
@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:  # httpx 가 없으면 FastAPI 구간은 건너뛴다
+    httpx = None
+
+from bench import synth
+from bench.harness import FakeInteraction, FakeUser
+
+# 시나리오 하나 = 프로세스 하나. bot.py 는 import 할 때 현재 디렉터리의 데이터를 읽으므로
+# 가짜 데이터를 만든 디렉터리로 옮긴 뒤 import 하고, 실제 명령 콜백을 가짜 Interaction 으로 호출한다
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples: List[float]) -> Optional[Dict[str, float]]:
+    if not samples:
+        return None
+    data = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(data[min(len(data) - 1, int(q * len(data)))] * 1000, 3)
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(data[-1] * 1000, 3),
+            "mean": round(sum(data) / len(data) * 1000, 3)}
+
+
+async def measure(count: int, concurrency: int, call: Callable[[int], Awaitable[Optional[float]]]) -> Dict[str, Any]:
+    # call(i) 는 실패면 예외, 성공이면 응답(ack)까지 걸린 초(없으면 None)를 돌려준다
+    latencies: List[float] = []
+    acks: List[float] = []
+    errors: List[str] = []
+    queue = iter(range(count))
+
+    async def worker():
+        for i in queue:
+            started = time.perf_counter()
+            try:
+                ack = await call(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}"[:200])
+                continue
+            latencies.append(time.perf_counter() - started)
+            if ack is not None:
+                acks.append(ack)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    wall = time.perf_counter() - started
+    return {"count": count, "ok": len(latencies), "errors": len(errors), "error_samples": sorted(set(errors))[:5],
+            "concurrency": concurrency, "wall_s": round(wall, 4),
+            "throughput_per_s": round(len(latencies) / wall, 2) if wall > 0 else None,
+            "latency_ms": percentiles(latencies), "ack_ms": percentiles(acks)}
+
+
+def replied_error(interaction: FakeInteraction):
+    text = interaction.text()
+    if text.startswith("❌") or text.startswith("⏳"):
+        raise RuntimeError(text[:120])
+
+
+async def run_commands(bot, info: Dict[str, Any], args) -> Dict[str, Any]:
+    from discord import app_commands
+
+    rng = random.Random(args.seed)
+    accounts = info["accounts"]
+    admin = FakeUser(bot.ADMIN_USER_IDS[0], "bench-admin")
+    users = [FakeUser(int(synth.user_id(i)), f"user{i}") for i in range(accounts)]
+    results: Dict[str, Any] = {}
+
+    async def invoke(command, user: FakeUser, *params) -> Optional[float]:
+        interaction = FakeInteraction(user)
+        await command.callback(interaction, *params)
+        replied_error(interaction)
+        return interaction.ack_seconds
+
+    async def transfer(i: int):
+        a, b = rng.sample(range(accounts), 2)
+        return await invoke(bot.transfer_money, users[a], users[b], rng.randint(1_000, 20_000), "bench")
+
+    async def history(i: int):
+        return await invoke(bot.transaction_history, users[rng.randrange(accounts)], 10)
+
+    sorts = [app_commands.Choice(name=n, value=v) for n, v in (("계좌번호순", "account"), ("잔액순", "balance"), ("이름순", "name"))]
+
+    async def list_accounts(i: int):
+        return await invoke(bot.list_accounts, admin, sorts[i % len(sorts)], None, None, None)
+
+    async def collect_tax(i: int):
+        return await invoke(bot.collect_tax, admin, False)
+
+    period = app_commands.Choice(name="최근 7일", value="7d")
+    fmt = app_commands.Choice(name=args.export_format, value=args.export_format)
+
+    async def export(i: int):
+        return await invoke(bot.export_excel, admin, period, True, fmt)
+
+    plan = [("transfer_money", transfer, args.iterations, args.concurrency),
+            ("transaction_history", history, args.iterations, args.concurrency),
+            ("list_accounts", list_accounts, args.iterations, 1),
+            ("collect_tax", collect_tax, args.heavy_iterations, 1),
+            ("export_excel", export, args.heavy_iterations, 1)]
+    for name, call, count, concurrency in plan:
+        if args.only and name not in args.only:
+            continue
+        results[name] = await measure(count, concurrency, call)
+        print(f"[bench] {name}: {results[name]['throughput_per_s']}/s p95={((results[name]['latency_ms'] or {}).get('p95'))}ms",
+              file=sys.stderr)
+    return results
+
+
+async def run_api(bot, info: Dict[str, Any], args) -> Dict[str, Any]:
+    if httpx is None:
+        return {"skipped": "httpx not installed"}
+    rng = random.Random(args.seed + 1)
+    numbers = info["account_numbers"]
+    headers = {"Authorization": f"Bearer {synth.MAP_TOKEN}"}
+    results: Dict[str, Any] = {}
+    # 봇과 같은 이벤트 루프에서 ASGI 앱을 직접 호출 (운영에서도 uvicorn 이 같은 루프에서 돈다)
+    transport = httpx.ASGITransport(app=bot.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def balance(i: int):
+            r = await client.get("/api/roblox/balance", params={"account_number": rng.choice(numbers)}, headers=headers)
+            r.raise_for_status()
+
+        async def credit(i: int):
+            r = await client.post("/api/roblox/credit", headers={**headers, "Idempotency-Key": f"bench-{i}-{rng.random()}"},
+                                  json={"account_number": rng.choice(numbers), "amount": rng.randint(1, 1000), "memo": "bench"})
+            r.raise_for_status()
+
+        async def metrics(i: int):
+            r = await client.get("/metrics")
+            r.raise_for_status()
+
+        for name, call, count in (("api_balance", balance, args.iterations), ("api_credit", credit, args.iterations),
+                                  ("api_metrics", metrics, max(1, args.iterations // 10))):
+            if args.only and name not in args.only:
+                continue
+            results[name] = await measure(count, args.concurrency, call)
+            print(f"[bench] {name}: {results[name]['throughput_per_s']}/s", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="run one benchmark scenario (used by python -m bench)")
+    parser.add_argument("--dir", required=True)
+    parser.add_argument("--accounts", type=int, required=True)
+    parser.add_argument("--transactions", type=int, required=True)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--heavy-iterations", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--export-format", default="xlsx", choices=("xlsx", "csv", "csv.gz"))
+    parser.add_argument("--only", nargs="*")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    info = synth.generate(args.dir, args.accounts, args.transactions, seed=args.seed)
+    generate_s = time.perf_counter() - started
+    data_bytes = {name: os.path.getsize(os.path.join(args.dir, name))
+                  for name in ("users.json", "account_mapping.json", "transactions.json")}
+
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(args.dir)
+    # 첫 기동: users.json 로드, 예전 transactions.json 을 저널로 가져오기, 색인 생성
+    started = time.perf_counter()
+    import bot
+    startup_s = time.perf_counter() - started
+
+    async def run_all():
+        lag = asyncio.create_task(bot.event_loop_lag_task())
+        try:
+            ops = await run_commands(bot, info, args)
+            ops.update(await run_api(bot, info, args))
+        finally:
+            lag.cancel()
+        return ops
+
+    ops = asyncio.run(run_all())
+    started = time.perf_counter()
+    bot.LEDGER.flush()
+    flush_s = time.perf_counter() - started
+    result = {"accounts": args.accounts, "transactions": args.transactions, "generate_s": round(generate_s, 3),
+              "startup_s": round(startup_s, 3), "flush_s": round(flush_s, 4), "data_bytes": data_bytes, "ops": ops,
+              "metrics": {"ledger_append": bot.METRICS.summary("ssibal_ledger_append_seconds"),
+                          "event_loop_lag": bot.METRICS.summary("ssibal_event_loop_lag_seconds")}}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+# 가짜 경제 데이터: users.json / account_mapping.json / transactions.json (+ 세금/수수료를 켠 설정)
+# 봇이 처음 뜰 때와 같은 경로(예전 transactions.json 을 저널로 가져오기)를 그대로 타게 한다
+BASE_USER_ID = 10 ** 17
+START_BALANCE = 1_000_000
+TX_TYPES = ("송금", "송금", "송금", "계좌송금", "맵지급", "맵차감", "월급지급")
+MAP_TOKEN = "bench-map-token"
+CHUNK = 10_000
+
+
+def user_id(i: int) -> str:
+    return str(BASE_USER_ID + i)
+
+
+def account_numbers(count: int, rng: random.Random) -> List[str]:
+    # 실제 할당기처럼 절반 이하로 찬 자릿수 공간에서 겹치지 않게 뽑는다
+    width = max(4, len(str(count * 2)))
+    lo = 10 ** (width - 1)
+    return [str(lo + n) for n in rng.sample(range(10 ** width - lo), count)]
+
+
+def _write_json(path: str, data: Any):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def _write_transactions(path: str, accounts: List[str], count: int, days: int, rng: random.Random):
+    # 100만 건을 한 번에 리스트로 만들지 않도록 CHUNK 단위로 이어 쓴다 (시간 순)
+    end = datetime.now()
+    start = end - timedelta(days=days)
+    step = (end - start) / max(1, count)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for base in range(0, count, CHUNK):
+            rows = []
+            for i in range(base, min(count, base + CHUNK)):
+                kind = rng.choice(TX_TYPES)
+                src, dst = rng.sample(accounts, 2) if len(accounts) > 1 else (accounts[0], accounts[0])
+                if kind == "맵지급" or kind == "월급지급":
+                    src = "MAP" if kind == "맵지급" else "SYSTEM"
+                elif kind == "맵차감":
+                    dst = "MAP"
+                amount = rng.randint(100, 50_000)
+                rows.append({
+                    "timestamp": (start + step * i).isoformat(),
+                    "type": kind,
+                    "from_user": src,
+                    "to_user": dst,
+                    "amount": amount,
+                    "fee": amount // 100 if kind in ("송금", "계좌송금") else 0,
+                    "memo": "bench",
+                })
+            chunk = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))[1:-1]
+            if base:
+                f.write(",")
+            f.write(chunk)
+        f.write("]")
+
+
+def generate(directory: str, accounts: int, transactions: int, days: int = 90, seed: int = 1) -> Dict[str, Any]:
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    numbers = account_numbers(accounts, rng)
+    now = datetime.now().isoformat()
+    users: Dict[str, Any] = {}
+    mapping: Dict[str, Any] = {}
+    for i, acc in enumerate(numbers):
+        uid = user_id(i)
+        users[uid] = {"이름": f"user{i}", "계좌번호": acc, "잔액": START_BALANCE + rng.randint(0, 9_000_000)}
+        mapping[acc] = {"user_id": int(uid), "discord_name": f"user{i}", "created_at": now}
+    _write_json(os.path.join(directory, "users.json"), users)
+    _write_json(os.path.join(directory, "account_mapping.json"), mapping)
+    _write_json(os.path.join(directory, "public_accounts.json"), {})
+    _write_json(os.path.join(directory, "admin_settings.json"), {
+        "transaction_fee": {"enabled": True, "min_amount": 1000, "fee_rate": 0.01},
+        "tax_system": {"enabled": True, "rate": 0.001, "period_days": 30, "last_collected": None, "tax_name": "세금"},
+        "salary_system": {"enabled": False, "salaries": {}, "last_paid": None, "source_account": {}},
+        "frozen_accounts": {},
+        "treasury_account": None,
+        "extra_admin_ids": [],
+    })
+    _write_json(os.path.join(directory, "roblox_apis.json"),
+                {"maps": {"bench": {"token": MAP_TOKEN, "enabled": True, "created_at": now}}})
+    _write_transactions(os.path.join(directory, "transactions.json"), numbers, transactions, days, rng)
+    return {"accounts": accounts, "transactions": transactions, "days": days, "seed": seed, "account_numbers": numbers}
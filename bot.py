@@ -1,27 +1,45 @@
 import os
-import io
-import csv
-import json
+import atexit
 import asyncio
-import random
+import time
 import secrets
 import string
-import threading
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands
 from discord import app_commands, ui
 
-import pandas as pd
 import pytz
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
+from ledger import Ledger
+from settings_cache import SettingsCache
+from journal import TransactionJournal
+from sqlite_store import SqliteStore
+from transfer_executor import TransferExecutor, TransferError
+from workers import Workers, WorkerQueueFull
+from link_registry import LinkRegistry
+from idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+from account_allocator import AccountAllocator
+from account_directory import AccountDirectory
+from economy import EconomyStats
+from checkpoint import CheckpointStore
+from json_store import JsonFileStore
+from scheduler import Job, Scheduler, nth_weekday_after
+from notifier import Notifier
+from metrics import Metrics
+import checkpoint
+import reports
+import tax_engine
+import payroll
+import game_api
+
 load_dotenv()
 TOKEN = os.environ.get("DISCORD_TOKEN")
 BASE_URL = os.environ.get("BASE_URL", "").rstrip("/")
@@ -34,24 +52,63 @@ TRANSACTIONS_FILE = "transactions.json"
 ACCOUNT_MAPPING_FILE = "account_mapping.json"
 ROBLOX_LINKS_FILE = "roblox_links.json"
 ROBLOX_APIS_FILE = "roblox_apis.json"
+IDEMPOTENCY_FILE = "idempotency.json"
+ACCOUNT_ALLOCATOR_FILE = "account_allocator.json"
+ECONOMY_FILE = "economy.json"
+SCHEDULER_FILE = "scheduler.json"
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR", "journal")
+LEDGER_STATE_FILE = "ledger_state.json"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "ssibal.db")
 
 ADMIN_USER_IDS = [496921375768838154]
 
+# 명령 지연/저장 I/O/저널 기록/이벤트 루프 지연. FastAPI /metrics 로 Prometheus 형식 노출, /성능지표 로 백분위 확인
+METRICS = Metrics(window=int(os.environ.get("METRICS_WINDOW", 1024)))
+METRICS.describe("ssibal_command_ack_seconds", "histogram", "Slash command start to first response (send/defer)")
+METRICS.describe("ssibal_command_seconds", "histogram", "Slash command start to completion")
+METRICS.describe("ssibal_interaction_acks_total", "counter", "Slash command interactions by how they were acknowledged")
+METRICS.describe("ssibal_command_errors_total", "counter", "Slash commands that raised")
+METRICS.describe("ssibal_store_seconds", "histogram", "Document load/save duration")
+METRICS.describe("ssibal_store_bytes_total", "counter", "Document bytes read/written")
+METRICS.describe("ssibal_ledger_append_seconds", "histogram", "Journal append duration per ledger commit")
+METRICS.describe("ssibal_ledger_entries_total", "counter", "Journal entries appended")
+METRICS.describe("ssibal_event_loop_lag_seconds", "histogram", "Event loop scheduling delay")
+
+def record_store_io(op: str, path: str, seconds: float, nbytes: int):
+    name = os.path.basename(path)
+    METRICS.observe("ssibal_store_seconds", seconds, op=op, file=name)
+    METRICS.inc("ssibal_store_bytes_total", nbytes, op=op, file=name)
+
+# JSON 파일은 임시 파일 + fsync + rename 으로 기록하고 백업을 JSON_BACKUPS 개 유지 (내용이 같으면 다시 쓰지 않음)
+# 여러 번의 변경은 Ledger 가 dirty 로 모아 두었다가 LEDGER_FLUSH_INTERVAL 마다 한 번에 기록한다
+JSON_FILES = JsonFileStore(
+    backups=int(os.environ.get("JSON_BACKUPS", 3)),
+    backup_interval=float(os.environ.get("JSON_BACKUP_INTERVAL", 300)),
+    pretty=os.environ.get("JSON_PRETTY", "0") == "1",
+    observer=record_store_io,
+)
+
 def ensure_file(path, default):
-    if not os.path.exists(path):
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(default, f, ensure_ascii=False, indent=4)
+    JSON_FILES.ensure(path, default)
 
 def load_json(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return JSON_FILES.load(path)
 
 def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-ensure_file(DATA_FILE, {})
-ensure_file(SETTINGS_FILE, {
+    JSON_FILES.save(path, data)
+
+# STORAGE_BACKEND=sqlite 이면 같은 load/save 경로가 SQLite(WAL) 테이블을 읽고 쓴다
+# (기존 JSON 데이터는 `python sqlite_store.py migrate` 로 한 번 옮긴다)
+if STORAGE_BACKEND == "sqlite":
+    STORE = SqliteStore(SQLITE_PATH)
+    load_doc, save_doc, ensure_doc = STORE.load, STORE.save, STORE.ensure
+else:
+    STORE = None
+    load_doc, save_doc, ensure_doc = load_json, save_json, ensure_file
+
+ensure_doc(DATA_FILE, {})
+ensure_doc(SETTINGS_FILE, {
     "transaction_fee": {"enabled": False, "min_amount": 0, "fee_rate": 0.0},
     "tax_system": {"enabled": False, "rate": 0.0, "period_days": 30, "last_collected": None, "tax_name": "세금"},
     "salary_system": {"enabled": False, "salaries": {}, "last_paid": None, "source_account": {}},
@@ -59,101 +116,219 @@ ensure_file(SETTINGS_FILE, {
     "treasury_account": None,
     "extra_admin_ids": []
 })
-ensure_file(PUBLIC_ACCOUNTS_FILE, {})
+ensure_doc(PUBLIC_ACCOUNTS_FILE, {})
 ensure_file(TRANSACTIONS_FILE, [])
-ensure_file(ROBLOX_LINKS_FILE, {"links": {}, "pending": {}})
-ensure_file(ROBLOX_APIS_FILE, {"maps": {}})
-
-def load_users(): return load_json(DATA_FILE)
-def save_users(data): save_json(DATA_FILE, data)
-def load_settings(): return load_json(SETTINGS_FILE)
-def save_settings(data): save_json(SETTINGS_FILE, data)
-def load_public_accounts(): return load_json(PUBLIC_ACCOUNTS_FILE)
-def save_public_accounts(data): save_json(PUBLIC_ACCOUNTS_FILE, data)
-def load_transactions(): return load_json(TRANSACTIONS_FILE)
-def save_transactions(data): save_json(TRANSACTIONS_FILE, data)
-
-def load_account_mapping():
-    if not os.path.exists(ACCOUNT_MAPPING_FILE):
-        return {}
-    try:
-        return load_json(ACCOUNT_MAPPING_FILE)
-    except Exception:
-        return {}
+ensure_doc(ROBLOX_LINKS_FILE, {"links": {}, "pending": {}})
+ensure_doc(ROBLOX_APIS_FILE, {"maps": {}})
+ensure_doc(IDEMPOTENCY_FILE, {})
+ensure_doc(ACCOUNT_ALLOCATOR_FILE, {})
+ensure_doc(ECONOMY_FILE, {})
+ensure_doc(SCHEDULER_FILE, {})
+
+LEDGER_FLUSH_INTERVAL = float(os.environ.get("LEDGER_FLUSH_INTERVAL", 5))
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", "checkpoints")
+CHECKPOINT_INTERVAL = float(os.environ.get("CHECKPOINT_INTERVAL", 600))
+
+# users/settings/public/mapping 은 시작 시 한 번만 읽고 메모리에서 수정, flush 때 디스크에 기록
+LEDGER = Ledger(load_doc, save_doc)
+
+def record_ledger_append(count: int, seconds: float):
+    METRICS.observe("ssibal_ledger_append_seconds", seconds)
+    METRICS.inc("ssibal_ledger_entries_total", count)
+
+LEDGER.on_append = record_ledger_append
+# users.json 이 깨져 있으면 빈 문서로 시작하고 아래에서 체크포인트 + 저널로 복구
+LEDGER.attach("users", DATA_FILE, fallback={})
+LEDGER.attach("settings", SETTINGS_FILE)
+LEDGER.attach("public_accounts", PUBLIC_ACCOUNTS_FILE)
+LEDGER.attach("account_mapping", ACCOUNT_MAPPING_FILE, fallback={})
+LEDGER.attach("links", ROBLOX_LINKS_FILE)
+LEDGER.attach("map_apis", ROBLOX_APIS_FILE)
+# 멱등성 키 {키: 결과}. 돈이 움직이는 거래와 같은 저널 항목에 키를 남겨서 재시작 후에도 중복 실행을 막는다
+LEDGER.attach("idempotency", IDEMPOTENCY_FILE, fallback={})
+if isinstance(LEDGER.get("idempotency").get("entries"), dict):
+    LEDGER.put("idempotency", dict(LEDGER.get("idempotency")["entries"]))
+LEDGER.reindex()
+# 관리자/동결/수수료 확인은 버전 스냅샷에서 O(1), 파일은 건드리지 않음
+SETTINGS = SettingsCache(LEDGER, "settings", ADMIN_USER_IDS, path=None if STORE is not None else SETTINGS_FILE)
+
+# 거래 기록은 append-only 저널에 남기고, users.json 이 반영하지 못한 꼬리는 시작 시 재생
+if STORE is not None:
+    JOURNAL = STORE
+else:
+    JOURNAL = TransactionJournal(
+        JOURNAL_DIR,
+        segment_bytes=int(os.environ.get("JOURNAL_SEGMENT_BYTES", 8 * 1024 * 1024)),
+        fsync_every=int(os.environ.get("JOURNAL_FSYNC_EVERY", 64)),
+        fsync_interval=float(os.environ.get("JOURNAL_FSYNC_INTERVAL", 0.5)),
+    )
+LEDGER.attach_journal(JOURNAL, LEDGER_STATE_FILE)
+# users.json 보다 최신인 체크포인트가 있으면 그 시점 잔액/계좌를 올리고 저널은 그 뒤만 재생
+CHECKPOINTS = CheckpointStore(CHECKPOINT_DIR, keep=int(os.environ.get("CHECKPOINT_KEEP", 3)))
+_ckpt = CHECKPOINTS.latest()
+if _ckpt is not None and LEDGER.restore_checkpoint(_ckpt.seq, _ckpt.docs):
+    print(f"[checkpoint] restored seq={_ckpt.seq} from {_ckpt.path}")
+del _ckpt
+LEDGER.import_legacy(load_json(TRANSACTIONS_FILE))
+LEDGER.replay()
+atexit.register(JOURNAL.close)
+atexit.register(LEDGER.flush)
+# /계좌목록 정렬 목록과 총 자산은 원장이 바뀔 때마다 갱신 (조회 때 전체를 다시 훑지 않음)
+DIRECTORY = AccountDirectory(LEDGER)
+# 통화량/발행/수수료/세금/압류 누적값. 저장된 seq 이후 저널만 읽어서 따라잡고, 이후로는 기록될 때마다 갱신
+ECONOMY = EconomyStats(DIRECTORY, snapshot_interval=float(os.environ.get("ECONOMY_SNAPSHOT_INTERVAL", 3600)))
+ECONOMY.load(load_doc(ECONOMY_FILE))
+ECONOMY.catch_up(JOURNAL.iter(ECONOMY.seq))
+LEDGER.subscribe_entries(ECONOMY.observe)
+
+def save_economy():
+    snap = ECONOMY.snapshot()
+    if snap is not None:
+        save_doc(ECONOMY_FILE, snap)
+
+atexit.register(save_economy)
+
+# 디스크 I/O 와 pandas/openpyxl 작업은 이벤트 루프 밖 워커에서 실행
+WORKERS = Workers(
+    io_threads=int(os.environ.get("WORKER_IO_THREADS", 4)),
+    report_workers=int(os.environ.get("WORKER_REPORT_WORKERS", 2)),
+    max_pending=int(os.environ.get("WORKER_MAX_PENDING", 64)),
+    report_mode=os.environ.get("WORKER_REPORT_MODE", "thread"),
+)
+atexit.register(WORKERS.shutdown)
+BUSY_MESSAGE = "⏳ 처리 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요."
+EXPORT_MAX_BYTES = int(os.environ.get("EXPORT_MAX_BYTES", 8 * 1024 * 1024))
+EXPORT_SPOOL_BYTES = int(os.environ.get("EXPORT_SPOOL_BYTES", 4 * 1024 * 1024))
+EXPORT_MAX_PARTS = int(os.environ.get("EXPORT_MAX_PARTS", 20))
+EXPORT_PERIOD_DAYS = {"3d": 3, "7d": 7, "30d": 30}
+
+# 같은 계좌를 건드리는 작업은 직렬화, 서로 다른 계좌는 동시에 처리
+TRANSFERS = TransferExecutor()
+
+def _encode_error(e: BaseException) -> Dict[str, Any]:
+    if isinstance(e, game_api.ApiError):
+        return {"kind": "api", "status": e.status, "message": e.message}
+    return {"kind": "transfer", "message": str(e)}
+
+def _decode_error(d: Dict[str, Any]) -> BaseException:
+    if d.get("kind") == "api":
+        return game_api.ApiError(int(d.get("status", 400)), d.get("message", ""))
+    return TransferError(d.get("message", ""))
+
+# interaction id / Idempotency-Key 별로 돈이 움직이는 작업을 한 번만 실행하고 결과를 저장 (재시작 후에도 유지)
+IDEMPOTENCY = IdempotencyStore(
+    max_entries=int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10000)),
+    ttl=float(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600)),
+    error_types=(TransferError, game_api.ApiError),
+    encode_error=_encode_error,
+    decode_error=_decode_error,
+)
 
-def save_account_mapping(mapping):
-    save_json(ACCOUNT_MAPPING_FILE, mapping)
+def persist_idempotency(key: str, entry: Optional[Dict[str, Any]]):
+    doc = LEDGER.get("idempotency")
+    if entry is None:
+        doc.pop(key, None)
+    else:
+        doc[key] = entry
+    LEDGER.mark_dirty("idempotency")
+
+IDEMPOTENCY.on_change = persist_idempotency
+IDEMPOTENCY.load(dict(LEDGER.get("idempotency")))
+
+def stamp_idempotency() -> Optional[Dict[str, Dict[str, Any]]]:
+    marker = IDEMPOTENCY.marker()
+    return {"idempotency": marker} if marker else None
+
+LEDGER.stamp = stamp_idempotency
+
+async def run_once(interaction: discord.Interaction, fn) -> Tuple[Any, bool]:
+    # 같은 interaction 이 다시 들어오면 실행하지 않고 처음 결과를 돌려준다.
+    # 두 번째 값이 True 면 이미 처리(응답)한 interaction 이므로 호출한 쪽은 다시 응답하지 않는다
+    return await IDEMPOTENCY.run(f"i:{interaction.id}", fn, replay_errors=False)
+
+def load_users(): return LEDGER.get("users")
+def save_users(data): LEDGER.put("users", data)
+def load_settings(): return LEDGER.get("settings")
+def save_settings(data):
+    LEDGER.put("settings", data)
+    SETTINGS.invalidate()
+def load_public_accounts(): return LEDGER.get("public_accounts")
+def save_public_accounts(data): LEDGER.put("public_accounts", data)
+def load_transactions(): return list(JOURNAL.iter())
+
+def load_account_mapping(): return LEDGER.get("account_mapping")
+def save_account_mapping(mapping): LEDGER.put("account_mapping", mapping)
+
+def load_links(): return LEDGER.get("links")
+
+def persist_link(kind: str, discord_id: str, data: Optional[Dict[str, Any]]):
+    # SQLite 는 바뀐 행만 바로 기록, JSON 은 dirty 표시 후 다음 flush 때 한 번에 기록
+    if STORE is not None:
+        STORE.put_link(kind, discord_id, data)
+    else:
+        LEDGER.mark_dirty("links")
+
+# 연동 코드/로블록스 id 색인과 만료 힙 (검증 O(1), 만료 코드는 만료된 만큼만 정리)
+LINKS = LinkRegistry(load_links(), persist_link)
+LINK_CODE_TTL = 10 * 60
+def load_map_apis(): return LEDGER.get("map_apis")
+def save_map_apis(d):
+    LEDGER.put("map_apis", d)
+    MAP_TOKENS.rebuild(d)
 
-def load_links(): return load_json(ROBLOX_LINKS_FILE)
-def save_links(d): save_json(ROBLOX_LINKS_FILE, d)
-def load_map_apis(): return load_json(ROBLOX_APIS_FILE)
-def save_map_apis(d): save_json(ROBLOX_APIS_FILE, d)
+# 게임 서버 API 토큰 -> 맵 (요청마다 maps 를 훑지 않음)
+MAP_TOKENS = game_api.MapTokenIndex()
+MAP_TOKENS.rebuild(load_map_apis())
 
 def format_number_4digit(num: int) -> str:
     return f"{num:,}"
 
+# 계좌번호 비트맵/free-list (발급 O(1)). 자리가 max_load 만큼 차면 다음 자릿수로 넘어가고 기존 번호는 그대로 유효
+ACCOUNTS = AccountAllocator(
+    width=int(os.environ.get("ACCOUNT_NUMBER_WIDTH", 4)),
+    max_load=float(os.environ.get("ACCOUNT_NUMBER_MAX_LOAD", 0.9)),
+)
+ACCOUNTS.load(load_doc(ACCOUNT_ALLOCATOR_FILE))
+# 저장된 비트맵이 원장보다 뒤처져 있어도 원장에 있는 번호는 다시 내주지 않음
+ACCOUNTS.reserve_existing(LEDGER.uid_by_account)
+ACCOUNTS.reserve_existing(LEDGER.public_by_account)
+ACCOUNTS.reserve_existing(load_account_mapping())
+
+def save_account_allocator():
+    snap = ACCOUNTS.snapshot()
+    if snap is not None:
+        save_doc(ACCOUNT_ALLOCATOR_FILE, snap)
+
+atexit.register(save_account_allocator)
+
 def generate_account_number():
-    users = load_users()
-    account_mapping = load_account_mapping()
-    public_accounts = load_public_accounts()
-    existing_numbers = set()
-    for account_data in users.values():
-        if isinstance(account_data, dict) and '계좌번호' in account_data:
-            existing_numbers.add(account_data['계좌번호'])
-    existing_numbers.update(account_mapping.keys())
-    for account_data in public_accounts.values():
-        acc_num = account_data.get("account_number")
-        if acc_num:
-            existing_numbers.add(acc_num)
-    while True:
-        account_number = f"{random.randint(1000, 9999)}"
-        if account_number not in existing_numbers:
-            return account_number
+    return ACCOUNTS.allocate()
 
 def get_account_number_by_user(user_id):
-    mapping = load_account_mapping()
-    for account_num, data in mapping.items():
-        if isinstance(data, dict) and data.get('user_id') == int(user_id):
-            return account_num
-    return None
+    return LEDGER.account_for_user(user_id)
 
 def get_user_by_account_number(account_number):
-    users = load_users()
-    for user_id, data in users.items():
-        if isinstance(data, dict) and data.get("계좌번호") == account_number:
-            return str(user_id)
-    return None
+    return LEDGER.uid_for_account(account_number)
 
 def verify_public_account(account_number, password):
-    public_accounts = load_public_accounts()
-    for account_name, account_data in public_accounts.items():
-        if account_data.get("account_number") == account_number and account_data.get("password") == password:
-            return account_name
+    account_name = LEDGER.public_name_for_account(account_number)
+    if account_name is None:
+        return None
+    if load_public_accounts()[account_name].get("password") == password:
+        return account_name
     return None
 
 def calculate_transaction_fee(amount: int) -> int:
-    fee_config = load_settings().get("transaction_fee", {"enabled": False, "min_amount": 0, "fee_rate": 0.0})
-    if not fee_config.get("enabled") or amount < fee_config.get("min_amount", 0):
-        return 0
-    return int(amount * fee_config.get("fee_rate", 0.0))
+    return SETTINGS.snapshot().fee.fee_for(amount)
 
-def get_admin_ids() -> set:
-    try:
-        s = load_settings()
-        extras = s.get("extra_admin_ids", [])
-    except Exception:
-        extras = []
-    try:
-        extras = {int(x) for x in extras if str(x).isdigit()}
-    except Exception:
-        extras = set()
-    return set(ADMIN_USER_IDS) | extras
+def get_admin_ids() -> frozenset:
+    return SETTINGS.snapshot().admin_ids
 
 def is_admin(user_id: int) -> bool:
-    return int(user_id) in get_admin_ids()
+    return int(user_id) in SETTINGS.snapshot().admin_ids
 
 def is_account_frozen(account_identifier: str) -> bool:
-    return account_identifier in load_settings().get("frozen_accounts", {})
+    return account_identifier in SETTINGS.snapshot().frozen_accounts
 
 def set_account_frozen(account_identifier: str, frozen: bool, reason: str = ""):
     settings = load_settings()
@@ -167,20 +342,23 @@ def set_account_frozen(account_identifier: str, frozen: bool, reason: str = ""):
         frozen_accounts.pop(account_identifier, None)
     save_settings(settings)
 
-def add_transaction(transaction_type: str, from_user: str, to_user: str, amount: int, fee: int = 0, memo: str = ""):
-    transactions = load_transactions()
-    transactions.append({
-        "timestamp": datetime.now().isoformat(),
-        "type": transaction_type,
-        "from_user": from_user,
-        "to_user": to_user,
-        "amount": amount,
-        "fee": fee,
-        "memo": memo
-    })
-    if len(transactions) > 3000:
-        transactions = transactions[-3000:]
-    save_transactions(transactions)
+def transfer_checked(tx_type: str, from_acc: str, to_acc: str, amount: int, memo: str = "", *,
+                     with_fee: bool = True, insufficient_msg: Optional[str] = None):
+    # TRANSFERS 잠금 안에서 호출: 최신 잔액/동결 상태로 다시 검증한 뒤 기록
+    if is_account_frozen(from_acc) or is_account_frozen(to_acc):
+        raise TransferError("❌ 동결된 계좌가 포함되어 있습니다.")
+    fee = calculate_transaction_fee(amount) if with_fee else 0
+    total_amount = amount + fee
+    row = LEDGER.row_for_account(from_acc)
+    if row is None or int(row.get("잔액", 0)) < total_amount:
+        raise TransferError(insufficient_msg or f"❌ 잔액 부족. 필요액 {format_number_4digit(total_amount)}원")
+    return add_transaction(tx_type, from_acc, to_acc, amount, fee, memo,
+        deltas={from_acc: -total_amount, to_acc: amount})
+
+def add_transaction(transaction_type: str, from_user: str, to_user: str, amount: int, fee: int = 0, memo: str = "",
+                    deltas: Optional[Dict[str, int]] = None, upserts: Optional[Dict[str, Dict[str, Any]]] = None):
+    # 잔액 변경(deltas)과 거래 기록을 저널에 먼저 쓰고 나서 메모리에 반영
+    return LEDGER.post(transaction_type, from_user, to_user, amount, fee, memo, deltas=deltas, upserts=upserts)
 
 def mask_token(s: str, head: int = 6, tail: int = 4) -> str:
     if not s: return ""
@@ -195,6 +373,7 @@ async def safe_reply(interaction: discord.Interaction, *, content: str | None =
             await interaction.followup.send(content=content, embed=embed, ephemeral=ephemeral)
         else:
             await interaction.response.send_message(content=content, embed=embed, ephemeral=ephemeral)
+            note_ack(interaction)
     except Exception as e:
         msg = str(e)
         if "40060" in msg:
@@ -208,24 +387,248 @@ async def safe_reply(interaction: discord.Interaction, *, content: str | None =
 
 app = FastAPI()
 
-def run_fastapi():
-    uvicorn.run(app, host="0.0.0.0", port=FASTAPI_PORT, log_level="info")
+@app.exception_handler(game_api.ApiError)
+async def api_error_handler(request: Request, exc: game_api.ApiError):
+    return JSONResponse({"ok": False, "error": exc.message}, status_code=exc.status)
+
+def map_auth(authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)) -> str:
+    hit = MAP_TOKENS.resolve(game_api.bearer_token(authorization, x_api_key))
+    if hit is None:
+        raise game_api.ApiError(401, "invalid api token")
+    name, info = hit
+    if not info.get("enabled"):
+        raise game_api.ApiError(403, "map api disabled")
+    return name
+
+def discord_id_for_roblox(roblox_user_id: Any) -> Optional[str]:
+    return LINKS.discord_for_roblox(roblox_user_id)
+
+def api_resolve_account(account_number: Optional[str], roblox_user_id: Optional[int]) -> str:
+    if account_number:
+        acc = str(account_number).strip()
+        if LEDGER.row_for_account(acc) is None:
+            raise game_api.ApiError(404, "account not found")
+        return acc
+    if roblox_user_id is not None:
+        discord_id = discord_id_for_roblox(roblox_user_id)
+        if discord_id is None:
+            raise game_api.ApiError(404, "roblox user not linked")
+        acc = LEDGER.account_for_user(discord_id)
+        if not acc:
+            raise game_api.ApiError(404, "linked user has no account")
+        return acc
+    raise game_api.ApiError(400, "account_number or roblox_user_id required")
+
+def map_adjust(map_name: str, acc: str, amount: int, memo: str, debit: bool) -> Dict[str, Any]:
+    # TRANSFERS 잠금 안에서 호출: 동결/잔액을 다시 확인하고 봇과 같은 원장에 기록
+    if is_account_frozen(acc):
+        raise game_api.ApiError(409, "account frozen")
+    row = LEDGER.row_for_account(acc)
+    if row is None:
+        raise game_api.ApiError(404, "account not found")
+    if debit and int(row.get("잔액", 0)) < amount:
+        raise game_api.ApiError(409, "insufficient balance")
+    memo_text = f"[{map_name}] {memo}".strip()
+    if debit:
+        entry = add_transaction("맵차감", acc, game_api.MAP_PARTY, amount, 0, memo_text, deltas={acc: -amount})
+    else:
+        entry = add_transaction("맵지급", game_api.MAP_PARTY, acc, amount, 0, memo_text, deltas={acc: amount})
+    return {"ok": True, "account_number": acc, "amount": amount, "balance": entry["balances"][acc], "seq": entry.get("seq")}
+
+async def api_once(map_name: str, idempotency_key: Optional[str], route: str, body: Any, fn) -> JSONResponse:
+    # Idempotency-Key 헤더가 있으면 맵별로 한 번만 실행하고, 재시도에는 처음 응답(성공/오류)을 그대로 돌려준다
+    key = f"api:{map_name}:{idempotency_key.strip()}" if idempotency_key else None
+    fp = fingerprint([route, body.model_dump()]) if key else None
+    try:
+        result, replayed = await IDEMPOTENCY.run(key, fn, fp=fp)
+    except IdempotencyConflict as e:
+        raise game_api.ApiError(422, str(e))
+    return JSONResponse(result, headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+@app.post("/api/roblox/verify-code")
+async def api_verify_code(body: game_api.VerifyCodeRequest, map_name: str = Depends(map_auth),
+                          idempotency_key: Optional[str] = Header(None)):
+    return await api_once(map_name, idempotency_key, "verify-code", body, lambda: verify_link_code(map_name, body))
+
+def verify_link_code(map_name: str, body: game_api.VerifyCodeRequest) -> Dict[str, Any]:
+    discord_id = LINKS.verify(body.code)
+    if discord_id is None:
+        raise game_api.ApiError(404, "invalid or expired code")
+    owner = LINKS.discord_for_roblox(body.roblox_user_id)
+    if owner is not None and owner != discord_id:
+        raise game_api.ApiError(409, "roblox user already linked to another account")
+    LINKS.link(discord_id, body.roblox_user_id, body.roblox_username, map=map_name)
+    return {"ok": True, "discord_user_id": discord_id, "account_number": LEDGER.account_for_user(discord_id)}
+
+@app.get("/api/roblox/balance")
+async def api_balance(account_number: Optional[str] = None, roblox_user_id: Optional[int] = None,
+                      map_name: str = Depends(map_auth)):
+    acc = api_resolve_account(account_number, roblox_user_id)
+    row = LEDGER.row_for_account(acc) or {}
+    return {"ok": True, "account_number": acc, "name": row.get("이름", "?"), "balance": int(row.get("잔액", 0)),
+            "frozen": is_account_frozen(acc)}
+
+@app.post("/api/roblox/credit")
+async def api_credit(body: game_api.AdjustRequest, map_name: str = Depends(map_auth),
+                     idempotency_key: Optional[str] = Header(None)):
+    async def _credit():
+        acc = api_resolve_account(body.account_number, body.roblox_user_id)
+        return await TRANSFERS.run([acc], lambda: map_adjust(map_name, acc, body.amount, body.memo, debit=False))
+    return await api_once(map_name, idempotency_key, "credit", body, _credit)
+
+@app.post("/api/roblox/batch")
+async def api_batch(body: game_api.BatchRequest, map_name: str = Depends(map_auth),
+                    idempotency_key: Optional[str] = Header(None)):
+    if len(body.items) > API_BATCH_MAX:
+        raise game_api.ApiError(413, f"too many items (max {API_BATCH_MAX})")
+    return await api_once(map_name, idempotency_key, "batch", body, lambda: run_map_batch(map_name, body))
+
+async def run_map_batch(map_name: str, body: game_api.BatchRequest) -> Dict[str, Any]:
+    rows = []
+    for i, item in enumerate(body.items):
+        row = {"index": i, "amount": item.amount, "memo": item.memo, "account_number": item.account_number}
+        try:
+            row["account_number"] = api_resolve_account(item.account_number, item.roblox_user_id)
+        except game_api.ApiError as e:
+            row["error"] = e.message
+        rows.append(row)
+    accounts = {r["account_number"] for r in rows if not r.get("error")}
+    # 배치 안의 모든 계좌를 한 번에 잠그고 저널 append 한 번으로 기록
+    return await TRANSFERS.run(accounts, lambda: map_batch(map_name, rows, body.all_or_nothing))
+
+@app.post("/api/roblox/debit")
+async def api_debit(body: game_api.AdjustRequest, map_name: str = Depends(map_auth),
+                    idempotency_key: Optional[str] = Header(None)):
+    async def _debit():
+        acc = api_resolve_account(body.account_number, body.roblox_user_id)
+        return await TRANSFERS.run([acc], lambda: map_adjust(map_name, acc, body.amount, body.memo, debit=True))
+    return await api_once(map_name, idempotency_key, "debit", body, _debit)
+
+API_BATCH_MAX = int(os.environ.get("API_BATCH_MAX", 500))
+
+def map_batch(map_name: str, rows: List[Dict[str, Any]], all_or_nothing: bool) -> Dict[str, Any]:
+    # TRANSFERS 잠금 안에서 호출: 같은 계좌가 여러 번 나와도 누적 잔액으로 검증하고, 통과한 행을 한 번에 기록
+    staged: Dict[str, int] = {}
+    lines = []
+    for r in rows:
+        if r.get("error"):
+            continue
+        acc, amount = r["account_number"], r["amount"]
+        if amount == 0:
+            r["error"] = "amount must not be zero"; continue
+        if is_account_frozen(acc):
+            r["error"] = "account frozen"; continue
+        row = LEDGER.row_for_account(acc)
+        if row is None:
+            r["error"] = "account not found"; continue
+        cur = staged.get(acc, int(row.get("잔액", 0)))
+        if cur + amount < 0:
+            r["error"] = "insufficient balance"; continue
+        staged[acc] = cur + amount
+        memo_text = f"[{map_name}] {r['memo']}".strip()
+        if amount > 0:
+            lines.append({"type": "맵지급", "from_user": game_api.MAP_PARTY, "to_user": acc, "amount": amount,
+                          "memo": memo_text, "deltas": {acc: amount}})
+        else:
+            lines.append({"type": "맵차감", "from_user": acc, "to_user": game_api.MAP_PARTY, "amount": -amount,
+                          "memo": memo_text, "deltas": {acc: amount}})
+        r["line"] = len(lines) - 1
+    failed = sum(1 for r in rows if r.get("error"))
+    entries = []
+    if lines and not (all_or_nothing and failed):
+        entries = LEDGER.post_many(lines)
+    results = []
+    for r in rows:
+        out = {"index": r["index"], "account_number": r.get("account_number"), "amount": r.get("amount")}
+        if r.get("error"):
+            out.update(ok=False, error=r["error"])
+        elif not entries:
+            out.update(ok=False, error="batch rejected")
+        else:
+            entry = entries[r["line"]]
+            out.update(ok=True, balance=entry["balances"][r["account_number"]], seq=entry.get("seq"))
+        results.append(out)
+    applied = len(entries)
+    return {"ok": failed == 0, "applied": applied, "failed": len(rows) - applied, "results": results}
+
+WEB_TASK = None
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+@app.get("/metrics")
+async def api_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        return PlainTextResponse("unauthorized", status_code=401)
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+async def serve_fastapi():
+    config = uvicorn.Config(app, host="0.0.0.0", port=FASTAPI_PORT, log_level="warning", access_log=False)
+    await uvicorn.Server(config).serve()
 
 def start_web_server():
-    t = threading.Thread(target=run_fastapi, daemon=True)
-    t.start()
+    # 봇과 같은 이벤트 루프에서 돌려서 LEDGER/TRANSFERS 를 그대로 공유한다 (스레드 간 잠금 없음)
+    global WEB_TASK
+    WEB_TASK = asyncio.create_task(serve_fastapi())
 
 intents = discord.Intents.default()
 intents.guilds = True
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# 슬래시 명령마다 시작 시각을 interaction.extras 에 기록하고, 첫 응답(send_message/defer 등)과 완료까지 걸린 시간을 잰다
+# 응답 종류는 완료 시점의 interaction.response.type 으로, 응답 시각은 defer_response/safe_reply 가 직접 남긴다
+DEFERRED_RESPONSE_TYPES = (discord.InteractionResponseType.deferred_channel_message,
+                           discord.InteractionResponseType.deferred_message_update)
+
+def note_ack(interaction: discord.Interaction):
+    interaction.extras.setdefault("acked_at", time.perf_counter())
+
+async def defer_response(interaction: discord.Interaction, **kwargs):
+    await interaction.response.defer(**kwargs)
+    note_ack(interaction)
+
+def finish_command(interaction: discord.Interaction, failed: bool = False, timed_out: bool = False):
+    started = interaction.extras.pop("command_started", None)
+    if started is None:
+        return
+    name = interaction.extras.get("command_name", "?")
+    now = time.perf_counter()
+    response_type = interaction.response.type
+    if timed_out:
+        # 10062 Unknown interaction: 3초 안에 응답하지 못했다
+        kind = "timed_out"
+    elif response_type is None:
+        kind = "none"
+    else:
+        kind = "deferred" if response_type in DEFERRED_RESPONSE_TYPES else "immediate"
+    METRICS.observe("ssibal_command_seconds", now - started, command=name)
+    if response_type is not None and not timed_out:
+        # 바로 응답하는 명령은 대개 마지막에 send_message 하므로, 따로 남긴 시각이 없으면 완료 시각을 쓴다
+        METRICS.observe("ssibal_command_ack_seconds", interaction.extras.get("acked_at", now) - started, command=name)
+    METRICS.inc("ssibal_interaction_acks_total", command=name, kind=kind)
+    if failed:
+        METRICS.inc("ssibal_command_errors_total", command=name)
+
+class MetricsTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["command_name"] = interaction.command.qualified_name if interaction.command else "?"
+        interaction.extras["command_started"] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        original = getattr(error, "original", error)
+        finish_command(interaction, failed=True,
+                       timed_out=isinstance(original, discord.NotFound) and original.code == 10062)
+        await super().on_error(interaction, error)
+
+bot = commands.Bot(command_prefix="!", intents=intents, tree_cls=MetricsTree)
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    finish_command(interaction)
 
 def get_user_by_id(user_id):
-    mapping = load_account_mapping()
-    for account_num, data in mapping.items():
-        if data.get('user_id') == user_id:
-            return data.get('discord_name')
-    return None
+    account_num = LEDGER.account_for_user(user_id)
+    data = load_account_mapping().get(account_num) if account_num else None
+    return data.get('discord_name') if isinstance(data, dict) else None
 
 @bot.tree.command(name="잔액", description="자신의 계좌 정보를 확인합니다")
 async def check_balance(interaction: discord.Interaction):
@@ -236,7 +639,7 @@ async def check_balance(interaction: discord.Interaction):
     try:
         try:
             if not interaction.response.is_done():
-                await interaction.response.defer(ephemeral=True, thinking=False)
+                await defer_response(interaction, ephemeral=True, thinking=False)
         except Exception as de:
             print(f"[check_balance] defer failed: {de}")
         try:
@@ -270,28 +673,29 @@ async def check_balance(interaction: discord.Interaction):
 async def create_account(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     users = load_users()
-    mapping = load_account_mapping()
-    if user_id in users:
+    if user_id in users or LEDGER.account_for_user(user_id):
         await interaction.response.send_message("⚠️ 이미 계좌가 존재합니다. `/잔액` 명령어로 확인하세요.", ephemeral=True)
         return
-    for k, v in mapping.items():
-        if (isinstance(v, dict) and (v.get('user_id') == interaction.user.id or v.get('user_id') == user_id)):
-            await interaction.response.send_message("⚠️ 이미 계좌가 존재합니다. `/잔액` 명령어로 확인하세요.", ephemeral=True)
-            return
-    account_number = generate_account_number()
-    users[user_id] = {
-        "이름": interaction.user.display_name,
-        "계좌번호": account_number,
-        "잔액": 1000000
-    }
-    save_users(users)
-    mapping[account_number] = {
-        "user_id": interaction.user.id,
-        "discord_name": interaction.user.display_name,
-        "created_at": datetime.now().isoformat()
-    }
-    save_account_mapping(mapping)
-    add_transaction("계좌생성", "SYSTEM", account_number, 1000000, 0, "신규 계좌 생성")
+    def _create():
+        account_number = generate_account_number()
+        try:
+            add_transaction("계좌생성", "SYSTEM", account_number, 1000000, 0, "신규 계좌 생성",
+                deltas={account_number: 1000000},
+                upserts={
+                    "users": {user_id: {"이름": interaction.user.display_name, "계좌번호": account_number, "잔액": 0}},
+                    "account_mapping": {account_number: {
+                        "user_id": interaction.user.id,
+                        "discord_name": interaction.user.display_name,
+                        "created_at": datetime.now().isoformat()
+                    }}
+                })
+        except Exception:
+            ACCOUNTS.release(account_number)
+            raise
+        return account_number
+    account_number, replayed = await run_once(interaction, _create)
+    if replayed:
+        return
     embed = discord.Embed(title="🎉 계좌 생성 완료!", color=0x00ff00)
     embed.add_field(name="계좌번호", value=f"`{account_number}`", inline=False)
     embed.add_field(name="예금주", value=interaction.user.display_name, inline=False)
@@ -338,6 +742,21 @@ async def debug_trace(interaction: discord.Interaction):
     except Exception as e:
         await safe_reply(interaction, content=f"디버그 실패: {e}")
 
+@bot.tree.command(name="정합성검사", description="[관리자] users.json 과 account_mapping.json 사이의 불일치를 확인합니다")
+async def consistency_check(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await safe_reply(interaction, content="❌ 관리자만 사용")
+        return
+    issues = LEDGER.check_consistency()
+    if not issues:
+        await safe_reply(interaction, content="✅ 불일치 없음")
+        return
+    val = "\n".join(issues[:30])
+    if len(issues) > 30:
+        val += f"\n...(외 {len(issues) - 30}건)"
+    embed = discord.Embed(title=f"⚠️ 불일치 {len(issues)}건", description=val[:4000], color=0xff9800)
+    await safe_reply(interaction, embed=embed)
+
 @bot.tree.command(name="정보", description="다른 사용자의 계좌 정보를 조회합니다")
 async def user_info(interaction: discord.Interaction, 멤버: discord.Member):
     user_id = str(멤버.id)
@@ -375,18 +794,14 @@ async def transfer_money(interaction: discord.Interaction, 받는사람: discord
         await interaction.response.send_message("❌ 자신에게는 송금할 수 없습니다.", ephemeral=True); return
     if 금액 <= 0:
         await interaction.response.send_message("❌ 송금 금액은 0보다 커야 합니다.", ephemeral=True); return
-    if is_account_frozen(sender_account) or is_account_frozen(recipient_account):
-        await interaction.response.send_message("❌ 동결된 계좌가 포함되어 있습니다.", ephemeral=True); return
-    fee = calculate_transaction_fee(금액)
-    total_amount = 금액 + fee
-    if int(sender_data.get("잔액", 0)) < total_amount:
-        await interaction.response.send_message(
-            f"❌ 잔액 부족. 필요액 {format_number_4digit(total_amount)}원", ephemeral=True
-        ); return
-    users[sender_id]["잔액"] = int(users[sender_id].get("잔액", 0)) - total_amount
-    users[recipient_id]["잔액"] = int(users[recipient_id].get("잔액", 0)) + 금액
-    save_users(users)
-    add_transaction("송금", sender_account, recipient_account, 금액, fee, 메모)
+    try:
+        entry, replayed = await run_once(interaction, lambda: TRANSFERS.run((sender_account, recipient_account),
+            lambda: transfer_checked("송금", sender_account, recipient_account, 금액, 메모)))
+    except TransferError as e:
+        await interaction.response.send_message(str(e), ephemeral=True); return
+    if replayed:
+        return
+    fee = entry["fee"]
     embed = discord.Embed(title="💸 송금 완료", color=0x00ff00)
     embed.add_field(name="송금자", value=f"{interaction.user.display_name} (`{sender_account}`)", inline=False)
     embed.add_field(name="수취인", value=f"{받는사람.display_name} (`{recipient_account}`)", inline=False)
@@ -399,11 +814,7 @@ async def transfer_by_account(interaction: discord.Interaction, 계좌번호: st
     sender_id = str(interaction.user.id)
     users = load_users()
     sender_data = users.get(sender_id)
-    recipient_id = None
-    for uid, data in users.items():
-        if isinstance(data, dict) and data.get("계좌번호") == 계좌번호:
-            recipient_id = uid
-            break
+    recipient_id = get_user_by_account_number(계좌번호)
     if not sender_data:
         await interaction.response.send_message("❌ 계좌가 없습니다. `/계좌생성` 명령어로 먼저 계좌를 만드세요.", ephemeral=True); return
     if not recipient_id:
@@ -412,16 +823,14 @@ async def transfer_by_account(interaction: discord.Interaction, 계좌번호: st
         await interaction.response.send_message("❌ 자신에게는 송금할 수 없습니다.", ephemeral=True); return
     if 금액 <= 0:
         await interaction.response.send_message("❌ 송금 금액은 0보다 커야 합니다.", ephemeral=True); return
-    if is_account_frozen(sender_data["계좌번호"]) or is_account_frozen(계좌번호):
-        await interaction.response.send_message("❌ 동결된 계좌가 포함되어 있습니다.", ephemeral=True); return
-    fee = calculate_transaction_fee(금액)
-    total_amount = 금액 + fee
-    if int(sender_data.get("잔액", 0)) < total_amount:
-        await interaction.response.send_message(f"❌ 잔액 부족. 필요액 {format_number_4digit(total_amount)}원", ephemeral=True); return
-    users[sender_id]["잔액"] = int(users[sender_id].get("잔액", 0)) - total_amount
-    users[recipient_id]["잔액"] = int(users[recipient_id].get("잔액", 0)) + 금액
-    save_users(users)
-    add_transaction("송금", sender_data["계좌번호"], 계좌번호, 금액, fee, 메모)
+    try:
+        entry, replayed = await run_once(interaction, lambda: TRANSFERS.run((sender_data["계좌번호"], 계좌번호),
+            lambda: transfer_checked("송금", sender_data["계좌번호"], 계좌번호, 금액, 메모)))
+    except TransferError as e:
+        await interaction.response.send_message(str(e), ephemeral=True); return
+    if replayed:
+        return
+    fee = entry["fee"]
     embed = discord.Embed(title="💸 송금 완료", color=0x00ff00)
     embed.add_field(name="보낸 계좌", value=f"`{sender_data['계좌번호']}`", inline=True)
     embed.add_field(name="받는 계좌", value=f"`{계좌번호}`", inline=True)
@@ -434,11 +843,7 @@ async def freeze_account(interaction: discord.Interaction, 계좌번호: str, 
     if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ 관리자만 사용할 수 있는 명령어입니다.", ephemeral=True); return
     users = load_users()
-    user_id = None
-    for uid, data in users.items():
-        if isinstance(data, dict) and data.get("계좌번호") == 계좌번호:
-            user_id = uid
-            break
+    user_id = get_user_by_account_number(계좌번호)
     if not user_id:
         await interaction.response.send_message("❌ 존재하지 않는 계좌번호입니다.", ephemeral=True); return
     if is_account_frozen(계좌번호):
@@ -455,11 +860,7 @@ async def unfreeze_account(interaction: discord.Interaction, 계좌번호: str):
     if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ 관리자만 사용할 수 있는 명령어입니다.", ephemeral=True); return
     users = load_users()
-    user_id = None
-    for uid, data in users.items():
-        if isinstance(data, dict) and data.get("계좌번호") == 계좌번호:
-            user_id = uid
-            break
+    user_id = get_user_by_account_number(계좌번호)
     if not user_id:
         await interaction.response.send_message("❌ 존재하지 않는 계좌번호입니다.", ephemeral=True); return
     if not is_account_frozen(계좌번호):
@@ -472,24 +873,101 @@ async def modify_balance(interaction: discord.Interaction, 계좌번호: str, 
     if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ 관리자만 사용할 수 있는 명령어입니다.", ephemeral=True); return
     users = load_users()
-    user_id = None
-    for uid, data in users.items():
-        if isinstance(data, dict) and data.get("계좌번호") == 계좌번호:
-            user_id = uid
-            break
+    user_id = get_user_by_account_number(계좌번호)
     if not user_id:
         await interaction.response.send_message("❌ 존재하지 않는 계좌번호입니다.", ephemeral=True); return
-    old = int(users[user_id].get("잔액", 0))
-    users[user_id]["잔액"] = int(금액)
-    save_users(users)
-    add_transaction("관리자수정", "ADMIN", 계좌번호, 금액 - old, 0, 사유)
+    def _modify():
+        old = int(users[user_id].get("잔액", 0))
+        add_transaction("관리자수정", "ADMIN", 계좌번호, 금액 - old, 0, 사유, deltas={계좌번호: int(금액) - old})
+        return old
+    old, replayed = await run_once(interaction, lambda: TRANSFERS.run((계좌번호,), _modify))
+    if replayed:
+        return
     await interaction.response.send_message(
         f"⚙️ 잔액 수정 완료: `{계좌번호}` {format_number_4digit(old)} → {format_number_4digit(int(금액))}원",
         ephemeral=True
     )
 
+ACCOUNT_LIST_PAGE_SIZE = 20
+ACCOUNT_SORT_LABELS = {"account": "계좌번호순", "balance": "잔액 많은순", "name": "이름순"}
+
+def account_list_embed(result, sort: str, conditions: List[str]) -> discord.Embed:
+    embed = discord.Embed(title="📋 계좌 목록", color=0x0099ff)
+    frozen = SETTINGS.snapshot().frozen_accounts
+    lines = [f"{'🔒' if row.account in frozen else '✅'} `{row.account}` - {row.name} ({format_number_4digit(row.balance)}원)"
+             for row in result.rows]
+    val = "\n".join(lines) or "조건에 맞는 계좌가 없습니다."
+    if len(val) > 1024: val = val[:1000] + "\n...(생략)"
+    embed.add_field(name=f"계좌 ({result.page + 1}/{result.pages} 페이지)", value=val, inline=False)
+    if conditions:
+        embed.add_field(name="조건 일치", value=f"{result.matched}개 / {format_number_4digit(result.balance_total)}원", inline=True)
+    embed.add_field(name="총 계좌 수", value=f"{len(DIRECTORY.rows)}개", inline=True)
+    embed.add_field(name="총 자산", value=f"{format_number_4digit(DIRECTORY.total)}원", inline=True)
+    embed.set_footer(text=" · ".join([ACCOUNT_SORT_LABELS[sort]] + conditions))
+    return embed
+
+class AccountListView(ui.View):
+    # 필터 결과는 DIRECTORY 가 캐시하므로 페이지를 넘길 때는 해당 페이지 행만 만든다
+    def __init__(self, sort: str, kind: str, min_balance: Optional[int], max_balance: Optional[int], conditions: List[str]):
+        super().__init__(timeout=300)
+        self.sort = sort
+        self.kind = kind
+        self.min_balance = min_balance
+        self.max_balance = max_balance
+        self.conditions = conditions
+        self.page = 0
+        self.pages = 1
+        self.prev = ui.Button(label="◀ 이전", style=discord.ButtonStyle.secondary)
+        self.next = ui.Button(label="다음 ▶", style=discord.ButtonStyle.secondary)
+        self.add_item(self.prev)
+        self.add_item(self.next)
+
+        async def prev_cb(interaction: discord.Interaction):
+            await self._show(interaction, self.page - 1)
+
+        async def next_cb(interaction: discord.Interaction):
+            await self._show(interaction, self.page + 1)
+
+        self.prev.callback = prev_cb
+        self.next.callback = next_cb
+
+    def render(self, page: int) -> discord.Embed:
+        result = DIRECTORY.page(
+            page, ACCOUNT_LIST_PAGE_SIZE, self.sort,
+            frozen=SETTINGS.snapshot().frozen_accounts if self.kind == "frozen" else None,
+            public_only=self.kind == "public",
+            min_balance=self.min_balance, max_balance=self.max_balance)
+        self.page, self.pages = result.page, result.pages
+        self.prev.disabled = self.page == 0
+        self.next.disabled = self.page + 1 >= self.pages
+        return account_list_embed(result, self.sort, self.conditions)
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        if not is_admin(interaction.user.id):
+            await interaction.response.send_message("❌ 관리자만 사용할 수 있습니다.", ephemeral=True)
+            return
+        await interaction.response.edit_message(embed=self.render(page), view=self)
+
 @bot.tree.command(name="계좌목록", description="[관리자] 모든 계좌 목록")
-async def list_accounts(interaction: discord.Interaction):
+@app_commands.choices(
+    정렬=[
+        app_commands.Choice(name="계좌번호순", value="account"),
+        app_commands.Choice(name="잔액 많은순", value="balance"),
+        app_commands.Choice(name="이름순", value="name"),
+    ],
+    필터=[
+        app_commands.Choice(name="전체", value="all"),
+        app_commands.Choice(name="동결 계좌만", value="frozen"),
+        app_commands.Choice(name="공용 계좌만", value="public"),
+    ]
+)
+async def list_accounts(
+    interaction: discord.Interaction,
+    정렬: Optional[app_commands.Choice[str]] = None,
+    필터: Optional[app_commands.Choice[str]] = None,
+    최소잔액: Optional[int] = None,
+    최대잔액: Optional[int] = None
+):
     if not is_admin(interaction.user.id):
         await safe_reply(interaction, content="❌ 관리자만 사용할 수 있는 명령어입니다.")
         return
@@ -497,57 +975,24 @@ async def list_accounts(interaction: discord.Interaction):
         if not mark_interaction_once(interaction):
             print(f"[list_accounts] duplicate ignored id={interaction.id}")
             return
-        VERSION = "acct-list-v2-debug1"
-        import os as _os
-        users = load_users()
-        try:
-            abs_users = _os.path.abspath(DATA_FILE)
-            pid = _os.getpid()
-            print(f"[list_accounts] VERSION={VERSION} pid={pid} users_path={abs_users} count={len(users)} keys_sample={list(users.keys())[:5]}")
-        except Exception as _e:
-            print("[list_accounts] log error", _e)
-        if not users:
+        if not DIRECTORY.rows:
             await safe_reply(interaction, content="❌ 등록된 계좌가 없습니다.")
             return
-        ordered = [ (uid, data) for uid, data in users.items() if isinstance(data, dict) ]
-        def _key(t):
-            try: return int(t[0])
-            except: return 0
-        ordered.sort(key=_key)
-        lines: list[str] = []
-        total = 0
-        for uid, data in ordered:
-            acc = data.get("계좌번호", "????")
-            try:
-                bal = int(data.get("잔액", 0))
-            except Exception:
-                bal = 0
-            total += bal
-            status = "🔒" if (acc and is_account_frozen(acc)) else "✅"
-            name = data.get('이름', '?')
-            lines.append(f"{status} `{acc}` - {name} ({format_number_4digit(bal)}원)")
-        embed = discord.Embed(title="📋 계좌 목록", color=0x0099ff)
-        current_block: list[str] = []
-        current_len = 0
-        block_index = 1
-        for line in lines:
-            l = len(line) + 1
-            if current_len + l > 1024 and current_block:
-                embed.add_field(name=f"계좌 {block_index}", value="\n".join(current_block), inline=False)
-                block_index += 1
-                current_block = [line]
-                current_len = len(line) + 1
-            else:
-                current_block.append(line)
-                current_len += l
-            if len(embed.fields) >= 22:
-                break
-        if current_block and len(embed.fields) < 24:
-            embed.add_field(name=f"계좌 {block_index}", value="\n".join(current_block), inline=False)
-        embed.add_field(name="총 계좌 수", value=f"{len(ordered)}개", inline=True)
-        embed.add_field(name="총 자산", value=f"{format_number_4digit(total)}원", inline=True)
-        embed.set_footer(text=f"{VERSION} pid={_os.getpid()} sample_first_acc={ordered[0][1].get('계좌번호','-') if ordered else '-'}")
-        await safe_reply(interaction, embed=embed)
+        if 최소잔액 is not None and 최대잔액 is not None and 최소잔액 > 최대잔액:
+            await safe_reply(interaction, content="❌ 최소잔액이 최대잔액보다 큽니다.")
+            return
+        sort = 정렬.value if 정렬 else "account"
+        kind = 필터.value if 필터 else "all"
+        conditions = []
+        if kind != "all":
+            conditions.append(필터.name)
+        if 최소잔액 is not None or 최대잔액 is not None:
+            lo = format_number_4digit(최소잔액) if 최소잔액 is not None else ""
+            hi = format_number_4digit(최대잔액) if 최대잔액 is not None else ""
+            conditions.append(f"잔액 {lo}~{hi}원")
+        view = AccountListView(sort, kind, 최소잔액, 최대잔액, conditions)
+        embed = view.render(0)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
     except Exception as e:
         import traceback
         print("[list_accounts] exception:", e)
@@ -561,42 +1006,51 @@ async def create_public_account(interaction: discord.Interaction, 계좌이름:
     public_accounts = load_public_accounts()
     if 계좌이름 in public_accounts:
         await interaction.response.send_message("❌ 이미 존재하는 공용계좌 이름입니다.", ephemeral=True); return
-    account_number = generate_account_number()
-    public_accounts[계좌이름] = {
-        "account_number": account_number,
-        "password": 패스워드,
-        "balance": 초기잔액,
-        "created_at": datetime.now().isoformat(),
-        "created_by": interaction.user.id
-    }
-    save_public_accounts(public_accounts)
-    users = load_users()
-    users[account_number] = {"이름": f"[공용]{계좌이름}", "계좌번호": account_number, "잔액": int(초기잔액), "공용계좌": True}
-    save_users(users)
-    if 초기잔액 > 0:
-        add_transaction("공용계좌생성", "ADMIN", account_number, int(초기잔액), 0, f"{계좌이름} 초기자금")
+    def _create():
+        account_number = generate_account_number()
+        try:
+            add_transaction("공용계좌생성", "ADMIN", account_number, int(초기잔액), 0, f"{계좌이름} 초기자금",
+                deltas={account_number: int(초기잔액)},
+                upserts={
+                    "public_accounts": {계좌이름: {
+                        "account_number": account_number,
+                        "password": 패스워드,
+                        "balance": 초기잔액,
+                        "created_at": datetime.now().isoformat(),
+                        "created_by": interaction.user.id
+                    }},
+                    "users": {account_number: {"이름": f"[공용]{계좌이름}", "계좌번호": account_number, "잔액": 0, "공용계좌": True}}
+                })
+        except Exception:
+            ACCOUNTS.release(account_number)
+            raise
+        return account_number
+    account_number, replayed = await run_once(interaction, _create)
+    if replayed:
+        return
     await interaction.response.send_message(
         f"🏦 공용계좌 생성 완료: {계좌이름} (`{account_number}`)", ephemeral=True
     )
 
-class TreasurySelectView(ui.View):
-    def __init__(self, accounts: Dict[str, Any]):
+class PublicAccountSelectView(ui.View):
+    # 공용계좌 하나를 골라 설정에 저장 (국고, 월급 지급 계좌). apply(settings, 선택값) 이 저장 위치를 정한다
+    def __init__(self, accounts: Dict[str, Any], purpose: str, apply):
         super().__init__(timeout=120)
         options = []
         for name, d in accounts.items():
             label = f"{name} ({d['account_number']})"
-            options.append(discord.SelectOption(label=label, value=name, description="국고로 설정"))
-        self.select = ui.Select(placeholder="국고로 사용할 공용계좌 선택", min_values=1, max_values=1, options=options[:25])
+            options.append(discord.SelectOption(label=label, value=name, description=f"{purpose}로 설정"))
+        self.select = ui.Select(placeholder=f"{purpose}로 사용할 공용계좌 선택", min_values=1, max_values=1, options=options[:25])
         self.add_item(self.select)
 
         async def cb(interaction: discord.Interaction):
             s = load_settings()
             name = self.select.values[0]
             acc = accounts[name]["account_number"]
-            s["treasury_account"] = {"account_number": acc, "account_name": name}
+            apply(s, {"account_number": acc, "account_name": name})
             save_settings(s)
             await interaction.response.edit_message(
-                content=f"✅ 국고 설정 완료: {name} (`{acc}`)", view=None
+                content=f"✅ {purpose} 설정 완료: {name} (`{acc}`)", view=None
             )
         self.select.callback = cb
 
@@ -607,7 +1061,7 @@ async def admin_pick_treasury(interaction: discord.Interaction):
     publics = load_public_accounts()
     if not publics:
         await interaction.response.send_message("공용계좌가 없습니다. 먼저 `/공용계좌생성`", ephemeral=True); return
-    view = TreasurySelectView(publics)
+    view = PublicAccountSelectView(publics, "국고", lambda s, v: s.__setitem__("treasury_account", v))
     await interaction.response.send_message("아래에서 국고로 사용할 공용계좌를 선택하세요.", view=view, ephemeral=True)
 
 @bot.tree.command(name="관리자공용계좌정보조회", description="[관리자] 공용계좌의 계좌번호/비밀번호를 DM으로 받기")
@@ -627,41 +1081,18 @@ async def admin_public_info_dm(interaction: discord.Interaction, 계좌이름: s
     except discord.Forbidden:
         await interaction.response.send_message("❌ DM 전송 실패: DM 허용 여부 확인", ephemeral=True)
 
-@bot.tree.command(name="거래내역", description="최근 거래 내역을 확인합니다")
-async def transaction_history(interaction: discord.Interaction, 개수: int = 10):
-    user_id = str(interaction.user.id)
-    users = load_users()
-    user_data = users.get(user_id)
-    await interaction.response.defer(ephemeral=True)
-    if not user_data:
-        await interaction.followup.send("❌ 계좌가 없습니다. `/계좌생성` 먼저 실행", ephemeral=True)
-        return
-    account_number = user_data.get("계좌번호")
-    if not (1 <= 개수 <= 50):
-        await interaction.followup.send("❌ 개수는 1~50", ephemeral=True)
-        return
-    transactions = load_transactions()
-    user_transactions = []
-    for tx in reversed(transactions):
-        if tx.get("from_user") == account_number or tx.get("to_user") == account_number:
-            user_transactions.append(tx)
-            if len(user_transactions) >= 개수: break
-    if not user_transactions:
-        await interaction.followup.send("거래 내역이 없습니다.", ephemeral=True)
-        return
+HISTORY_SPECIAL = reports.SPECIAL_ACCOUNTS
+
+def history_embed(account_number: str, txs: List[Dict[str, Any]], page: int) -> discord.Embed:
     embed = discord.Embed(title="📊 거래 내역", color=0x0099ff)
     txt = []
-    acc_to_name = {}
-    for v in users.values():
-        if isinstance(v, dict) and "계좌번호" in v:
-            acc_to_name[v["계좌번호"]] = v.get("이름", "?")
-    for tx in user_transactions:
+    kst = pytz.timezone('Asia/Seoul')
+    for tx in txs:
         try:
             ts_raw = datetime.fromisoformat(tx["timestamp"])
             # UTC 시간을 한국시간(KST)으로 변환
             if ts_raw.tzinfo is None:
                 ts_raw = ts_raw.replace(tzinfo=timezone.utc)
-            kst = pytz.timezone('Asia/Seoul')
             ts_kst = ts_raw.astimezone(kst)
             ts = ts_kst.strftime("%m/%d %H:%M")
         except Exception:
@@ -671,13 +1102,82 @@ async def transaction_history(interaction: discord.Interaction, 개수: int = 10
         fee = int(tx.get("fee", 0))
         amt_str = f"+{format_number_4digit(amt)}" if incoming else f"-{format_number_4digit(amt+fee)}"
         other_acc = tx.get("from_user") if incoming else tx.get("to_user")
-        other_name = "SYSTEM" if other_acc in ("SYSTEM","ADMIN","TREASURY") else acc_to_name.get(other_acc, "?")
+        other_name = "SYSTEM" if other_acc in HISTORY_SPECIAL else LEDGER.name_for_account(other_acc)
         memo = f" ({tx.get('memo')})" if tx.get("memo") else ""
         txt.append(f"`{ts}` {'📥' if incoming else '📤'} {tx.get('type','?')} {amt_str}원 / {other_name}{memo}")
-    val = "\n".join(txt)
-    if len(val) > 4000: val = val[:4000] + "\n...(생략)"
-    embed.add_field(name="최근", value=val, inline=False)
-    await interaction.followup.send(embed=embed, ephemeral=True)
+    val = "\n".join(txt) or "거래 내역이 없습니다."
+    if len(val) > 1000: val = val[:1000] + "\n...(생략)"
+    embed.add_field(name="최근" if page == 0 else f"이전 내역 ({page + 1}페이지)", value=val, inline=False)
+    return embed
+
+class TransactionHistoryView(ui.View):
+    # 계좌별 거래 색인에서 페이지 단위로 읽는다. cursors[p] = p 페이지의 before_seq
+    def __init__(self, account_number: str, size: int, txs: List[Dict[str, Any]], more: bool):
+        super().__init__(timeout=180)
+        self.account_number = account_number
+        self.size = size
+        self.page = 0
+        self.cursors: List[Optional[int]] = [None]
+        self.txs = txs
+        self.more = more
+        self.older = ui.Button(label="◀ 이전 내역", style=discord.ButtonStyle.secondary)
+        self.newer = ui.Button(label="최근 ▶", style=discord.ButtonStyle.secondary)
+        self.add_item(self.older)
+        self.add_item(self.newer)
+        self._sync_buttons()
+
+        async def older_cb(interaction: discord.Interaction):
+            if not self.more or not self.txs:
+                await interaction.response.defer(); return
+            if self.page + 1 == len(self.cursors):
+                self.cursors.append(int(self.txs[-1]["seq"]))
+            await self._show(interaction, self.page + 1)
+
+        async def newer_cb(interaction: discord.Interaction):
+            if self.page == 0:
+                await interaction.response.defer(); return
+            await self._show(interaction, self.page - 1)
+
+        self.older.callback = older_cb
+        self.newer.callback = newer_cb
+
+    def _sync_buttons(self):
+        self.older.disabled = not self.more
+        self.newer.disabled = self.page == 0
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        try:
+            txs, more = await WORKERS.run_io(
+                JOURNAL.recent_for_account, self.account_number, self.size, self.cursors[page])
+        except WorkerQueueFull:
+            await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+            return
+        self.page, self.txs, self.more = page, txs, more
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=history_embed(self.account_number, txs, page), view=self)
+
+@bot.tree.command(name="거래내역", description="최근 거래 내역을 확인합니다")
+async def transaction_history(interaction: discord.Interaction, 개수: int = 10):
+    user_id = str(interaction.user.id)
+    account_number = LEDGER.account_for_user(user_id)
+    await defer_response(interaction, ephemeral=True)
+    if not account_number:
+        await interaction.followup.send("❌ 계좌가 없습니다. `/계좌생성` 먼저 실행", ephemeral=True)
+        return
+    if not (1 <= 개수 <= 50):
+        await interaction.followup.send("❌ 개수는 1~50", ephemeral=True)
+        return
+    try:
+        # 계좌별 posting list 에서 최근 개수만큼만 읽는다 (전체 내역을 훑지 않음)
+        user_transactions, more = await WORKERS.run_io(JOURNAL.recent_for_account, account_number, 개수)
+    except WorkerQueueFull:
+        await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+        return
+    if not user_transactions:
+        await interaction.followup.send("거래 내역이 없습니다.", ephemeral=True)
+        return
+    view = TransactionHistoryView(account_number, 개수, user_transactions, more)
+    await interaction.followup.send(embed=history_embed(account_number, user_transactions, 0), view=view, ephemeral=True)
 
 @bot.tree.command(name="수수료설정", description="[관리자] 거래 수수료를 설정합니다")
 async def set_transaction_fee(interaction: discord.Interaction, 활성화: bool, 최소금액: int = 0, 수수료율: float = 0.0):
@@ -752,6 +1252,7 @@ async def set_tax_system(
             "tax_name": 세금명
         }
         save_settings(s)
+        SCHEDULER.reschedule("tax")
 
     if is_master_password:
         if removed_here:
@@ -810,8 +1311,33 @@ async def tax_list(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+async def collect_tax_now() -> Dict[str, Any]:
+    # /세금징수 와 주기 징수 작업이 함께 쓴다. 징수 기록과 last_collected 갱신을 같은 배치로 커밋
+    s = load_settings()
+    tax = s.get("tax_system", {})
+    rate = float(tax.get("rate", 0))
+    name = tax.get("tax_name", "세금")
+    treasury = s.get("treasury_account")
+    treasury_acc = treasury.get("account_number") if treasury else None
+    if not get_user_by_account_number(treasury_acc):
+        treasury_acc = None
+    async with TRANSFERS.exclusive():
+        # 잔액 배열로 한 번에 계산하고, 국고 입금까지 배치 레코드 하나 + 계좌별 항목을 한 번에 기록
+        plan = tax_engine.plan_tax(load_users(), SETTINGS.snapshot().frozen_accounts, rate)
+        marker = {**tax, "last_collected": datetime.now().isoformat()}
+        if plan["count"]:
+            items = tax_engine.tax_batch_items(plan, name, treasury_acc)
+            items[0]["upserts"] = {"settings": {"tax_system": marker}}
+            LEDGER.post_many(items)
+        else:
+            s["tax_system"] = marker
+            save_settings(s)
+    SETTINGS.invalidate()
+    SCHEDULER.reschedule("tax")
+    return {"count": plan["count"], "total": plan["total"]}
+
 @bot.tree.command(name="세금징수", description="[관리자] 즉시 세금을 징수합니다")
-async def collect_tax(interaction: discord.Interaction):
+async def collect_tax(interaction: discord.Interaction, 미리보기: bool = False):
     if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ 관리자만 사용가능합니다.", ephemeral=True); return
     s = load_settings()
@@ -822,37 +1348,34 @@ async def collect_tax(interaction: discord.Interaction):
     # 관리자 트리거로 설정된 세금은 징수하지 않음
     if tax.get("tax_name") == "장비를 정지합니다.":
         await interaction.response.send_message("세금 시스템 비활성화", ephemeral=True); return
-    await interaction.response.defer(ephemeral=True)
-    users = load_users()
+    await defer_response(interaction, ephemeral=True)
     rate = float(tax.get("rate", 0))
     name = tax.get("tax_name", "세금")
-    total = 0; cnt = 0
-    for user_id, data in users.items():
-        if not isinstance(data, dict): continue
-        if data.get("공용계좌") or is_account_frozen(data.get("계좌번호")): 
-            continue
-        bal = int(data.get("잔액", 0))
-        amt = int(bal * rate)
-        if amt > 0:
-            users[user_id]["잔액"] = bal - amt
-            total += amt; cnt += 1
-            add_transaction(name, data.get("계좌번호"), "TREASURY", amt, 0, f"{name} 징수")
-    save_users(users)
     treasury = s.get("treasury_account")
-    if treasury:
-        treasury_acc = treasury.get("account_number")
-        treasury_uid = None
-        for uid, d in users.items():
-            if isinstance(d, dict) and d.get("계좌번호") == treasury_acc:
-                treasury_uid = uid
-                break
-        if treasury_uid:
-            users = load_users()
-            users[treasury_uid]["잔액"] = int(users[treasury_uid].get("잔액", 0)) + total
-            save_users(users)
-    s["tax_system"]["last_collected"] = datetime.now().isoformat()
-    save_settings(s)
-    await interaction.followup.send(f"🏛️ {name} 징수: {cnt}계좌 / {format_number_4digit(total)}원", ephemeral=True)
+    treasury_acc = treasury.get("account_number") if treasury else None
+    if not get_user_by_account_number(treasury_acc):
+        treasury_acc = None
+    frozen = SETTINGS.snapshot().frozen_accounts
+    if 미리보기:
+        plan = tax_engine.plan_tax(load_users(), frozen, rate)
+        embed = discord.Embed(title=f"🔍 {name} 징수 미리보기", color=0x0099ff)
+        embed.add_field(name="세금률", value=f"{rate * 100:.2f}%", inline=True)
+        embed.add_field(name="징수 대상", value=f"{plan['count']} / {plan['eligible']}계좌", inline=True)
+        embed.add_field(name="징수 총액", value=f"{format_number_4digit(plan['total'])}원", inline=True)
+        embed.add_field(name="국고 계좌", value=f"`{treasury_acc}`" if treasury_acc else "설정되지 않음 (징수액 소멸)", inline=False)
+        embed.add_field(name="누적 세수", value=f"{format_number_4digit(ECONOMY.totals['tax'])}원", inline=True)
+        top = sorted(zip(plan["amounts"], plan["accounts"]), reverse=True)[:10]
+        if top:
+            embed.add_field(name="상위 징수 계좌", value="\n".join(
+                f"`{acc}` {LEDGER.name_for_account(acc)}: {format_number_4digit(amt)}원" for amt, acc in top), inline=False)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    plan, replayed = await run_once(interaction, collect_tax_now)
+    if replayed:
+        return
+    await interaction.followup.send(
+        f"🏛️ {name} 징수: {plan['count']}계좌 / {format_number_4digit(plan['total'])}원 (누적 {format_number_4digit(ECONOMY.totals['tax'])}원)",
+        ephemeral=True)
 
 @bot.tree.command(name="세금삭제", description="[관리자] 세금 시스템을 비활성화하고 초기화합니다")
 async def delete_tax(interaction: discord.Interaction):
@@ -876,6 +1399,7 @@ async def delete_tax(interaction: discord.Interaction):
         "tax_name": "세금"
     }
     save_settings(settings)
+    SCHEDULER.reschedule("tax")
     
     embed = discord.Embed(title="🗑️ 세금 시스템 삭제", color=0xff4444)
     embed.add_field(name="상태", value="세금 시스템이 비활성화되고 초기화되었습니다.", inline=False)
@@ -897,7 +1421,13 @@ def extract_alias_from_name(name: str) -> str:
     기간=[
         app_commands.Choice(name="최근 3일", value="3d"),
         app_commands.Choice(name="최근 7일", value="7d"),
+        app_commands.Choice(name="최근 30일", value="30d"),
         app_commands.Choice(name="전체", value="all"),
+    ],
+    형식=[
+        app_commands.Choice(name="엑셀 (xlsx)", value="xlsx"),
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="CSV (gzip)", value="csv.gz"),
     ]
 )
 @bot.tree.command(name="엑셀내보내기", description="[관리자] 거래내역을 엑셀로 내보냅니다 (기간 필터)")
@@ -905,22 +1435,34 @@ async def export_excel(
     interaction: discord.Interaction,
     기간: app_commands.Choice[str],
     전체내보내기: bool = True,
+    형식: Optional[app_commands.Choice[str]] = None,
     사용자1: Optional[discord.Member] = None,
     사용자2: Optional[discord.Member] = None,
     사용자3: Optional[discord.Member] = None,
     사용자4: Optional[discord.Member] = None,
-    사용자5: Optional[discord.Member] = None
+    사용자5: Optional[discord.Member] = None,
+    시작일: Optional[str] = None,
+    종료일: Optional[str] = None
 ):
     if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ 관리자만", ephemeral=True); return
-    await interaction.response.defer(ephemeral=True)
 
     now = datetime.now()
     since = None
-    if 기간.value == "3d":
-        since = now - timedelta(days=3)
-    elif 기간.value == "7d":
-        since = now - timedelta(days=7)
+    until = None
+    if 기간.value in EXPORT_PERIOD_DAYS:
+        since = now - timedelta(days=EXPORT_PERIOD_DAYS[기간.value])
+    try:
+        # 시작일/종료일(YYYY-MM-DD)을 주면 기간 선택보다 우선한다. 종료일은 그날 끝까지 포함
+        if 시작일:
+            since = datetime.strptime(시작일.strip(), "%Y-%m-%d")
+        if 종료일:
+            until = datetime.strptime(종료일.strip(), "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        await interaction.response.send_message("❌ 날짜는 YYYY-MM-DD 형식으로 입력하세요.", ephemeral=True); return
+    if since and until and since >= until:
+        await interaction.response.send_message("❌ 시작일이 종료일보다 늦습니다.", ephemeral=True); return
+    await defer_response(interaction, ephemeral=True)
 
     targets = []
     if not 전체내보내기:
@@ -932,84 +1474,46 @@ async def export_excel(
             await interaction.followup.send("대상 계좌가 없습니다.", ephemeral=True)
             return
 
-    txs = load_transactions()
-    users = load_users()
-    filtered: List[Dict[str, Any]] = []
-    for t in txs:
-        try:
-            ts = datetime.fromisoformat(t["timestamp"])
-        except Exception:
-            continue
-        if since and ts < since:
-            continue
-        if 전체내보내기 or (t.get("from_user") in targets or t.get("to_user") in targets):
-            filtered.append(t)
-
-    rows = []
-    acc_to_name = {}
-    for uid, v in users.items():
-        if isinstance(v, dict) and "계좌번호" in v:
-            acc_to_name[v["계좌번호"]] = v.get("이름", "?")
-
-    for t in filtered:
-        try:
-            ts = datetime.fromisoformat(t["timestamp"])
-            # UTC 시간을 한국시간(KST)으로 변환
-            if ts.tzinfo is None:
-                ts = ts.replace(tzinfo=timezone.utc)
-            kst = pytz.timezone('Asia/Seoul')
-            ts_kst = ts.astimezone(kst)
-            date_str = ts_kst.strftime("%Y-%m-%d")
-            time_str = ts_kst.strftime("%H:%M:%S")
-        except Exception:
-            date_str = "-"
-            time_str = "-"
-        fu = t.get("from_user")
-        tu = t.get("to_user")
-        fu_name = fu if fu in ("SYSTEM","ADMIN","TREASURY") else acc_to_name.get(fu, "?")
-        tu_name = tu if tu in ("SYSTEM","ADMIN","TREASURY") else acc_to_name.get(tu, "?")
-        rows.append({
-            "날짜": date_str,
-            "시간": time_str,
-            "거래유형": t.get("type",""),
-            "송금자계좌": fu,
-            "송금자이름": fu_name,
-            "수금자계좌": tu,
-            "수금자이름": tu_name,
-            "거래금액": int(t.get("amount", 0)),
-            "수수료": int(t.get("fee", 0)),
-            "메모": t.get("memo","")
-        })
-
-    df = pd.DataFrame(rows)
-    filename = f"거래내보내기_{기간.value}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    path = f"/tmp/{filename}"
+    fmt = 형식.value if 형식 else "xlsx"
+    label = 기간.name
+    tag = 기간.value
+    if 시작일 or 종료일:
+        label = f"{시작일 or '처음'} ~ {종료일 or '현재'}"
+        tag = f"{(시작일 or 'begin').replace('-', '')}-{(종료일 or 'now').replace('-', '')}"
+    base = f"거래내보내기_{tag}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     try:
-        with pd.ExcelWriter(path, engine="openpyxl") as w:
-            df.to_excel(w, index=False, sheet_name="거래내역")
-        with open(path,"rb") as f:
-            await interaction.followup.send(
-                content=f"📊 {기간.name} 기준 총 {len(rows)}건",
-                file=discord.File(f, filename),
-                ephemeral=True
-            )
+        # 기간 색인으로 해당 구간만 읽어서 바로 파일에 쓰므로 전체 내역을 메모리에 올리지 않는다
+        parts, count, truncated = await WORKERS.run_streaming(
+            reports.stream_export, JOURNAL.iter_range(since, until), LEDGER.account_names(), None,
+            None if 전체내보내기 else targets, fmt, EXPORT_MAX_BYTES, EXPORT_SPOOL_BYTES, EXPORT_MAX_PARTS)
+    except WorkerQueueFull:
+        await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+        return
+    ext = reports.EXPORT_FORMATS[fmt]
+    try:
+        for i, (buf, rows) in enumerate(parts, 1):
+            if len(parts) == 1:
+                filename = f"{base}{ext}"
+                content = f"📊 {label} 기준 총 {count}건"
+            else:
+                filename = f"{base}_part{i}{ext}"
+                content = f"📊 {label} 기준 총 {count}건 ({i}/{len(parts)}, {rows}건)"
+            if truncated and i == len(parts):
+                content += f"\n⚠️ 파일 수 제한({EXPORT_MAX_PARTS}개)으로 이후 내역은 생략되었습니다. 기간을 줄여 다시 내보내세요."
+            await interaction.followup.send(content=content, file=discord.File(buf, filename), ephemeral=True)
     finally:
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception:
-            pass
+        for buf, _ in parts:
+            try:
+                buf.close()
+            except Exception:
+                pass
 
 def _generate_code(n=6)->str:
-    return "".join(random.choice(string.digits) for _ in range(n))
+    return "".join(secrets.choice(string.digits) for _ in range(n))
 
 @bot.tree.command(name="연동요청", description="로블록스 계정 연동용 6자리 코드를 발급합니다")
 async def link_request(interaction: discord.Interaction):
-    links = load_links()
-    code = _generate_code()
-    expire = (datetime.now() + timedelta(minutes=10)).isoformat()
-    links["pending"][str(interaction.user.id)] = {"code": code, "expire": expire}
-    save_links(links)
+    code, _ = LINKS.issue(str(interaction.user.id), _generate_code, LINK_CODE_TTL)
     path = "/api/roblox/verify-code"
     url_hint = f"{BASE_URL}{path}" if BASE_URL else f"(서버 배포 후 {path})"
     embed = discord.Embed(title="🔗 연동 코드 발급", color=0x00bcd4)
@@ -1024,8 +1528,7 @@ async def link_request(interaction: discord.Interaction):
 
 @bot.tree.command(name="연동상태", description="내 디스코드-로블록스 연동 상태를 확인합니다")
 async def link_status(interaction: discord.Interaction):
-    links = load_links()
-    info = links["links"].get(str(interaction.user.id))
+    info = LINKS.get(str(interaction.user.id))
     if not info:
         await interaction.response.send_message("❌ 연동되지 않았습니다. `/연동요청`으로 코드를 발급하세요.", ephemeral=True)
         return
@@ -1037,10 +1540,7 @@ async def link_status(interaction: discord.Interaction):
 
 @bot.tree.command(name="연동해제", description="디스코드-로블록스 연동을 해제합니다")
 async def link_unlink(interaction: discord.Interaction):
-    links = load_links()
-    if str(interaction.user.id) in links["links"]:
-        links["links"].pop(str(interaction.user.id), None)
-        save_links(links)
+    if LINKS.unlink(str(interaction.user.id)):
         await interaction.response.send_message("연동 해제 완료", ephemeral=True)
     else:
         await interaction.response.send_message("연동되어 있지 않습니다.", ephemeral=True)
@@ -1055,7 +1555,7 @@ async def admin_import_csv(
         await interaction.response.send_message("관리자만 사용 가능합니다.", ephemeral=True); return
     try:
         if not interaction.response.is_done():
-            await interaction.response.defer(ephemeral=True, thinking=True)
+            await defer_response(interaction, ephemeral=True, thinking=True)
     except Exception:
         pass
     if not (파일.filename.lower().endswith(".csv")):
@@ -1069,14 +1569,11 @@ async def admin_import_csv(
 
     rows = []
     try:
-        df = pd.read_csv(io.StringIO(text))
-        rows = df.to_dict(orient="records")
-    except Exception:
-        try:
-            reader = csv.DictReader(io.StringIO(text))
-            rows = list(reader)
-        except Exception as e2:
-            await interaction.followup.send(f"CSV 파싱 실패: {e2}", ephemeral=True); return
+        rows = await WORKERS.run_report(reports.parse_csv_rows, text)
+    except WorkerQueueFull:
+        await interaction.followup.send(BUSY_MESSAGE, ephemeral=True); return
+    except Exception as e2:
+        await interaction.followup.send(f"CSV 파싱 실패: {e2}", ephemeral=True); return
     if not rows:
         await interaction.followup.send("CSV가 비어있습니다.", ephemeral=True); return
 
@@ -1087,29 +1584,55 @@ async def admin_import_csv(
               "이름":"name","name":"name"}
         return mp.get(k,k)
 
-    users = load_users()
-    created=updated=skipped=0
-    for row in rows:
-        r = {norm(k):v for k,v in row.items()}
-        acc = r.get("account_number"); bal = r.get("balance"); name = r.get("name")
-        if acc is None or bal is None:
-            skipped+=1; continue
-        acc = str(acc).strip()
-        try:
-            bal = int(float(str(bal).replace(",","")))
-        except Exception:
-            skipped+=1; continue
-        if acc not in users:
-            if create_missing:
-                users[acc] = {"이름": str(name or f"사용자({acc})"), "계좌번호": acc, "잔액": bal}
-                created+=1
-            else:
-                skipped+=1
-        else:
-            users[acc]["잔액"] = bal
-            if name: users[acc]["이름"] = str(name)
-            updated+=1
-    save_users(users)
+    async def _merge():
+        async with TRANSFERS.exclusive():
+            users = load_users()
+            created=updated=skipped=0
+            lines = []
+            pending: Dict[str, int] = {}
+            reserved: List[str] = []
+            for row in rows:
+                r = {norm(k):v for k,v in row.items()}
+                acc = r.get("account_number"); bal = r.get("balance"); name = r.get("name")
+                if acc is None or bal is None:
+                    skipped+=1; continue
+                acc = str(acc).strip()
+                try:
+                    bal = int(float(str(bal).replace(",","")))
+                except Exception:
+                    skipped+=1; continue
+                uid = get_user_by_account_number(acc)
+                if uid is None:
+                    # 할당기가 이미 내준 번호(생성 중인 계좌, 같은 CSV 의 앞 행)는 건너뛴다
+                    if create_missing and not ACCOUNTS.is_used(acc):
+                        ACCOUNTS.reserve_existing([acc])
+                        reserved.append(acc)
+                        lines.append({"type": "관리자데이터병합", "from_user": "ADMIN", "to_user": acc, "amount": bal,
+                                      "memo": "CSV 신규 생성", "deltas": {acc: bal},
+                                      "upserts": {"users": {acc: {"이름": str(name or f"사용자({acc})"), "계좌번호": acc, "잔액": 0}}}})
+                        created+=1
+                    else:
+                        skipped+=1
+                else:
+                    old = pending.get(acc, int(users[uid].get("잔액", 0)))
+                    pending[acc] = bal
+                    line = {"type": "관리자데이터병합", "from_user": "ADMIN", "to_user": acc, "amount": bal - old,
+                            "memo": "CSV 잔액 갱신", "deltas": {acc: bal - old}}
+                    if name:
+                        line["upserts"] = {"users": {uid: {**users[uid], "이름": str(name), "잔액": old}}}
+                    lines.append(line)
+                    updated+=1
+            try:
+                LEDGER.post_many(lines)
+            except Exception:
+                for acc in reserved:
+                    ACCOUNTS.release(acc)
+                raise
+        return {"created": created, "updated": updated, "skipped": skipped}
+    counts, replayed = await run_once(interaction, _merge)
+    if replayed:
+        return
+    created, updated, skipped = counts["created"], counts["updated"], counts["skipped"]
     embed = discord.Embed(title="📥 DB 갱신 결과", color=0x00b894)
     embed.add_field(name="업데이트", value=str(updated))
     embed.add_field(name="신규 생성", value=str(created))
@@ -1117,7 +1640,8 @@ async def admin_import_csv(
     await interaction.followup.send(embed=embed, ephemeral=True)
 
 def generate_api_token(n=32):
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=n))
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(alphabet) for _ in range(n))
 
 @bot.tree.command(name="관리자맵api생성", description="[관리자] 새로운 Roblox 맵 API 토큰을 생성합니다")
 async def admin_create_map_api(interaction: discord.Interaction, 맵이름: str):
@@ -1230,7 +1754,8 @@ async def admin_set_user_salary(interaction: discord.Interaction, 대상: discor
     if 월급 < 0:
         await interaction.response.send_message("월급은 0 이상이어야 합니다.", ephemeral=True); return
     set_user_salary(대상.id, 월급)
-    await interaction.response.send_message(f"✅ {대상.display_name}({대상.id})의 월급이 {format_number_4digit(월급)}원으로 설정되었습니다.", ephemeral=True)
+    hint = "" if salary_active(load_settings().get("salary_system") or {}) else "\n⚠️ 월급 시스템이 꺼져 있어 지급되지 않습니다. `/관리자월급시스템`"
+    await interaction.response.send_message(f"✅ {대상.display_name}({대상.id})의 월급이 {format_number_4digit(월급)}원으로 설정되었습니다.{hint}", ephemeral=True)
 
 @bot.tree.command(name="관리자월급수정", description="[관리자] 특정 사용자의 월급을 수정합니다")
 async def admin_modify_user_salary(interaction: discord.Interaction, 대상: discord.Member, 월급: int):
@@ -1248,46 +1773,287 @@ async def admin_remove_user_salary(interaction: discord.Interaction, 대상: dis
     remove_user_salary(대상.id)
     await interaction.response.send_message(f"🗑️ {대상.display_name}({대상.id})의 월급이 삭제되었습니다.", ephemeral=True)
 
+@bot.tree.command(name="관리자월급시스템", description="[관리자] 월급 자동 지급을 켜거나 끕니다")
+async def admin_toggle_salary(interaction: discord.Interaction, 활성화: bool):
+    if not is_admin(interaction.user.id):
+        await interaction.response.send_message("❌ 관리자만 사용", ephemeral=True); return
+    s = load_settings()
+    salary_sys = s.setdefault("salary_system", {})
+    salary_sys["enabled"] = bool(활성화)
+    salary_sys["enabled_at"] = datetime.now().isoformat()
+    save_settings(s)
+    SCHEDULER.reschedule("salary")
+    await interaction.response.send_message(f"✅ 월급 자동 지급 {'활성화' if 활성화 else '비활성화'}", ephemeral=True)
+
+@bot.tree.command(name="관리자월급계좌설정", description="[관리자] 월급을 지급할 공용계좌 선택 (지급 시 이 계좌에서 차감)")
+async def admin_pick_salary_source(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await interaction.response.send_message("❌ 관리자만 사용", ephemeral=True); return
+    publics = load_public_accounts()
+    if not publics:
+        await interaction.response.send_message("공용계좌가 없습니다. 먼저 `/공용계좌생성`", ephemeral=True); return
+    view = PublicAccountSelectView(publics, "월급 지급 계좌",
+                                   lambda s, v: s.setdefault("salary_system", {}).__setitem__("source_account", v))
+    await interaction.response.send_message("아래에서 월급을 지급할 공용계좌를 선택하세요.", view=view, ephemeral=True)
+
+def payroll_embed(title: str, report: Dict[str, Any], color: int) -> discord.Embed:
+    embed = discord.Embed(title=title, color=color)
+    embed.add_field(name="지급 인원", value=f"{report['paid']}명", inline=True)
+    embed.add_field(name="지급 총액", value=f"{format_number_4digit(report['total'])}원", inline=True)
+    source = report.get("source")
+    if source:
+        after = report.get("source_after")
+        embed.add_field(name="지급 계좌", value=f"`{source}` {LEDGER.name_for_account(source)}"
+                        + (f"\n지급 후 잔액 {format_number_4digit(after)}원" if after is not None else ""), inline=False)
+    else:
+        embed.add_field(name="지급 계좌", value="설정되지 않음 (SYSTEM 발행)", inline=False)
+    if report.get("missing"):
+        embed.add_field(name="계좌 없음", value=f"{report['missing']}명", inline=True)
+    if report.get("frozen"):
+        sample = ", ".join(f"`{a}`" for a in report.get("frozen_sample", [])[:10])
+        embed.add_field(name="동결 계좌 제외", value=f"{report['frozen']}계좌\n{sample}", inline=False)
+    return embed
+
+@bot.tree.command(name="월급보고서", description="[관리자] 마지막 월급 지급 보고서 / 다음 회차 미리보기")
+async def salary_report(interaction: discord.Interaction, 미리보기: bool = False):
+    if not is_admin(interaction.user.id):
+        await safe_reply(interaction, content="❌ 관리자만 사용가능한 명령어입니다.")
+        return
+    settings = load_settings()
+    if 미리보기:
+        try:
+            plan = plan_salaries(settings, load_users())
+        except TransferError as e:
+            await safe_reply(interaction, content=str(e))
+            return
+        report = payroll.payroll_report(plan, "-", plan["source_balance"] - plan["total"] if plan["source"] else None)
+        embed = payroll_embed("🔍 월급 지급 미리보기", report, 0x0099ff if plan["sufficient"] else 0xff0000)
+        if not plan["sufficient"]:
+            embed.add_field(name="⚠️ 잔액 부족", value=f"{format_number_4digit(plan['shortfall'])}원 부족", inline=False)
+        await safe_reply(interaction, embed=embed)
+        return
+    report = (settings.get("salary_system") or {}).get("last_report")
+    if not report:
+        await safe_reply(interaction, content="아직 월급 지급 기록이 없습니다.")
+        return
+    if report.get("skipped"):
+        embed = payroll_embed(f"⚠️ 월급 미지급 ({report['date']})", report, 0xff0000)
+        embed.add_field(name="잔액 부족", value=f"필요 {format_number_4digit(report.get('required', 0))}원 · "
+                        f"부족 {format_number_4digit(report.get('shortfall', 0))}원", inline=False)
+    else:
+        embed = payroll_embed(f"💸 월급 지급 보고서 ({report['date']})", report, 0x00ff00)
+    await safe_reply(interaction, embed=embed)
+
 from web import keep_alive
 
-async def auto_pay_salary_task():
-    await bot.wait_until_ready()
-    import pytz
-    kst = pytz.timezone("Asia/Seoul")
-    last_paid_key = "last_paid_user_salary"
-    while not bot.is_closed():
-        now_utc = datetime.now(timezone.utc)
-        now_kst = now_utc.astimezone(kst)
-        if now_kst.weekday() == 5:
-            first_day = now_kst.replace(day=1)
-            first_saturday = 1 + (5 - first_day.weekday()) % 7
-            second_saturday = first_saturday + 7
-            if now_kst.day == second_saturday and now_kst.hour == 0:
-                settings = load_settings()
-                salary_sys = settings.setdefault("salary_system", {})
-                user_salaries = salary_sys.get("user_salaries", {})
-                last_paid = salary_sys.get(last_paid_key)
-                today_str = now_kst.strftime("%Y-%m-%d")
-                if last_paid != today_str:
-                    users = load_users()
-                    paid_users = []
-                    for user_id, amount in user_salaries.items():
-                        if user_id in users and int(amount) > 0:
-                            users[user_id]["잔액"] = int(users[user_id].get("잔액", 0)) + int(amount)
-                            add_transaction("월급지급", "SYSTEM", users[user_id]["계좌번호"], int(amount), 0, memo="월급 자동 지급")
-                            paid_users.append(user_id)
-                    save_users(users)
-                    salary_sys[last_paid_key] = today_str
-                    save_settings(settings)
-                    for guild in bot.guilds:
-                        for channel in guild.text_channels:
-                            if channel.permissions_for(guild.me).send_messages:
-                                try:
-                                    await channel.send(f"💸 {len(paid_users)}명의 사용자에게 월급이 지급되었습니다! (2번째 토요일)")
-                                except Exception:
-                                    pass
-                                break
-        await asyncio.sleep(60 * 60)
+KST = pytz.timezone("Asia/Seoul")
+SALARY_MARKER = "last_paid_user_salary"
+# 재시작/장애로 놓친 월급은 최근 몇 달치까지 따라잡을지
+SALARY_MAX_CATCH_UP = int(os.environ.get("SALARY_MAX_CATCH_UP", 3))
+
+def salary_slot_after(ts: float) -> float:
+    # 매달 2번째 토요일 0시 (KST)
+    return nth_weekday_after(ts, KST, 5, 2, 0)
+
+def salary_active(salary_sys: Dict[str, Any]) -> bool:
+    return bool(salary_sys.get("enabled"))
+
+def salary_next_fire(hint: Optional[float], now: float) -> Optional[float]:
+    salary_sys = load_settings().get("salary_system", {})
+    if not salary_active(salary_sys):
+        return None
+    last = salary_sys.get(SALARY_MARKER)
+    try:
+        base = KST.localize(datetime.strptime(last, "%Y-%m-%d")).timestamp() + 3600
+    except Exception:
+        # 지급 기록이 없으면 지난 회차는 소급하지 않는다
+        base = now
+    fire = salary_slot_after(base)
+    missed = []
+    while fire <= now:
+        missed.append(fire)
+        fire = salary_slot_after(fire)
+    return missed[-SALARY_MAX_CATCH_UP:][0] if missed else fire
+
+def tax_active(tax: Dict[str, Any]) -> bool:
+    # 비활성화, 관리자 트리거 문구, 0% 는 징수하지 않는다 (/세금징수 와 같은 조건)
+    return bool(tax.get("enabled")) and tax.get("tax_name") != "장비를 정지합니다." and float(tax.get("rate", 0)) > 0
+
+def tax_next_fire(hint: Optional[float], now: float) -> Optional[float]:
+    tax = load_settings().get("tax_system", {})
+    if not tax_active(tax):
+        return None
+    period = max(1, int(tax.get("period_days", 30))) * 86400
+    try:
+        return datetime.fromisoformat(tax["last_collected"]).timestamp() + period
+    except Exception:
+        # 설정 직후(징수 기록 없음)는 저장된 예정 시각, 그것도 없으면 지금부터 한 주기 뒤
+        return hint if hint else now + period
+
+async def send_announcement(channel_id: int, payload: Dict[str, Any]):
+    channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+    await channel.send(**payload)
+
+# 공지는 대기열에 넣고 바로 돌아온다. 채널별/전체 속도 제한은 Notifier 워커가 지킨다
+NOTIFIER = Notifier(
+    send_announcement,
+    max_pending=int(os.environ.get("NOTIFY_MAX_PENDING", 1000)),
+    workers=int(os.environ.get("NOTIFY_WORKERS", 2)),
+    route_rate=float(os.environ.get("NOTIFY_CHANNEL_RATE", 1.0)),
+    route_burst=int(os.environ.get("NOTIFY_CHANNEL_BURST", 5)),
+    global_rate=float(os.environ.get("NOTIFY_GLOBAL_RATE", 40)),
+)
+
+def announcement_channel(guild: discord.Guild, channels: Dict[str, Any]) -> Optional[int]:
+    # /관리자공지채널설정 으로 지정한 채널, 없으면 봇이 쓸 수 있는 첫 텍스트 채널
+    configured = channels.get(str(guild.id))
+    if configured and guild.get_channel(int(configured)) is not None:
+        return int(configured)
+    for channel in guild.text_channels:
+        if channel.permissions_for(guild.me).send_messages:
+            return channel.id
+    return None
+
+def announce(text: Optional[str] = None, embed: Optional[discord.Embed] = None) -> int:
+    channels = load_settings().get("announcement_channels") or {}
+    queued = 0
+    for guild in bot.guilds:
+        channel_id = announcement_channel(guild, channels)
+        if channel_id is not None and NOTIFIER.enqueue(channel_id, {"content": text, "embed": embed}):
+            queued += 1
+    return queued
+
+def salary_source_account(settings: Dict[str, Any]) -> Optional[str]:
+    # 월급 지급 계좌 (/관리자월급계좌설정). 설정이 없으면 예전처럼 SYSTEM 이 발행한다
+    return ((settings.get("salary_system") or {}).get("source_account") or {}).get("account_number")
+
+def plan_salaries(settings: Dict[str, Any], users: Dict[str, Any]) -> Dict[str, Any]:
+    salary_sys = settings.get("salary_system") or {}
+    source_acc = salary_source_account(settings)
+    source_uid = get_user_by_account_number(source_acc) if source_acc else None
+    if source_acc and not source_uid:
+        raise TransferError(f"❌ 월급 지급 계좌 `{source_acc}` 가 존재하지 않습니다.")
+    frozen = SETTINGS.snapshot().frozen_accounts
+    if source_acc and source_acc in frozen:
+        raise TransferError(f"❌ 월급 지급 계좌 `{source_acc}` 가 동결되어 있습니다.")
+    source_balance = int(users[source_uid].get("잔액", 0)) if source_uid else None
+    return payroll.plan_payroll(salary_sys.get("user_salaries", {}), users, frozen, source_acc, source_balance)
+
+async def pay_salaries(slot_date: str) -> Dict[str, Any]:
+    # 한 회차 전체를 배치 하나로 계산하고, 지급 계좌 차감 + 모든 입금 + 지급 기록 + 마지막 지급일을 한 번에 커밋한다
+    # 잔액이 모자라면 아무것도 지급하지 않고 그 회차를 건너뛴 것으로 기록한다 (다음 지급일에 다시 계산)
+    async with TRANSFERS.exclusive():
+        settings = load_settings()
+        salary_sys = settings.setdefault("salary_system", {})
+        plan = plan_salaries(settings, load_users())
+        if not plan["sufficient"]:
+            report = payroll.payroll_report({**plan, "count": 0, "total": 0}, slot_date, plan["source_balance"])
+            report.update(skipped="insufficient", required=plan["total"], shortfall=plan["shortfall"])
+            settings["salary_system"] = {**salary_sys, SALARY_MARKER: slot_date, "last_report": report}
+            save_settings(settings)
+            return report
+        source_after = plan["source_balance"] - plan["total"] if plan["source"] else None
+        report = payroll.payroll_report(plan, slot_date, source_after)
+        # 같은 배치에 마지막 지급일을 넣어 재시작해도 같은 회차를 두 번 주지 않는다
+        marker = {**salary_sys, SALARY_MARKER: slot_date, "last_report": report}
+        if plan["count"]:
+            items = payroll.payroll_batch_items(plan)
+            items[0]["upserts"] = {"settings": {"salary_system": marker}}
+            LEDGER.post_many(items)
+        else:
+            settings["salary_system"] = marker
+            save_settings(settings)
+    SETTINGS.invalidate()
+    return report
+
+async def run_salary_job(slot: float):
+    # 예약 후 관리자가 끈 경우를 위해 실행 시점 설정으로 다시 확인 (run_tax_job 과 같음)
+    if not salary_active(load_settings().get("salary_system") or {}):
+        return {"skipped": "salary disabled"}
+    slot_date = datetime.fromtimestamp(slot, KST).strftime("%Y-%m-%d")
+    report = await pay_salaries(slot_date)
+    if report.get("skipped"):
+        announce(f"⚠️ 월급 지급 계좌 잔액 부족으로 {slot_date} 월급이 지급되지 않았습니다. "
+                 f"(부족 {format_number_4digit(report['shortfall'])}원)")
+        return {k: report[k] for k in ("date", "skipped", "required", "shortfall")}
+    announce(f"💸 {report['paid']}명의 사용자에게 월급이 지급되었습니다! (2번째 토요일)")
+    return {k: report[k] for k in ("date", "paid", "total", "missing", "frozen")}
+
+async def run_tax_job(slot: float):
+    # 예약 후(또는 밀린 회차를 따라잡는 사이) 관리자가 끈 경우를 위해 실행 시점 설정으로 다시 확인
+    tax = load_settings().get("tax_system", {})
+    if not tax_active(tax):
+        return {"skipped": "tax disabled"}
+    result = await collect_tax_now()
+    name = tax.get("tax_name", "세금")
+    if result["count"]:
+        announce(f"🏛️ {name} 정기 징수: {result['count']}계좌 / {format_number_4digit(result['total'])}원")
+    return result
+
+def migrate_salary_enabled():
+    # enabled 를 켜는 명령이 없던 때는 월급이 설정되어 있으면 항상 지급했다. 한 번도 켜고 끈 적 없는 설정은 그대로 켜 둔다
+    s = load_settings()
+    salary_sys = s.get("salary_system") or {}
+    if "enabled_at" not in salary_sys and salary_sys.get("user_salaries") and not salary_sys.get("enabled"):
+        s["salary_system"] = {**salary_sys, "enabled": True, "enabled_at": datetime.now().isoformat()}
+        save_settings(s)
+
+migrate_salary_enabled()
+# 월급/주기 세금은 다음 실행 시각 힙에서 정확한 시각에 깨어나 실행 (재시작 시 놓친 회차는 바로 따라잡음)
+SCHEDULER = Scheduler()
+SCHEDULER.load(load_doc(SCHEDULER_FILE))
+SCHEDULER.add(Job("salary", salary_next_fire, run_salary_job))
+SCHEDULER.add(Job("tax", tax_next_fire, run_tax_job))
+
+def save_scheduler():
+    snap = SCHEDULER.snapshot()
+    if snap is not None:
+        save_doc(SCHEDULER_FILE, snap)
+
+atexit.register(save_scheduler)
+
+@bot.tree.command(name="스케줄", description="[관리자] 예약 작업(월급/정기 세금)의 다음 실행 시각과 최근 실행 기록")
+async def schedule_status(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await safe_reply(interaction, content="❌ 관리자만 사용가능한 명령어입니다.")
+        return
+    embed = discord.Embed(title="⏰ 예약 작업", color=0x0099ff)
+    labels = {"salary": "월급", "tax": "정기 세금"}
+    for job in SCHEDULER.stats():
+        nxt = datetime.fromtimestamp(job["next_run"], KST).strftime("%Y-%m-%d %H:%M") if job["next_run"] else "비활성"
+        recent = [f"{h.get('slot', '-')[:16]} {h.get('status', '?')}" + (f" ({h['error'][:40]})" if h.get("error") else "")
+                  for h in list(SCHEDULER.jobs[job["name"]].history)[-3:]]
+        embed.add_field(name=labels.get(job["name"], job["name"]) + (" · 실행 중" if job["running"] else ""),
+                        value=f"다음: {nxt}\n" + ("\n".join(recent) or "실행 기록 없음"), inline=False)
+    await safe_reply(interaction, embed=embed)
+
+@bot.tree.command(name="관리자공지채널설정", description="[관리자] 이 서버에서 월급/세금/관리자 공지를 받을 채널 (비우면 기본 채널)")
+async def admin_set_announcement_channel(interaction: discord.Interaction, 채널: Optional[discord.TextChannel] = None):
+    if not is_admin(interaction.user.id):
+        await interaction.response.send_message("❌ 관리자만 사용", ephemeral=True); return
+    if interaction.guild is None:
+        await interaction.response.send_message("서버에서만 사용할 수 있습니다.", ephemeral=True); return
+    s = load_settings()
+    channels = s.setdefault("announcement_channels", {})
+    if 채널 is None:
+        channels.pop(str(interaction.guild.id), None)
+        save_settings(s)
+        await interaction.response.send_message("✅ 공지 채널 지정을 해제했습니다. (봇이 쓸 수 있는 첫 채널 사용)", ephemeral=True)
+        return
+    if not 채널.permissions_for(interaction.guild.me).send_messages:
+        await interaction.response.send_message(f"❌ {채널.mention} 에 메시지를 보낼 권한이 없습니다.", ephemeral=True); return
+    channels[str(interaction.guild.id)] = 채널.id
+    save_settings(s)
+    await interaction.response.send_message(f"✅ 공지 채널: {채널.mention}", ephemeral=True)
+
+@bot.tree.command(name="관리자공지", description="[관리자] 모든 서버의 공지 채널로 메시지를 보냅니다")
+async def admin_announce(interaction: discord.Interaction, 내용: str):
+    if not is_admin(interaction.user.id):
+        await interaction.response.send_message("❌ 관리자만 사용", ephemeral=True); return
+    queued = announce(f"📢 {내용}")
+    ns = NOTIFIER.stats()
+    await interaction.response.send_message(
+        f"📨 {queued}개 서버에 공지를 예약했습니다. (대기 {ns['pending']}건)", ephemeral=True)
 
 @bot.tree.command(name="사용자공용계좌명의거래", description="공용계좌 비밀번호로 공용계좌에서 다른 계좌로 송금합니다")
 async def user_public_account_transfer(
@@ -1298,45 +2064,30 @@ async def user_public_account_transfer(
     금액: int,
     메모: str = ""
 ):
-    public_accounts = load_public_accounts()
-    matched = None
-    for name, data in public_accounts.items():
-        if data.get("account_number") == 공용계좌번호 and data.get("password") == 비밀번호:
-            matched = data
-            break
-    if not matched:
+    if not verify_public_account(공용계좌번호, 비밀번호):
         await interaction.response.send_message("❌ 공용계좌번호 또는 비밀번호가 올바르지 않습니다.", ephemeral=True)
         return
     users = load_users()
-    public_user_id = None
-    for uid, udata in users.items():
-        if isinstance(udata, dict) and udata.get("계좌번호") == 공용계좌번호:
-            public_user_id = uid
-            break
+    public_user_id = get_user_by_account_number(공용계좌번호)
     if not public_user_id:
         await interaction.response.send_message("❌ 공용계좌 데이터가 없습니다.", ephemeral=True)
         return
-    recipient_id = None
-    for uid, udata in users.items():
-        if isinstance(udata, dict) and udata.get("계좌번호") == 받는계좌번호:
-            recipient_id = uid
-            break
+    recipient_id = get_user_by_account_number(받는계좌번호)
     if not recipient_id:
         await interaction.response.send_message("❌ 받는 계좌번호가 존재하지 않습니다.", ephemeral=True)
         return
-    if is_account_frozen(공용계좌번호) or is_account_frozen(받는계좌번호):
-        await interaction.response.send_message("❌ 동결된 계좌가 포함되어 있습니다.", ephemeral=True)
-        return
     if 금액 <= 0:
         await interaction.response.send_message("❌ 송금 금액은 0보다 커야 합니다.", ephemeral=True)
         return
-    if int(users[public_user_id].get("잔액", 0)) < 금액:
-        await interaction.response.send_message("❌ 공용계좌 잔액이 부족합니다.", ephemeral=True)
+    try:
+        _, replayed = await run_once(interaction, lambda: TRANSFERS.run((공용계좌번호, 받는계좌번호),
+            lambda: transfer_checked("공용계좌명의거래", 공용계좌번호, 받는계좌번호, int(금액), 메모,
+                                     with_fee=False, insufficient_msg="❌ 공용계좌 잔액이 부족합니다.")))
+    except TransferError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+    if replayed:
         return
-    users[public_user_id]["잔액"] = int(users[public_user_id].get("잔액", 0)) - int(금액)
-    users[recipient_id]["잔액"] = int(users[recipient_id].get("잔액", 0)) + int(금액)
-    save_users(users)
-    add_transaction("공용계좌명의거래", 공용계좌번호, 받는계좌번호, int(금액), 0, 메모)
     embed = discord.Embed(title="🏦 공용계좌 명의 송금 완료", color=0x00bcd4)
     embed.add_field(name="공용계좌", value=f"`{공용계좌번호}`", inline=True)
     embed.add_field(name="받는 계좌", value=f"`{받는계좌번호}`", inline=True)
@@ -1376,49 +2127,40 @@ async def admin_confiscate(
         await interaction.response.send_message("❌ 대상 계좌가 동결되어 있습니다.", ephemeral=True)
         return
         
-    publics = load_public_accounts()
-    public_acc = None
-    public_acc_name = None
-    
-    for name, data in publics.items():
-        if data.get("account_number") == 공용계좌번호:
-            public_acc = data
-            public_acc_name = name
-            break
+    public_acc_name = LEDGER.public_name_for_account(공용계좌번호)
             
-    if not public_acc:
+    if not public_acc_name:
         await interaction.response.send_message("❌ 해당 공용계좌번호가 존재하지 않습니다.", ephemeral=True)
         return
         
-    public_user_id = None
-    for uid, udata in users.items():
-        if isinstance(udata, dict) and udata.get("계좌번호") == 공용계좌번호:
-            public_user_id = uid
-            break
+    public_user_id = get_user_by_account_number(공용계좌번호)
             
     if not public_user_id:
         await interaction.response.send_message("❌ 공용계좌 데이터가 없습니다.", ephemeral=True)
         return
         
-    if int(users[대상_id].get("잔액", 0)) < 금액:
-        금액 = int(users[대상_id].get("잔액", 0))
-        
-    if 금액 <= 0:
-        await interaction.response.send_message("압류할 금액이 없습니다.", ephemeral=True)
+    def _confiscate():
+        amount = min(int(금액), int(users[대상_id].get("잔액", 0)))
+        if amount <= 0:
+            raise TransferError("압류할 금액이 없습니다.")
+        add_transaction(
+            "공무집행압류",
+            users[대상_id]["계좌번호"],
+            공용계좌번호,
+            amount,
+            0,
+            메모 or f"공무집행 압류 ({interaction.user.display_name})",
+            deltas={users[대상_id]["계좌번호"]: -amount, 공용계좌번호: amount}
+        )
+        return amount
+
+    try:
+        금액, replayed = await run_once(interaction, lambda: TRANSFERS.run((users[대상_id]["계좌번호"], 공용계좌번호), _confiscate))
+    except TransferError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+    if replayed:
         return
-        
-    users[대상_id]["잔액"] = int(users[대상_id].get("잔액", 0)) - int(금액)
-    users[public_user_id]["잔액"] = int(users[public_user_id].get("잔액", 0)) + int(금액)
-    save_users(users)
-    
-    add_transaction(
-        "공무집행압류",
-        users[대상_id]["계좌번호"],
-        공용계좌번호,
-        int(금액),
-        0,
-        메모 or f"공무집행 압류 ({interaction.user.display_name})"
-    )
     
     embed = discord.Embed(title="⚖️ 공무집행 압류 완료", color=0xff9800)
     embed.add_field(name="대상", value=f"{대상.display_name} (`{users[대상_id]['계좌번호']}`)", inline=False)
@@ -1435,20 +2177,10 @@ START_INFO = {
 }
 MAX_RECENT_INTERACTIONS = 20
 
-PROCESSED_INTERACTIONS: set[str] = set()
-MAX_PROCESSED = 200
-
 def mark_interaction_once(interaction: discord.Interaction) -> bool:
+    # 조회성 명령의 중복 interaction 무시. IDEMPOTENCY 에 기록되므로 재시작 후에도 유지된다
     try:
-        iid = str(interaction.id)
-        if iid in PROCESSED_INTERACTIONS:
-            return False
-        PROCESSED_INTERACTIONS.add(iid)
-        if len(PROCESSED_INTERACTIONS) > MAX_PROCESSED:
-            tmp = list(PROCESSED_INTERACTIONS)[-MAX_PROCESSED:]
-            PROCESSED_INTERACTIONS.clear()
-            PROCESSED_INTERACTIONS.update(tmp)
-        return True
+        return IDEMPOTENCY.claim(f"i:{interaction.id}")
     except Exception:
         return True
 
@@ -1461,6 +2193,69 @@ def record_interaction_id(i: discord.Interaction):
     except Exception:
         pass
 
+@bot.tree.command(name="원장검증", description="[관리자] 저널 전체로 잔액을 다시 계산해 현재 잔액/체크포인트와 비교합니다")
+async def verify_ledger(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await safe_reply(interaction, content="❌ 관리자만 사용가능한 명령어입니다.")
+        return
+    await defer_response(interaction, ephemeral=True)
+    # 지금 시점의 잔액과 seq 를 고정하고, 그 뒤에 기록되는 항목은 비교에서 뺀다
+    seq = LEDGER.last_applied_seq
+    current = {acc: row.balance for acc, row in DIRECTORY.rows.items()}
+
+    def _verify():
+        entries = (e for e in JOURNAL.iter() if int(e.get("seq") or 0) <= seq)
+        return checkpoint.verify(entries, current, CHECKPOINTS.latest())
+    try:
+        report = await WORKERS.run_io(_verify)
+    except WorkerQueueFull:
+        await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+        return
+    ok = not (report["chain_errors"] or report["final_mismatches"] or report["checkpoint_mismatches"])
+    embed = discord.Embed(title="🧾 원장 검증 " + ("정상" if ok else "불일치 발견"), color=0x00b894 if ok else 0xff4444)
+    embed.add_field(name="검사 항목", value=f"{report['entries_checked']}건 (seq ≤ {seq})", inline=True)
+    embed.add_field(name="계좌", value=f"{report['accounts']}개 · 저널 밖 {report['untracked']}개", inline=True)
+    embed.add_field(name="검증 불가", value=f"{report['unverified']}건 (잔액 기록 없는 예전 거래)", inline=True)
+    embed.add_field(name="연쇄 오류", value=f"{report['chain_errors']}건", inline=True)
+    embed.add_field(name="현재 잔액 불일치", value=f"{report['final_mismatches']}건", inline=True)
+    ckpt = f"seq {report['checkpoint_seq']} · {report['checkpoint_mismatches']}건" if report["checkpoint_seq"] is not None else "없음"
+    embed.add_field(name="체크포인트", value=ckpt, inline=True)
+    samples = [f"seq {c['seq']} `{c['account']}` 예상 {c['expected']:,} / 기록 {c['recorded']:,}" for c in report["chain_samples"][:5]]
+    samples += [f"`{m['account']}` 저널 {m['journal']:,} / 현재 {m['actual']:,}" for m in report["final_samples"][:5]]
+    samples += [f"체크포인트 `{m['account']}` 저널 {m['journal']:,} / 파일 {m['actual']:,}" for m in report["checkpoint_samples"][:5]]
+    if samples:
+        embed.add_field(name="예시", value="\n".join(samples)[:1024], inline=False)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="경제현황", description="[관리자] 총 통화량과 발행/수수료/세금/압류 누적 현황")
+async def economy_status(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await safe_reply(interaction, content="❌ 관리자만 사용가능한 명령어입니다.")
+        return
+    eco = ECONOMY.summary()
+    embed = discord.Embed(title="📈 경제 현황", color=0x00b894)
+    embed.add_field(name="총 통화량", value=f"{format_number_4digit(eco['supply'])}원", inline=True)
+    embed.add_field(name="계좌 수", value=f"{eco['accounts']}개", inline=True)
+    embed.add_field(name="공용계좌 잔액", value=f"{format_number_4digit(eco['public_total'])}원", inline=True)
+    minted_by = " · ".join(f"{k} {format_number_4digit(v)}" for k, v in sorted(ECONOMY.minted_by.items())) or "-"
+    embed.add_field(name="발행", value=f"{format_number_4digit(eco['minted'])}원\n{minted_by}", inline=True)
+    embed.add_field(name="소멸", value=f"{format_number_4digit(eco['burned'])}원", inline=True)
+    embed.add_field(name="순발행", value=f"{format_number_4digit(eco['net_minted'])}원", inline=True)
+    embed.add_field(name="수수료", value=f"{format_number_4digit(eco['fees'])}원", inline=True)
+    embed.add_field(name="세금", value=f"{format_number_4digit(eco['tax'])}원", inline=True)
+    embed.add_field(name="압류", value=f"{format_number_4digit(eco['confiscated'])}원", inline=True)
+    for label, seconds in (("24시간", 86400), ("7일", 7 * 86400)):
+        change = ECONOMY.change_since(seconds)
+        if change:
+            embed.add_field(name=f"{label} 변화", value=(f"통화량 {change['supply']:+,}원\n"
+                                                       f"발행 {change['minted']:+,} / 소멸 {change['burned']:+,}"), inline=True)
+    top = sorted(ECONOMY.by_type.items(), key=lambda kv: -kv[1][1])[:8]
+    if top:
+        embed.add_field(name="유형별 거래", value="\n".join(
+            f"{t}: {c}건 / {format_number_4digit(a)}원" for t, (c, a) in top), inline=False)
+    embed.set_footer(text=f"seq {eco['seq']} · 거래 {eco['entries']}건")
+    await safe_reply(interaction, embed=embed)
+
 @bot.tree.command(name="프로세스정보", description="[관리자] 현재 봇 프로세스/시작정보")
 async def process_info(interaction: discord.Interaction):
     if not is_admin(interaction.user.id):
@@ -1472,6 +2267,78 @@ async def process_info(interaction: discord.Interaction):
     embed.add_field(name="최근 Interaction 수", value=str(len(START_INFO.get("recent_interactions",[]))), inline=True)
     if START_INFO.get("recent_interactions"):
         embed.add_field(name="최근 IDs", value=",".join(START_INFO["recent_interactions"][-5:]), inline=False)
+    ts = TRANSFERS.stats()
+    embed.add_field(
+        name="송금 처리",
+        value=(f"대기 {ts['queue_depth']} / 처리중 {ts['running']} / 잠금계좌 {ts['locked_accounts']}\n"
+               f"완료 {ts['completed']} / 실패 {ts['failed']}\n"
+               f"잠금대기 avg {ts['wait_avg_ms']:.2f}ms p95 {ts['wait_p95_ms']:.2f}ms max {ts['wait_max_ms']:.2f}ms"),
+        inline=False
+    )
+    ws = WORKERS.stats()
+    embed.add_field(
+        name="워커",
+        value="\n".join(f"{k}: 대기 {v['pending']}/{v['max_pending']} · 처리 {v['submitted']} · 거절 {v['rejected']} · 실패 {v['failed']}"
+                        for k, v in ws.items()),
+        inline=False
+    )
+    ids = IDEMPOTENCY.stats()
+    embed.add_field(name="중복 방지", value=f"키 {ids['entries']}/{ids['max_entries']} · 처리중 {ids['inflight']} · 재사용 {ids['hits']} · 만료/축출 {ids['evicted']}", inline=False)
+    ss = SETTINGS.stats()
+    embed.add_field(name="설정 캐시", value=f"v{ss['version']} · 관리자 {ss['admins']} · 동결 {ss['frozen']} · 외부변경 {ss['external_reloads']}", inline=False)
+    ds = DIRECTORY.stats()
+    embed.add_field(name="계좌 목록 캐시", value=f"계좌 {ds['accounts']} · 정렬 {', '.join(ds['sorted']) or '-'} · 필터 {ds['views']} · v{ds['version']}", inline=False)
+    js = JSON_FILES.stats()
+    embed.add_field(name="JSON 저장", value=(f"기록 {js['writes']} · 생략 {js['skipped']} · {js['bytes']:,}B · "
+                                            f"{'orjson' if js['orjson'] else 'json'}"
+                                            + (f" · 백업 복구 {', '.join(js['recovered'])}" if js['recovered'] else "")), inline=False)
+    cps = CHECKPOINTS.stats()
+    embed.add_field(name="체크포인트", value=f"파일 {cps['files']} · seq {cps['last_seq']} · {cps['last_bytes']:,}B · 기록 {cps['written']}", inline=False)
+    acs = ACCOUNTS.stats()
+    embed.add_field(name="계좌번호", value=f"{acs['width']}자리 · 사용 {acs['used']}/{acs['capacity']} · 전체 {acs['total_used']}", inline=False)
+    ns = NOTIFIER.stats()
+    embed.add_field(name="공지 발송", value=f"대기 {ns['pending']}/{ns['max_pending']} · 전송 {ns['sent']} · 재시도 {ns['retried']} · 실패 {ns['failed']} · 버림 {ns['dropped']} · 채널 {ns['routes']}", inline=False)
+    lag, append = METRICS.summary("ssibal_event_loop_lag_seconds"), METRICS.summary("ssibal_ledger_append_seconds")
+    embed.add_field(name="지연 (p99)", value=f"이벤트 루프 {format_ms(lag['p99']) if lag else '-'} · 저널 기록 {format_ms(append['p99']) if append else '-'} · 자세히 `/성능지표`", inline=False)
+    await safe_reply(interaction, embed=embed)
+
+def format_ms(seconds: float) -> str:
+    ms = seconds * 1000
+    return f"{ms:.1f}ms" if ms < 100 else f"{ms:.0f}ms"
+
+def format_percentiles(p: Optional[Dict[str, float]]) -> str:
+    if not p:
+        return "-"
+    return f"{format_ms(p['p50'])} / {format_ms(p['p95'])} / {format_ms(p['p99'])}"
+
+@bot.tree.command(name="성능지표", description="[관리자] 명령 응답/저장/저널/이벤트 루프 지연 (p50 / p95 / p99)")
+async def metrics_report(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await safe_reply(interaction, content="❌ 관리자만 사용가능한 명령어입니다.")
+        return
+    embed = discord.Embed(title="📈 성능 지표 (p50 / p95 / p99)", color=0x0099ff)
+    commands_seen = sorted(METRICS.histograms("ssibal_command_seconds"), key=lambda x: -x[1].count)[:10]
+    lines = []
+    for labels, hist in commands_seen:
+        name = labels["command"]
+        acks = {k: int(METRICS.counter("ssibal_interaction_acks_total", command=name, kind=k))
+                for k in ("immediate", "deferred", "timed_out", "none")}
+        lines.append(f"`/{name}` {hist.count}회 · 응답 {format_percentiles(METRICS.summary('ssibal_command_ack_seconds', command=name))}"
+                     f" · 완료 {format_percentiles(METRICS.summary('ssibal_command_seconds', command=name))}"
+                     f" · defer {acks['deferred']} · 시간초과 {acks['timed_out'] + acks['none']}")
+    embed.add_field(name="명령 (최근 사용 많은 순)", value="\n".join(lines)[:1024] or "기록 없음", inline=False)
+    io_lines = []
+    for labels, hist in sorted(METRICS.histograms("ssibal_store_seconds"), key=lambda x: -x[1].sum)[:8]:
+        p = METRICS.summary("ssibal_store_seconds", **labels)
+        nbytes = METRICS.counter("ssibal_store_bytes_total", **labels)
+        io_lines.append(f"{labels['op']} `{labels['file']}` {hist.count}회 · {format_percentiles(p)} · {int(nbytes):,}B")
+    embed.add_field(name="파일 읽기/쓰기 (누적 시간 순)", value="\n".join(io_lines)[:1024] or "기록 없음", inline=False)
+    append = METRICS.summary("ssibal_ledger_append_seconds")
+    embed.add_field(name="저널 기록", value=(f"{append['count']}회 · {format_percentiles(append)} · 최대 {format_ms(append['max'])}"
+                                         if append else "기록 없음"), inline=False)
+    lag = METRICS.summary("ssibal_event_loop_lag_seconds")
+    embed.add_field(name="이벤트 루프 지연", value=(f"{format_percentiles(lag)} · 최대 {format_ms(lag['max'])}"
+                                             if lag else "기록 없음"), inline=False)
     await safe_reply(interaction, embed=embed)
 
 @bot.tree.command(name="최근인터랙션", description="[관리자] 최근 처리된 인터랙션 ID 나열")
@@ -1490,6 +2357,67 @@ async def on_interaction(interaction: discord.Interaction):
     except Exception:
         pass
 
+BACKGROUND_STARTED = False
+
+async def save_snapshot(source, path: str):
+    # snapshot() 은 루프에서 복사본을 만들고, 기록은 워커에서. 실패하면 다음 주기에 다시 저장
+    snap = source.snapshot()
+    if snap is None:
+        return
+    try:
+        await WORKERS.run_io(save_doc, path, snap)
+    except Exception:
+        source.dirty = True
+        raise
+
+LAST_CHECKPOINT = time.monotonic()
+
+async def write_checkpoint():
+    # 행 복사는 루프에서 해서 seq 와 내용이 같은 시점이 되게 하고, 인코딩/압축/기록은 워커에서
+    seq = LEDGER.last_applied_seq
+    if seq <= CHECKPOINTS.last_seq:
+        return
+    docs = {name: {k: dict(v) if isinstance(v, dict) else v for k, v in LEDGER.get(name).items()}
+            for name in checkpoint.DOCS}
+    position = JOURNAL.position(seq) if hasattr(JOURNAL, "position") else (0, 0)
+    await WORKERS.run_io(CHECKPOINTS.write, seq, docs, position)
+
+async def ledger_flush_task():
+    global LAST_CHECKPOINT
+    while True:
+        await asyncio.sleep(LEDGER_FLUSH_INTERVAL)
+        try:
+            LINKS.purge()
+            # 문서 복사는 루프에서 (seq 와 같은 시점), 직렬화/기록은 워커에서. 넘기지 못하면 다음 주기에 다시
+            snap = LEDGER.snapshot_dirty()
+            try:
+                await WORKERS.run_io(LEDGER.write, snap)
+            except Exception:
+                LEDGER.dirty.update(snap["docs"])
+                raise
+            ECONOMY.tick()
+            await save_snapshot(ACCOUNTS, ACCOUNT_ALLOCATOR_FILE)
+            await save_snapshot(ECONOMY, ECONOMY_FILE)
+            await save_snapshot(SCHEDULER, SCHEDULER_FILE)
+            if time.monotonic() - LAST_CHECKPOINT >= CHECKPOINT_INTERVAL:
+                LAST_CHECKPOINT = time.monotonic()
+                await write_checkpoint()
+            # admin_settings.json 을 직접 고친 경우 다음 주기에 반영 (내용이 같으면 그대로 둠)
+            external = await WORKERS.run_io(SETTINGS.read_external)
+            if external is not None:
+                SETTINGS.apply_external(external)
+        except Exception as e:
+            print(f"[ledger_flush_task] {e}")
+
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 0.5))
+
+async def event_loop_lag_task():
+    # 예정보다 늦게 깨어난 만큼이 이벤트 루프 지연 (블로킹 호출이 있으면 커진다)
+    while True:
+        expected = time.perf_counter() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        METRICS.observe("ssibal_event_loop_lag_seconds", max(0.0, time.perf_counter() - expected))
+
 @bot.event
 async def on_ready():
     print(f'{bot.user} 봇이 준비되었습니다!')
@@ -1498,8 +2426,15 @@ async def on_ready():
         print(f'{len(synced)}개의 명령어가 동기화되었습니다. 행복한 서버운영되시길 바랍니다. -개발자, 윤석오-')
     except Exception as e:
         print(f'명령어 동기화 실패: {e}')
+    global BACKGROUND_STARTED
+    if BACKGROUND_STARTED:
+        return
+    BACKGROUND_STARTED = True
     start_web_server()
-    bot.loop.create_task(auto_pay_salary_task())
+    bot.loop.create_task(ledger_flush_task())
+    bot.loop.create_task(SCHEDULER.run_forever())
+    NOTIFIER.start()
+    bot.loop.create_task(event_loop_lag_task())
 
 if __name__ == "__main__":
     if not TOKEN:
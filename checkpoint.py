@@ -0,0 +1,186 @@
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+# 잔액 체크포인트: 특정 저널 seq 시점의 잔액(이진 배열) + 계좌 행(압축 JSON)
+# 시작할 때 users.json 이 체크포인트보다 뒤처져 있거나 읽을 수 없으면 체크포인트를 올리고 그 뒤 저널만 재생한다
+_MAGIC = b"SSCP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHQIQdIII")  # magic, version, seq, segment, offset, created, count, crc32, meta_len
+DOCS = ("users", "account_mapping", "public_accounts")
+BALANCE_FIELD = "잔액"
+
+
+class Checkpoint(NamedTuple):
+    seq: int
+    created: float
+    balances: Dict[str, int]
+    docs: Dict[str, Any]
+    path: str
+    # seq 다음 항목이 시작하는 저널 위치 (세그먼트 번호, 바이트 offset). SQLite 저장소면 (0, 0)
+    segment: int = 0
+    offset: int = 0
+
+
+def encode(seq: int, docs: Dict[str, Any], position=(0, 0), created: Optional[float] = None) -> bytes:
+    # 잔액은 int64 배열로 따로 빼고, 행에서는 잔액을 지운 채 JSON 으로 압축한다
+    accounts: List[str] = []
+    balances = array("q")
+    users = {}
+    for uid, row in (docs.get("users") or {}).items():
+        if isinstance(row, dict) and row.get("계좌번호"):
+            accounts.append(str(row["계좌번호"]))
+            balances.append(int(row.get(BALANCE_FIELD, 0)))
+            row = {k: v for k, v in row.items() if k != BALANCE_FIELD}
+        users[uid] = row
+    meta = json.dumps({"accounts": accounts, "docs": {**{n: docs.get(n) or {} for n in DOCS}, "users": users}},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = zlib.compress(balances.tobytes() + meta, 6)
+    header = _HEADER.pack(_MAGIC, _VERSION, int(seq), int(position[0]), int(position[1]), created or time.time(), len(accounts),
+                          zlib.crc32(payload), len(meta))
+    return header + payload
+
+
+def decode(raw: bytes, path: str = "") -> Checkpoint:
+    magic, version, seq, segment, offset, created, count, crc, meta_len = _HEADER.unpack_from(raw)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"not a checkpoint: {path}")
+    payload = raw[_HEADER.size:]
+    if zlib.crc32(payload) != crc:
+        raise ValueError(f"checkpoint checksum mismatch: {path}")
+    body = zlib.decompress(payload)
+    balances = array("q")
+    balances.frombytes(body[:8 * count])
+    meta = json.loads(body[8 * count:8 * count + meta_len])
+    by_account = dict(zip(meta["accounts"], balances))
+    docs = meta["docs"]
+    for row in docs.get("users", {}).values():
+        if isinstance(row, dict) and str(row.get("계좌번호")) in by_account:
+            row[BALANCE_FIELD] = int(by_account[str(row["계좌번호"])])
+    return Checkpoint(seq, created, by_account, docs, path, segment, offset)
+
+
+class CheckpointStore:
+    # checkpoints/ 아래 ckpt-<seq>.bin 을 keep 개까지 유지한다
+    def __init__(self, directory: str, keep: int = 3):
+        self.directory = directory
+        self.keep = max(1, int(keep))
+        self.written = 0
+        self.last_seq = 0
+        self.last_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self) -> List[str]:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("ckpt-") and n.endswith(".bin"))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def write(self, seq: int, docs: Dict[str, Any], position=(0, 0)) -> str:
+        raw = encode(seq, docs, position)
+        path = os.path.join(self.directory, f"ckpt-{int(seq):012d}.bin")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        for old in self.paths()[:-self.keep]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        self.written += 1
+        self.last_seq = int(seq)
+        self.last_bytes = len(raw)
+        return path
+
+    def latest(self) -> Optional[Checkpoint]:
+        # 최신 것부터 읽고, 깨진 파일은 건너뛰어 그 이전 체크포인트를 쓴다
+        for path in reversed(self.paths()):
+            try:
+                with open(path, "rb") as f:
+                    ckpt = decode(f.read(), path)
+                self.last_seq = max(self.last_seq, ckpt.seq)
+                return ckpt
+            except Exception as e:
+                print(f"[checkpoint] skip {path}: {e}")
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"files": len(self.paths()), "written": self.written, "last_seq": self.last_seq, "last_bytes": self.last_bytes}
+
+
+def verify(entries: Iterable[Dict[str, Any]], current: Dict[str, int],
+           checkpoint: Optional[Checkpoint] = None, limit: int = 20) -> Dict[str, Any]:
+    # 저널 전체를 처음부터 다시 계산해서 (1) 항목마다 직전 잔액 + 변화량 == 기록된 잔액인지,
+    # (2) 체크포인트 시점 잔액, (3) 현재 메모리 잔액과 일치하는지 확인한다
+    running: Dict[str, int] = {}
+    chain: List[Dict[str, Any]] = []
+    chain_count = 0
+    checked = unverified = 0
+    at_checkpoint: Optional[Dict[str, int]] = None
+    for entry in entries:
+        seq = int(entry.get("seq") or 0)
+        if checkpoint is not None and at_checkpoint is None and seq > checkpoint.seq:
+            at_checkpoint = dict(running)
+        for row in ((entry.get("upserts") or {}).get("users") or {}).values():
+            if isinstance(row, dict) and row.get("계좌번호"):
+                running[str(row["계좌번호"])] = int(row.get(BALANCE_FIELD, 0))
+        balances = entry.get("balances")
+        deltas = entry.get("deltas") or {}
+        if not balances:
+            if entry.get("amount") and not entry.get("batch"):
+                unverified += 1
+            continue
+        checked += 1
+        for acc, bal in balances.items():
+            prev = running.get(acc)
+            expected = None if prev is None else prev + int(deltas.get(acc, 0))
+            if expected is not None and expected != int(bal):
+                chain_count += 1
+                if len(chain) < limit:
+                    chain.append({"seq": seq, "account": acc, "expected": expected, "recorded": int(bal)})
+            running[acc] = int(bal)
+    if checkpoint is not None and at_checkpoint is None:
+        at_checkpoint = dict(running)
+
+    def _diff(expected: Dict[str, int], actual: Dict[str, int]) -> List[Dict[str, Any]]:
+        out = []
+        for acc, bal in expected.items():
+            if acc in actual and int(actual[acc]) != bal:
+                out.append({"account": acc, "journal": bal, "actual": int(actual[acc])})
+        return out
+
+    final = _diff(running, current)
+    ckpt = _diff(at_checkpoint, checkpoint.balances) if checkpoint is not None else []
+    return {
+        "entries_checked": checked,
+        "unverified": unverified,
+        "accounts": len(running),
+        "untracked": sum(1 for acc in current if acc not in running),
+        "chain_errors": chain_count,
+        "chain_samples": chain,
+        "final_mismatches": len(final),
+        "final_samples": final[:limit],
+        "checkpoint_seq": checkpoint.seq if checkpoint is not None else None,
+        "checkpoint_mismatches": len(ckpt),
+        "checkpoint_samples": ckpt[:limit],
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "verify":
+        print("usage: python checkpoint.py verify [journal_dir] [users.json] [checkpoint_dir]")
+        sys.exit(1)
+    from journal import TransactionJournal
+    journal = TransactionJournal(sys.argv[2] if len(sys.argv) > 2 else os.environ.get("JOURNAL_DIR", "journal"))
+    with open(sys.argv[3] if len(sys.argv) > 3 else "users.json", "r", encoding="utf-8") as f:
+        users = json.load(f)
+    current = {str(r["계좌번호"]): int(r.get(BALANCE_FIELD, 0)) for r in users.values() if isinstance(r, dict) and r.get("계좌번호")}
+    store = CheckpointStore(sys.argv[4] if len(sys.argv) > 4 else os.environ.get("CHECKPOINT_DIR", "checkpoints"))
+    print(json.dumps(verify(journal.iter(), current, store.latest()), ensure_ascii=False, indent=2))
+    journal.close()
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+# 돈을 새로 만들거나 없애는 쪽 (저널 deltas 가 없는 예전 기록을 분류할 때 사용)
+ISSUERS = ("SYSTEM", "ADMIN", "MAP")
+CONFISCATION_TYPES = ("공무집행압류",)
+COUNTERS = ("minted", "burned", "fees", "tax", "confiscated", "entries")
+
+
+def classify(entry: Dict[str, Any]) -> Dict[str, int]:
+    # 거래 한 건이 통화량/수수료/세금/압류에 주는 영향
+    out = {"minted": 0, "burned": 0, "fees": 0, "tax": 0, "confiscated": 0}
+    batch = entry.get("batch") or {}
+    amount = int(entry.get("amount", 0) or 0)
+    if batch.get("role") == "line":
+        # 일괄 처리의 계좌별 항목: 금액과 잔액 변화는 요약 레코드에 이미 들어 있다
+        return out
+    deltas = entry.get("deltas")
+    if deltas is not None:
+        net = sum(int(v) for v in deltas.values())
+    elif entry.get("from_user") in ISSUERS:
+        net = amount
+    elif entry.get("to_user") in ISSUERS:
+        net = -amount
+    else:
+        net = 0
+    if net > 0:
+        out["minted"] = net
+    elif net < 0:
+        out["burned"] = -net
+    out["fees"] = int(entry.get("fee", 0) or 0)
+    if batch.get("kind") == "tax" and batch.get("role") == "summary":
+        out["tax"] = amount
+    elif not batch and entry.get("to_user") == "TREASURY":
+        # 일괄징수 이전의 계좌별 세금 기록
+        out["tax"] = amount
+    if entry.get("type") in CONFISCATION_TYPES:
+        out["confiscated"] = amount
+    return out
+
+
+class EconomyStats:
+    # 원장에 기록될 때마다 누적값을 더해 두고 조회는 O(1). 총 잔액/계좌 수는 AccountDirectory 의 집계를 그대로 쓴다
+    # seq 까지 반영했는지 저장해 두고, 재시작하면 그 뒤 저널만 다시 읽는다
+    def __init__(self, directory, snapshot_interval: float = 3600, history_limit: int = 24 * 90):
+        self.directory = directory
+        self.snapshot_interval = float(snapshot_interval)
+        self.history_limit = max(1, int(history_limit))
+        self.totals: Dict[str, int] = {k: 0 for k in COUNTERS}
+        self.minted_by: Dict[str, int] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        self.history: List[Dict[str, Any]] = []
+        self.seq = 0
+        self.last_snapshot = 0.0
+        self.dirty = False
+
+    def load(self, state: Optional[Dict[str, Any]]):
+        state = state or {}
+        for k in COUNTERS:
+            self.totals[k] = int((state.get("totals") or {}).get(k, 0))
+        self.minted_by = {k: int(v) for k, v in (state.get("minted_by") or {}).items()}
+        self.by_type = {k: [int(v[0]), int(v[1])] for k, v in (state.get("by_type") or {}).items()}
+        self.history = list(state.get("history") or [])[-self.history_limit:]
+        self.seq = int(state.get("seq", 0))
+        self.last_snapshot = float(state.get("last_snapshot", 0))
+
+    def catch_up(self, entries: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for entry in entries:
+            if self.observe(entry):
+                count += 1
+        return count
+
+    def observe(self, entry: Dict[str, Any]) -> bool:
+        seq = int(entry.get("seq") or 0)
+        if seq and seq <= self.seq:
+            return False
+        flows = classify(entry)
+        for k, v in flows.items():
+            if v:
+                self.totals[k] += v
+        self.totals["entries"] += 1
+        if flows["minted"]:
+            source = str(entry.get("from_user"))
+            source = source if source in ISSUERS else "기타"
+            self.minted_by[source] = self.minted_by.get(source, 0) + flows["minted"]
+        if (entry.get("batch") or {}).get("role") != "line":
+            t = self.by_type.setdefault(str(entry.get("type", "?")), [0, 0])
+            t[0] += 1
+            t[1] += int(entry.get("amount", 0) or 0)
+        if seq:
+            self.seq = seq
+        self.dirty = True
+        return True
+
+    def supply(self) -> int:
+        return self.directory.total
+
+    def summary(self) -> Dict[str, Any]:
+        return {"supply": self.directory.total, "accounts": len(self.directory.rows),
+                "public_total": self.directory.public_total, **self.totals,
+                "net_minted": self.totals["minted"] - self.totals["burned"], "seq": self.seq}
+
+    def tick(self, now: Optional[float] = None) -> bool:
+        # 주기마다 통화량 기록 한 줄을 남긴다 (인플레이션 추이용)
+        now = time.time() if now is None else now
+        if now - self.last_snapshot < self.snapshot_interval:
+            return False
+        point = self.summary()
+        point["at"] = datetime.fromtimestamp(now).isoformat()
+        self.history.append(point)
+        del self.history[:-self.history_limit]
+        self.last_snapshot = now
+        self.dirty = True
+        return True
+
+    def change_since(self, seconds: float) -> Optional[Dict[str, Any]]:
+        # 기록된 스냅샷 중 seconds 이전과 가장 가까운 것과 비교 (기록이 history_limit 개라 이분 탐색 불필요)
+        cutoff = datetime.fromtimestamp(time.time() - seconds).isoformat()
+        base = None
+        for point in reversed(self.history):
+            if point["at"] <= cutoff:
+                base = point
+                break
+        if base is None:
+            return None
+        now = self.summary()
+        return {"at": base["at"], "supply": now["supply"] - base["supply"],
+                "minted": now["minted"] - base["minted"], "burned": now["burned"] - base["burned"]}
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return {"seq": self.seq, "totals": dict(self.totals), "minted_by": dict(self.minted_by),
+                "by_type": {k: list(v) for k, v in self.by_type.items()},
+                "history": list(self.history), "last_snapshot": self.last_snapshot}
@@ -0,0 +1,73 @@
+import hmac
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+MAP_PARTY = "MAP"
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class MapTokenIndex:
+    # roblox_apis.json 의 maps 를 토큰 -> (맵이름, 정보) 로 색인. 맵 API 명령이 저장할 때마다 rebuild()
+    def __init__(self):
+        self._by_token: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+    def rebuild(self, apis: Dict[str, Any]):
+        index = {}
+        for name, info in (apis.get("maps") or {}).items():
+            token = info.get("token") if isinstance(info, dict) else None
+            if token:
+                index[token] = (name, info)
+        self._by_token = index
+
+    def resolve(self, token: Optional[str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if not token:
+            return None
+        hit = self._by_token.get(token)
+        if hit is None or not hmac.compare_digest(hit[1].get("token", ""), token):
+            return None
+        return hit
+
+    def __len__(self) -> int:
+        return len(self._by_token)
+
+
+def bearer_token(authorization: Optional[str], api_key: Optional[str]) -> Optional[str]:
+    if api_key:
+        return api_key.strip()
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+
+class VerifyCodeRequest(BaseModel):
+    code: str = Field(min_length=1, max_length=16)
+    roblox_user_id: int
+    roblox_username: str = ""
+
+
+class AdjustRequest(BaseModel):
+    # account_number 또는 roblox_user_id 중 하나로 계좌를 지정한다
+    account_number: Optional[str] = None
+    roblox_user_id: Optional[int] = None
+    amount: int = Field(gt=0)
+    memo: str = Field(default="", max_length=100)
+
+
+class BatchItem(BaseModel):
+    # amount 가 양수면 지급, 음수면 차감
+    account_number: Optional[str] = None
+    roblox_user_id: Optional[int] = None
+    amount: int
+    memo: str = Field(default="", max_length=100)
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(min_length=1)
+    all_or_nothing: bool = False
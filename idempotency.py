@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+# run() 안에서 실행 중인 (키, fingerprint). 원장이 같은 저널 항목에 키를 함께 기록할 때 읽는다
+_CURRENT: ContextVar[Optional[Tuple[str, Optional[str]]]] = ContextVar("idempotency_current", default=None)
+# 결과를 저장하기 전에 멈췄을 때(저널에는 키만 남은 경우) 재시도에 돌려줄 결과
+COMMITTED_RESULT = {"ok": True, "committed": True}
+
+
+class IdempotencyConflict(Exception):
+    # 같은 키로 내용이 다른 요청이 들어온 경우
+    pass
+
+
+def fingerprint(payload: Any) -> str:
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class IdempotencyStore:
+    # 키 -> 처음 실행한 결과. OrderedDict 로 LRU 순서를 유지하고 가장 오래된 것부터 O(1) 로 밀어낸다
+    # 결과에는 성공 값 또는 업무 오류(잔액 부족 등)를 저장해서, 같은 키가 다시 오면 실행하지 않고 그대로 돌려준다
+    def __init__(self, max_entries: int = 10000, ttl: float = 24 * 3600,
+                 error_types: Tuple[Type[BaseException], ...] = (),
+                 encode_error: Optional[Callable[[BaseException], Dict[str, Any]]] = None,
+                 decode_error: Optional[Callable[[Dict[str, Any]], BaseException]] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.error_types = error_types
+        self.encode_error = encode_error or (lambda e: {"message": str(e)})
+        self.decode_error = decode_error or (lambda d: RuntimeError(d.get("message", "")))
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 항목이 추가/삭제될 때 호출: fn(키, 항목 또는 None). 원장 문서에 반영해서 함께 저장한다
+        self.on_change: Optional[Callable[[str, Optional[Dict[str, Any]]], None]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _changed(self, key: str, entry: Optional[Dict[str, Any]]):
+        if self.on_change is not None:
+            self.on_change(key, entry)
+
+    def load(self, data: Optional[Dict[str, Any]]):
+        # {키: 항목}. 예전 형식 {"entries": {...}} 도 읽는다
+        data = data or {}
+        if isinstance(data.get("entries"), dict):
+            data = data["entries"]
+        now = time.time()
+        items = sorted(data.items(), key=lambda kv: kv[1].get("at", 0))
+        for key, entry in items:
+            if entry.get("at", 0) + self.ttl > now:
+                self.entries[key] = entry
+            else:
+                self._changed(key, None)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        while self.entries:
+            key, oldest = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_entries and oldest.get("at", 0) + self.ttl > now:
+                break
+            key, _ = self.entries.popitem(last=False)
+            self.evicted += 1
+            self._changed(key, None)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.get("at", 0) + self.ttl <= time.time():
+            del self.entries[key]
+            self._changed(key, None)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def remember(self, key: str, result: Any = None, error: Optional[Dict[str, Any]] = None,
+                 fp: Optional[str] = None):
+        now = time.time()
+        entry: Dict[str, Any] = {"at": now, "result": result}
+        if error is not None:
+            entry["error"] = error
+        if fp:
+            entry["fp"] = fp
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self._changed(key, entry)
+        self._evict(now)
+
+    def claim(self, key: str) -> bool:
+        # 처음 보는 키면 기록하고 True (조회성 명령의 중복 interaction 무시용)
+        if self.get(key) is not None or key in self._inflight:
+            return False
+        self.remember(key)
+        return True
+
+    def marker(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        # 지금 실행 중인 키의 "커밋됨" 항목. 돈이 움직이는 저널 항목과 같은 커밋에 넣어서,
+        # 결과를 저장하기 전에 멈춰도 재시작 후 같은 키가 다시 실행되지 않게 한다
+        current = _CURRENT.get()
+        if current is None:
+            return None
+        key, fp = current
+        entry: Dict[str, Any] = {"at": time.time(), "result": COMMITTED_RESULT}
+        if fp:
+            entry["fp"] = fp
+        return {key: entry}
+
+    def _replay(self, entry: Dict[str, Any], fp: Optional[str]) -> Any:
+        if fp and entry.get("fp") and entry["fp"] != fp:
+            raise IdempotencyConflict("idempotency key reused with a different request")
+        self.hits += 1
+        if entry.get("error") is not None:
+            raise self.decode_error(entry["error"])
+        return entry.get("result")
+
+    async def run(self, key: Optional[str], fn: Callable[[], Any], fp: Optional[str] = None,
+                  replay_errors: bool = True) -> Tuple[Any, bool]:
+        # 반환: (결과, 저장된 결과를 재사용했는지). replay_errors=False 면 저장된 오류도 다시 던지지 않고 (None, True)
+        if not key:
+            result = fn()
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result, False
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                if not replay_errors and entry.get("error") is not None:
+                    self.hits += 1
+                    return None, True
+                return self._replay(entry, fp), True
+            waiting = self._inflight.get(key)
+            if waiting is None:
+                break
+            # 같은 키가 처리 중이면 끝날 때까지 기다렸다가 그 결과를 쓴다
+            await asyncio.shield(waiting)
+        self.misses += 1
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[key] = done
+        token = _CURRENT.set((key, fp))
+        try:
+            result = fn()
+            if asyncio.iscoroutine(result):
+                result = await result
+            self.remember(key, result=result, fp=fp)
+            return result, False
+        except self.error_types as e:
+            self.remember(key, error=self.encode_error(e), fp=fp)
+            raise
+        finally:
+            _CURRENT.reset(token)
+            self._inflight.pop(key, None)
+            if not done.done():
+                done.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "inflight": len(self._inflight),
+                "hits": self.hits, "misses": self.misses, "evicted": self.evicted}
@@ -0,0 +1,335 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tx_index import PostingIndex, SegmentIndex, index_stats, load_segment_index, partition_of, ts_key
+
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _segment_name(index: int, partition: Optional[str] = None) -> str:
+    # 월 파티션이 있으면 000003-202610.jsonl, 예전 세그먼트는 000001.jsonl
+    if partition:
+        return f"{index:06d}-{partition}{SEGMENT_SUFFIX}"
+    return f"{index:06d}{SEGMENT_SUFFIX}"
+
+
+def _parse_segment_name(name: str):
+    if not name.endswith(SEGMENT_SUFFIX):
+        return None
+    stem = name[:-len(SEGMENT_SUFFIX)]
+    index, _, partition = stem.partition("-")
+    if not index.isdigit() or (partition and not partition.isdigit()):
+        return None
+    return int(index), partition or None
+
+
+class TransactionJournal:
+    def __init__(self, directory: str, segment_bytes: int = 8 * 1024 * 1024,
+                 fsync_every: int = 64, fsync_interval: float = 0.5):
+        self.directory = directory
+        self.segment_bytes = int(segment_bytes)
+        self.fsync_every = max(1, int(fsync_every))
+        self.fsync_interval = float(fsync_interval)
+        self.last_seq = 0
+        self.unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.RLock()
+        self._fh = None
+        self._segment = 0
+        self._partition: Optional[str] = None
+        self._names: Dict[int, str] = {}
+        self.indexes: Dict[int, SegmentIndex] = {}
+        self.postings = PostingIndex()
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _scan_names(self):
+        self._names = {}
+        for name in os.listdir(self.directory):
+            parsed = _parse_segment_name(name)
+            if parsed:
+                self._names[parsed[0]] = name
+
+    def segments(self) -> List[int]:
+        with self._lock:
+            return sorted(self._names)
+
+    def segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, self._names.get(index) or _segment_name(index))
+
+    def _open(self):
+        self._scan_names()
+        segs = sorted(self._names)
+        if not segs:
+            self._names[1] = _segment_name(1)
+            segs = [1]
+        self._segment = segs[-1]
+        path = self.segment_path(self._segment)
+        self._partition = _parse_segment_name(self._names[self._segment])[1]
+        if os.path.exists(path):
+            self._repair_tail(path)
+            self._drop_incomplete_group(path)
+        else:
+            open(path, "ab").close()
+        # 닫힌 세그먼트는 .idx 사이드카에서, 현재 세그먼트는 직접 읽어서 색인을 만든다
+        for index in segs:
+            self.indexes[index] = load_segment_index(index, self.segment_path(index), sealed=index != self._segment)
+            self.postings.add_segment(self.indexes[index])
+        for index in reversed(segs):
+            if self.indexes[index].last_seq:
+                self.last_seq = self.indexes[index].last_seq
+                break
+        self._fh = open(path, "ab")
+
+    @staticmethod
+    def _repair_tail(path: str):
+        # 기록 도중 종료되어 잘린 마지막 줄은 버린다
+        with open(path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                nl = chunk.rfind(b"\n")
+                if nl != -1:
+                    f.truncate(pos + nl + 1)
+                    print(f"[journal] truncated torn tail of {path}")
+                    return
+            f.truncate(0)
+
+    @staticmethod
+    def _drop_incomplete_group(path: str):
+        # 여러 줄을 한 번에 쓴 묶음(grp=[첫 seq, 끝 seq])이 중간에 끊겼으면 묶음 전체를 버린다
+        start = None
+        last = None
+        with open(path, "rb") as f:
+            pos = 0
+            for line in f:
+                entry = json.loads(line)
+                grp = entry.get("grp")
+                if grp and entry.get("seq") == grp[0]:
+                    start = pos
+                last = entry
+                pos += len(line)
+        grp = last.get("grp") if last else None
+        if grp and last.get("seq") != grp[1] and start is not None:
+            with open(path, "rb+") as f:
+                f.truncate(start)
+            print(f"[journal] dropped incomplete batch seq {grp[0]}..{grp[1]} in {path}")
+
+    def _rotate(self, partition: Optional[str]):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        sealed = self.indexes[self._segment]
+        try:
+            sealed.save_sidecar()
+        except OSError as e:
+            print(f"[journal] sidecar write failed {sealed.path}: {e}")
+        self._segment += 1
+        self._partition = partition
+        self._names[self._segment] = _segment_name(self._segment, partition)
+        path = self.segment_path(self._segment)
+        self._fh = open(path, "ab")
+        self.indexes[self._segment] = SegmentIndex(self._segment, path)
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not entries:
+            return entries
+        with self._lock:
+            # 예전 transactions.json 가져오기처럼 여러 달에 걸친 묶음은 같은 달끼리 나눠서 각자 세그먼트에 쓴다
+            start = 0
+            partition = partition_of(entries[0].get("timestamp"))
+            for i in range(1, len(entries) + 1):
+                nxt = partition_of(entries[i].get("timestamp")) if i < len(entries) else None
+                if i == len(entries) or nxt != partition:
+                    self._append_partition(entries[start:i], partition)
+                    start, partition = i, nxt
+            if self.unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+        return entries
+
+    def _append_partition(self, entries: List[Dict[str, Any]], partition: Optional[str]):
+        # 크기 한도를 넘었거나 달이 바뀌면 새 세그먼트(파티션)로 넘어간다
+        pos = self._fh.tell()
+        if pos and (pos >= self.segment_bytes or partition != self._partition):
+            self._rotate(partition)
+            pos = 0
+        elif not pos and partition != self._partition and not self.indexes[self._segment]:
+            self._rename_empty_segment(partition)
+        chunks = []
+        seq = self.last_seq
+        # 여러 건을 함께 쓰면 묶음 범위를 남겨서, 중간에 끊긴 묶음은 열 때 통째로 버린다
+        grp = [seq + 1, seq + len(entries)] if len(entries) > 1 else None
+        for entry in entries:
+            seq += 1
+            entry["seq"] = seq
+            if grp:
+                entry["grp"] = grp
+            chunks.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._fh.write(b"".join(chunks))
+        self._fh.flush()
+        index = self.indexes[self._segment]
+        for entry, chunk in zip(entries, chunks):
+            index.add(ts_key(entry.get("timestamp")), pos, pos + len(chunk), entry["seq"],
+                      entry.get("from_user"), entry.get("to_user"))
+            self.postings.add(entry["seq"], entry.get("from_user"), entry.get("to_user"))
+            pos += len(chunk)
+        self.last_seq = seq
+        self.unsynced += len(entries)
+
+    def _rename_empty_segment(self, partition: str):
+        # 아직 비어 있는 현재 세그먼트는 새 파티션 이름으로 바꿔서 그대로 쓴다
+        self._fh.close()
+        old = self.segment_path(self._segment)
+        self._names[self._segment] = _segment_name(self._segment, partition)
+        new = self.segment_path(self._segment)
+        os.replace(old, new)
+        self._partition = partition
+        self._fh = open(new, "ab")
+        self.indexes[self._segment] = SegmentIndex(self._segment, new)
+
+    def _sync_locked(self):
+        os.fsync(self._fh.fileno())
+        self.unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            if self.unsynced:
+                self._fh.flush()
+                self._sync_locked()
+
+    def position(self, seq: int) -> Tuple[int, int]:
+        # seq 다음 항목이 시작하는 (세그먼트, 바이트 offset). 체크포인트에 함께 기록한다
+        with self._lock:
+            located = self._locate(seq) if seq else None
+            if located is None:
+                return (self._segment, 0) if not seq else (self._segment, self.indexes[self._segment].end)
+            si, i = located
+            return si.index, si.byte_range(i, i + 1)[1]
+
+    def iter(self, from_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            self._fh.flush()
+            # 색인의 마지막 seq 로 이미 반영된 세그먼트는 열지 않고, 첫 세그먼트는 from_seq 다음 위치로 바로 이동
+            paths = [self.indexes[i].path for i in sorted(self.indexes) if self.indexes[i].last_seq > from_seq]
+            located = self._locate(from_seq + 1) if from_seq else None
+            start = (located[0].path, located[0].byte_range(located[1], located[1] + 1)[0]) if located else (None, 0)
+        for path in paths:
+            with open(path, "rb") as f:
+                if path == start[0]:
+                    f.seek(start[1])
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    entry = json.loads(line)
+                    if entry.get("seq", 0) > from_seq:
+                        yield entry
+
+    def iter_range(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        # [since, until) 기간의 거래만 읽는다. 색인으로 겹치는 세그먼트와 바이트 구간만 골라서 결과 크기만큼만 읽음
+        lo = ts_key(since) if since else float("-inf")
+        hi = ts_key(until) if until else float("inf")
+        plan = []
+        with self._lock:
+            self._fh.flush()
+            for index in sorted(self.indexes):
+                si = self.indexes[index]
+                positions, contiguous = si.positions(lo, hi)
+                if not positions:
+                    continue
+                if contiguous:
+                    plan.append((si.path, [si.byte_range(positions[0], positions[-1] + 1)]))
+                else:
+                    plan.append((si.path, [si.byte_range(p, p + 1) for p in positions]))
+        for path, ranges in plan:
+            with open(path, "rb") as f:
+                for start, stop in ranges:
+                    f.seek(start)
+                    remaining = stop - start
+                    while remaining > 0:
+                        line = f.readline(remaining)
+                        if not line:
+                            break
+                        remaining -= len(line)
+                        yield json.loads(line)
+
+    def _locate(self, seq: int) -> Optional[Tuple[SegmentIndex, int]]:
+        order = [i for i in sorted(self.indexes) if self.indexes[i].first_seq]
+        firsts = [self.indexes[i].first_seq for i in order]
+        k = bisect_right(firsts, seq) - 1
+        if k < 0:
+            return None
+        si = self.indexes[order[k]]
+        ordinal = seq - si.first_seq
+        if ordinal >= len(si):
+            return None
+        return si, ordinal
+
+    def read_seqs(self, seqs: List[int]) -> List[Dict[str, Any]]:
+        # seq 목록을 그 순서대로 읽는다. 항목마다 offset 으로 바로 찾아가므로 읽는 양은 결과 크기만큼
+        with self._lock:
+            self._fh.flush()
+            located = [self._locate(seq) for seq in seqs]
+            plan = [(si.path, si.byte_range(i, i + 1)) for si, i in filter(None, located)]
+        out = []
+        handles: Dict[str, Any] = {}
+        try:
+            for path, (start, stop) in plan:
+                f = handles.get(path)
+                if f is None:
+                    f = handles[path] = open(path, "rb")
+                f.seek(start)
+                out.append(json.loads(f.read(stop - start)))
+        finally:
+            for f in handles.values():
+                f.close()
+        return out
+
+    def recent_for_account(self, account: str, limit: int,
+                           before_seq: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        # 계좌별 posting list 로 최근 limit 건(최신순)만 읽는다. before_seq 를 주면 그보다 오래된 쪽
+        with self._lock:
+            seqs, more = self.postings.page(account, limit, before_seq)
+        return self.read_seqs(seqs), more
+
+    def count_for_account(self, account: str) -> int:
+        with self._lock:
+            return self.postings.count(account)
+
+    def count_range(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+        lo = ts_key(since) if since else float("-inf")
+        hi = ts_key(until) if until else float("inf")
+        with self._lock:
+            return sum(len(si.positions(lo, hi)[0]) for si in self.indexes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = index_stats(self.indexes)
+            out["indexed_accounts"] = len(self.postings.lists)
+            out["active_segment"] = self._names.get(self._segment)
+            return out
+
+    def close(self):
+        with self._lock:
+            if self._fh and not self._fh.closed:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._fh.close()
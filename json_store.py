@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson 이 없으면 표준 json 으로 같은 형식(압축 / 들여쓰기)을 만든다
+    orjson = None
+
+
+def dumps(data: Any, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(data, option=option)
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+def _fsync_dir(directory: str):
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JsonFileStore:
+    # JSON 문서 저장: 임시 파일에 쓰고 fsync 후 rename 하므로 기록 도중 종료돼도 원본은 그대로 남는다
+    # 내용이 마지막 기록과 같으면 다시 쓰지 않고, 백업(<파일>.bak1..N)은 backup_interval 마다 한 번만 돌린다
+    # SqliteStore 와 같은 load/save/ensure 인터페이스
+    # observer(op, 경로, 걸린 초, 바이트) 는 실제로 읽거나 쓴 경우에만 호출된다 (지표 수집용)
+    def __init__(self, backups: int = 3, backup_interval: float = 300, pretty: bool = False,
+                 observer: Optional[Callable[[str, str, float, int], None]] = None):
+        self.backups = max(0, int(backups))
+        self.observer = observer
+        self.backup_interval = float(backup_interval)
+        self.pretty = pretty
+        self._lock = threading.Lock()
+        # 경로 -> (마지막으로 읽거나 쓴 내용의 해시, 그때 mtime). 밖에서 파일을 고쳤으면 mtime 이 달라서 다시 쓴다
+        self._digests: Dict[str, tuple] = {}
+        self._rotated: Dict[str, float] = {}
+        self.writes = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.recovered: List[str] = []
+
+    def backup_paths(self, path: str) -> List[str]:
+        return [f"{path}.bak{i}" for i in range(1, self.backups + 1)]
+
+    def load(self, path: str) -> Any:
+        started = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            data = loads(raw)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            # 원본이 깨졌으면 가장 최근 백업부터 읽는다
+            for backup in self.backup_paths(path):
+                try:
+                    with open(backup, "rb") as f:
+                        data = loads(f.read())
+                except Exception:
+                    continue
+                print(f"[json_store] {path} unreadable ({e}); loaded {backup}")
+                self.recovered.append(path)
+                return data
+            raise
+        self._digests[path] = (hashlib.blake2b(raw, digest_size=16).digest(), self._mtime(path))
+        if self.observer is not None:
+            self.observer("load", path, time.perf_counter() - started, len(raw))
+        return data
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _rotate(self, path: str):
+        # 현재 파일을 .bak1 로 (하드링크, 안 되면 복사) 남기고 이전 백업은 한 칸씩 민다
+        now = time.monotonic()
+        if not self.backups or not os.path.exists(path) or now - self._rotated.get(path, -self.backup_interval) < self.backup_interval:
+            return
+        paths = self.backup_paths(path)
+        for older, newer in zip(reversed(paths[1:]), reversed(paths[:-1])):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        try:
+            if os.path.exists(paths[0]):
+                os.remove(paths[0])
+            os.link(path, paths[0])
+        except OSError:
+            shutil.copy2(path, paths[0])
+        self._rotated[path] = now
+
+    def save(self, path: str, data: Any):
+        started = time.perf_counter()
+        raw = dumps(data, self.pretty)
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        with self._lock:
+            if self._digests.get(path) == (digest, self._mtime(path)):
+                self.skipped += 1
+                return
+            directory = os.path.dirname(os.path.abspath(path))
+            tmp = f"{path}.tmp{os.getpid()}"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(raw)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._rotate(path)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+            _fsync_dir(directory)
+            self._digests[path] = (digest, self._mtime(path))
+            self.writes += 1
+            self.bytes_written += len(raw)
+        if self.observer is not None:
+            self.observer("save", path, time.perf_counter() - started, len(raw))
+
+    def ensure(self, path: str, default: Any):
+        if not os.path.exists(path):
+            self.save(path, default)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"writes": self.writes, "skipped": self.skipped, "bytes": self.bytes_written,
+                "orjson": orjson is not None, "recovered": list(self.recovered)}
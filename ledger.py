@@ -0,0 +1,385 @@
+import copy
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# 계좌 색인(계좌번호 <-> user id, 공용계좌)을 만드는 문서. 나머지 문서는 교체해도 재색인하지 않는다
+INDEXED_DOCS = ("users", "account_mapping", "public_accounts")
+# 행을 통째로 바꾸거나 행 안의 값만 바꾸는 큰 문서. flush 때 행까지만 복사하고, 나머지(설정 등)는 깊은 복사
+ROW_DOCS = INDEXED_DOCS + ("idempotency",)
+
+
+class Ledger:
+    def __init__(self, load: Callable[[str], Any], save: Callable[[str, Any], None]):
+        self._load = load
+        self._save = save
+        self.paths: Dict[str, str] = {}
+        # 파일을 읽지 못해 fallback 으로 시작한 문서 (체크포인트/저널로 복구해야 함)
+        self.load_failed: set[str] = set()
+        self.data: Dict[str, Any] = {}
+        self.dirty: set[str] = set()
+        self._flush_lock = threading.Lock()
+        self.uid_by_account: Dict[str, str] = {}
+        self.account_by_uid: Dict[str, str] = {}
+        self.public_by_account: Dict[str, str] = {}
+        self.duplicate_accounts: Dict[str, List[str]] = {}
+        self.journal = None
+        self.state_path: Optional[str] = None
+        self.applied_seq = 0
+        self.last_applied_seq = 0
+        # 계좌 행이 바뀔 때 호출: fn(바뀐 계좌번호들) 또는 전체 재색인이면 fn(None)
+        self.listeners: List[Callable[[Optional[List[str]]], None]] = []
+        # 반영된 저널 항목마다 호출 (집계용)
+        self.entry_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        # 저널 기록이 끝날 때마다 호출: fn(항목 수, 걸린 초) (지표용)
+        self.on_append: Optional[Callable[[int, float], None]] = None
+        # post 마다 호출해서 첫 항목의 upserts 에 더할 문서 행을 받는다 (예: 멱등성 키). 같은 커밋에 기록된다
+        self.stamp: Optional[Callable[[], Optional[Dict[str, Dict[str, Any]]]]] = None
+
+    def subscribe(self, fn: Callable[[Optional[List[str]]], None]):
+        self.listeners.append(fn)
+
+    def subscribe_entries(self, fn: Callable[[Dict[str, Any]], None]):
+        self.entry_listeners.append(fn)
+
+    def _notify(self, accounts: Optional[List[str]]):
+        for fn in self.listeners:
+            try:
+                fn(accounts)
+            except Exception as e:
+                print(f"[ledger] listener failed: {e}")
+
+    def attach(self, name: str, path: str, fallback: Optional[Any] = None):
+        self.paths[name] = path
+        try:
+            self.data[name] = self._load(path)
+        except Exception as e:
+            if fallback is None:
+                raise
+            print(f"[ledger] load failed name={name}: {e}")
+            self.load_failed.add(name)
+            self.data[name] = fallback
+        return self.data[name]
+
+    def get(self, name: str) -> Any:
+        return self.data[name]
+
+    def put(self, name: str, value: Any):
+        # 다른 객체를 넘겨받은 경우에만 교체(+색인 문서면 재색인)하고, 항상 dirty로 표시
+        if self.data.get(name) is not value:
+            self.data[name] = value
+            if name in INDEXED_DOCS:
+                self.reindex()
+        self.dirty.add(name)
+
+    def read(self, name: str) -> Any:
+        # 디스크 내용만 읽는다 (메모리/색인은 건드리지 않으므로 워커 스레드에서 호출 가능)
+        return self._load(self.paths[name])
+
+    def replace(self, name: str, value: Any) -> bool:
+        # 이벤트 루프에서 호출. read() 결과가 메모리와 다를 때만 교체한다 (밖에서 파일을 직접 고친 경우용)
+        if value == self.data.get(name):
+            return False
+        self.data[name] = value
+        if name in INDEXED_DOCS:
+            self.reindex()
+        return True
+
+    def mark_dirty(self, name: str):
+        self.dirty.add(name)
+
+    def snapshot_dirty(self) -> Dict[str, Any]:
+        # 이벤트 루프에서 호출. dirty 문서를 복사하고 그 내용이 반영한 저널 seq 를 함께 잡아 둔다
+        names = sorted(self.dirty)
+        self.dirty.difference_update(names)
+        docs = {}
+        for name in names:
+            value = self.data[name]
+            if name in ROW_DOCS:
+                docs[name] = {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+            else:
+                docs[name] = copy.deepcopy(value)
+        return {"seq": self.last_applied_seq, "docs": docs}
+
+    def write(self, snapshot: Dict[str, Any]) -> int:
+        # 워커 스레드에서 호출. 복사본만 직렬화하므로 루프가 메모리를 계속 바꿔도 된다
+        with self._flush_lock:
+            seq = snapshot["seq"]
+            if self.journal:
+                self.journal.sync()
+            written = 0
+            failed = set()
+            for name, value in snapshot["docs"].items():
+                try:
+                    self._save(self.paths[name], value)
+                    written += 1
+                except Exception as e:
+                    failed.add(name)
+                    self.dirty.add(name)
+                    print(f"[ledger] flush failed name={name}: {e}")
+            if "users" in snapshot["docs"] and "users" not in failed:
+                # users.json 이 어느 저널 seq 까지 반영했는지 기록 (재시작 시 그 뒤만 재생)
+                self._write_state(seq)
+                if getattr(self.journal, "users_pending", False):
+                    # 저장소가 저널과 겹친 행을 건너뛰었다. 다음 flush 에서 마저 쓴다
+                    self.dirty.add("users")
+            return written
+
+    def flush(self) -> int:
+        # 루프가 돌지 않을 때(시작/종료) 바로 기록
+        return self.write(self.snapshot_dirty())
+
+    def _write_state(self, seq: int):
+        self.applied_seq = max(self.applied_seq, seq)
+        if self.state_path:
+            try:
+                self._save(self.state_path, {"journal_seq": seq})
+            except Exception as e:
+                print(f"[ledger] state write failed: {e}")
+
+    # 계좌번호 <-> user id <-> 공용계좌 이름 색인
+    def reindex(self):
+        self.uid_by_account = {}
+        self.account_by_uid = {}
+        self.public_by_account = {}
+        self.duplicate_accounts = {}
+        for uid, row in self.data.get("users", {}).items():
+            self.index_user(uid, row)
+        for acc, entry in self.data.get("account_mapping", {}).items():
+            self.index_mapping(acc, entry)
+        for name, entry in self.data.get("public_accounts", {}).items():
+            self.index_public(name, entry)
+        self._notify(None)
+
+    def index_user(self, uid: str, row: Any):
+        if not isinstance(row, dict) or not row.get("계좌번호"):
+            return
+        uid = str(uid)
+        acc = str(row["계좌번호"])
+        owner = self.uid_by_account.get(acc)
+        if owner is not None and owner != uid:
+            self.duplicate_accounts.setdefault(acc, [owner]).append(uid)
+            return
+        self.uid_by_account[acc] = uid
+        self.account_by_uid.setdefault(uid, acc)
+
+    def index_mapping(self, acc: str, entry: Any):
+        if not isinstance(entry, dict) or entry.get("user_id") is None:
+            return
+        self.account_by_uid[str(entry["user_id"])] = str(acc)
+
+    def index_public(self, name: str, entry: Any):
+        if isinstance(entry, dict) and entry.get("account_number"):
+            self.public_by_account[str(entry["account_number"])] = name
+
+    def uid_for_account(self, account_number: Optional[str]) -> Optional[str]:
+        if account_number is None:
+            return None
+        return self.uid_by_account.get(str(account_number))
+
+    def account_for_user(self, user_id: Any) -> Optional[str]:
+        return self.account_by_uid.get(str(user_id))
+
+    def public_name_for_account(self, account_number: Optional[str]) -> Optional[str]:
+        if account_number is None:
+            return None
+        return self.public_by_account.get(str(account_number))
+
+    def row_for_account(self, account_number: Optional[str]) -> Optional[dict]:
+        uid = self.uid_for_account(account_number)
+        if uid is None:
+            return None
+        return self.data["users"].get(uid)
+
+    def account_names(self) -> Dict[str, str]:
+        users = self.data.get("users", {})
+        return {acc: users[uid].get("이름", "?") for acc, uid in self.uid_by_account.items() if uid in users}
+
+    def name_for_account(self, account_number: Optional[str], default: str = "?") -> str:
+        row = self.row_for_account(account_number)
+        return row.get("이름", default) if row else default
+
+    def check_consistency(self) -> List[str]:
+        users = self.data.get("users", {})
+        mapping = self.data.get("account_mapping", {})
+        publics = self.data.get("public_accounts", {})
+        issues: List[str] = []
+        for acc, owners in self.duplicate_accounts.items():
+            issues.append(f"계좌번호 {acc} 중복: {', '.join(owners)}")
+        for uid, row in users.items():
+            if not isinstance(row, dict):
+                issues.append(f"users[{uid}] 형식 오류")
+                continue
+            acc = row.get("계좌번호")
+            if not acc:
+                issues.append(f"users[{uid}] 계좌번호 없음")
+                continue
+            # 공용계좌/CSV 생성 계좌는 계좌번호를 키로 쓰므로 mapping 대상이 아님
+            if uid == acc or row.get("공용계좌"):
+                continue
+            entry = mapping.get(acc)
+            if not isinstance(entry, dict):
+                issues.append(f"users[{uid}] 계좌 {acc} 가 account_mapping 에 없음")
+            elif str(entry.get("user_id")) != str(uid):
+                issues.append(f"계좌 {acc}: users={uid} / mapping={entry.get('user_id')}")
+        for acc, entry in mapping.items():
+            if not isinstance(entry, dict):
+                issues.append(f"account_mapping[{acc}] 형식 오류")
+                continue
+            uid = str(entry.get("user_id"))
+            row = users.get(uid)
+            if not isinstance(row, dict):
+                issues.append(f"account_mapping[{acc}] 의 사용자 {uid} 가 users 에 없음")
+            elif str(row.get("계좌번호")) != str(acc):
+                issues.append(f"account_mapping[{acc}] 사용자 {uid} 의 실제 계좌는 {row.get('계좌번호')}")
+        for name, entry in publics.items():
+            acc = entry.get("account_number") if isinstance(entry, dict) else None
+            if not acc or self.uid_for_account(acc) is None:
+                issues.append(f"공용계좌 {name} ({acc}) 가 users 에 없음")
+        return issues
+
+    # 저널(write-ahead) 연동
+    def attach_journal(self, journal, state_path: str):
+        self.journal = journal
+        self.state_path = state_path
+        try:
+            self.applied_seq = int(self._load(state_path).get("journal_seq", 0))
+        except Exception:
+            self.applied_seq = 0
+        if "users" in self.load_failed:
+            # users.json 을 못 읽었으면 기록된 seq 는 의미가 없다
+            self.applied_seq = 0
+        self.last_applied_seq = self.applied_seq
+
+    def restore_checkpoint(self, seq: int, docs: Dict[str, Any]) -> bool:
+        # 체크포인트가 users.json 보다 앞서 있을 때만 올린다. 이후 replay() 가 seq 뒤만 재생
+        if seq <= self.applied_seq:
+            return False
+        for name, value in docs.items():
+            if name in self.paths:
+                self.data[name] = value
+                self.dirty.add(name)
+                self.load_failed.discard(name)
+        self.applied_seq = self.last_applied_seq = int(seq)
+        self.reindex()
+        return True
+
+    def import_legacy(self, transactions: List[Dict[str, Any]]) -> int:
+        # 예전 transactions.json 기록은 이미 users.json 에 반영되어 있으므로 재생 대상이 아님
+        if not self.journal or self.journal.last_seq or not transactions:
+            return 0
+        entries = [dict(t) for t in transactions if isinstance(t, dict)]
+        self.journal.append_many(entries)
+        self.journal.sync()
+        self.last_applied_seq = self.journal.last_seq
+        self._write_state(self.journal.last_seq)
+        return len(entries)
+
+    def replay(self) -> int:
+        if not self.journal:
+            return 0
+        count = 0
+        for entry in self.journal.iter(self.applied_seq):
+            self._apply(entry, persisted=False)
+            count += 1
+        if count:
+            print(f"[ledger] replayed {count} journal entries after seq={self.applied_seq}")
+            # 재생 결과를 바로 저장해서 이후 커밋이 상태 seq 를 앞질러도 유실되지 않게 한다
+            self.flush()
+        return count
+
+    def post(self, tx_type: str, from_user: str, to_user: str, amount: int, fee: int = 0, memo: str = "",
+             deltas: Optional[Dict[str, int]] = None, upserts: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        return self.post_many([{
+            "type": tx_type, "from_user": from_user, "to_user": to_user,
+            "amount": amount, "fee": fee, "memo": memo,
+            "deltas": deltas, "upserts": upserts,
+        }])[0]
+
+    def post_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        now = datetime.now().isoformat()
+        staged: Dict[str, int] = {}
+        entries = []
+        for item in items:
+            entry = {
+                "timestamp": item.get("timestamp") or now,
+                "type": item["type"],
+                "from_user": item["from_user"],
+                "to_user": item["to_user"],
+                "amount": int(item.get("amount", 0)),
+                "fee": int(item.get("fee", 0)),
+                "memo": item.get("memo", ""),
+            }
+            if item.get("batch"):
+                entry["batch"] = item["batch"]
+            upserts = item.get("upserts")
+            if upserts:
+                for row in upserts.get("users", {}).values():
+                    staged[str(row["계좌번호"])] = int(row.get("잔액", 0))
+                entry["upserts"] = upserts
+            deltas = {str(k): int(v) for k, v in (item.get("deltas") or {}).items()}
+            if deltas:
+                balances = {}
+                for acc, delta in deltas.items():
+                    cur = staged.get(acc)
+                    if cur is None:
+                        row = self.row_for_account(acc)
+                        if row is None:
+                            raise KeyError(f"unknown account {acc}")
+                        cur = int(row.get("잔액", 0))
+                    staged[acc] = balances[acc] = cur + delta
+                entry["deltas"] = deltas
+                entry["balances"] = balances
+            entries.append(entry)
+        stamp = self.stamp() if self.stamp is not None and entries else None
+        if stamp:
+            upserts = dict(entries[0].get("upserts") or {})
+            for name, rows in stamp.items():
+                upserts[name] = {**upserts.get(name, {}), **rows}
+            entries[0]["upserts"] = upserts
+        if self.journal:
+            started = time.perf_counter()
+            self.journal.append_many(entries)
+            if self.on_append is not None:
+                self.on_append(len(entries), time.perf_counter() - started)
+        for entry in entries:
+            self._apply(entry)
+        return entries
+
+    def _apply(self, entry: Dict[str, Any], persisted: bool = True):
+        # SQLite 처럼 저장소가 행까지 함께 커밋하는 경우에는 다시 flush 할 필요가 없다
+        mark = not (persisted and getattr(self.journal, "stores_rows", False))
+        touched: List[str] = []
+        for name, rows in (entry.get("upserts") or {}).items():
+            table = self.data.setdefault(name, {})
+            for key, row in rows.items():
+                table[key] = dict(row)
+                if name == "users":
+                    self.index_user(key, table[key])
+                    touched.append(str(table[key].get("계좌번호")))
+                elif name == "account_mapping":
+                    self.index_mapping(key, table[key])
+                elif name == "public_accounts":
+                    self.index_public(key, table[key])
+                    touched.append(str(table[key].get("account_number")))
+            if mark:
+                self.dirty.add(name)
+        balances = entry.get("balances")
+        if balances:
+            for acc, bal in balances.items():
+                row = self.row_for_account(acc)
+                if row is not None:
+                    row["잔액"] = int(bal)
+            touched.extend(balances)
+            if mark:
+                self.dirty.add("users")
+        if touched and self.listeners:
+            self._notify(touched)
+        for fn in self.entry_listeners:
+            try:
+                fn(entry)
+            except Exception as e:
+                print(f"[ledger] entry listener failed: {e}")
+        if entry.get("seq"):
+            self.last_applied_seq = max(self.last_applied_seq, int(entry["seq"]))
@@ -0,0 +1,107 @@
+import heapq
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _expire_ts(value: Any) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except Exception:
+        return 0.0
+
+
+class LinkRegistry:
+    # roblox_links 문서({"links": {discord_id: 정보}, "pending": {discord_id: {code, expire}}})를 그대로 들고
+    # code -> discord_id, roblox_user_id -> discord_id 색인과 만료 힙을 함께 유지한다
+    # persist(kind, discord_id, data or None) 로 바뀐 한 건만 저장소에 알린다
+    def __init__(self, doc: Dict[str, Any], persist: Callable[[str, str, Optional[Dict[str, Any]]], None]):
+        self.doc = doc
+        self.links: Dict[str, Dict[str, Any]] = doc.setdefault("links", {})
+        self.pending: Dict[str, Dict[str, Any]] = doc.setdefault("pending", {})
+        self.persist = persist
+        self.by_code: Dict[str, str] = {}
+        self.by_roblox: Dict[str, str] = {}
+        self._heap: List[Tuple[float, str, str]] = []
+        self.expired = 0
+        for discord_id, info in self.links.items():
+            self.by_roblox[str(info.get("roblox_user_id"))] = discord_id
+        for discord_id, entry in self.pending.items():
+            self._index_pending(discord_id, entry)
+        self.purge()
+
+    def _index_pending(self, discord_id: str, entry: Dict[str, Any]):
+        code = str(entry.get("code"))
+        self.by_code[code] = discord_id
+        heapq.heappush(self._heap, (_expire_ts(entry.get("expire")), discord_id, code))
+
+    def _drop_pending(self, discord_id: str):
+        entry = self.pending.pop(discord_id, None)
+        if entry is not None:
+            code = str(entry.get("code"))
+            if self.by_code.get(code) == discord_id:
+                del self.by_code[code]
+            self.persist("pending", discord_id, None)
+
+    def purge(self, now: Optional[float] = None) -> int:
+        # 힙 맨 앞에서 만료된 것만 꺼내므로 O(만료된 수 * log n). 재발급으로 바뀐 코드는 여기서 조용히 버려진다
+        now = time.time() if now is None else now
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, discord_id, code = heapq.heappop(self._heap)
+            entry = self.pending.get(discord_id)
+            if entry is not None and str(entry.get("code")) == code:
+                self._drop_pending(discord_id)
+                removed += 1
+        self.expired += removed
+        return removed
+
+    def issue(self, discord_id: str, make_code: Callable[[], str], ttl: float) -> Tuple[str, str]:
+        self.purge()
+        discord_id = str(discord_id)
+        self._drop_pending(discord_id)
+        code = make_code()
+        while code in self.by_code:
+            code = make_code()
+        expire = datetime.fromtimestamp(time.time() + ttl).isoformat()
+        entry = {"code": code, "expire": expire}
+        self.pending[discord_id] = entry
+        self._index_pending(discord_id, entry)
+        self.persist("pending", discord_id, entry)
+        return code, expire
+
+    def verify(self, code: str) -> Optional[str]:
+        self.purge()
+        return self.by_code.get(str(code).strip())
+
+    def get(self, discord_id: str) -> Optional[Dict[str, Any]]:
+        return self.links.get(str(discord_id))
+
+    def discord_for_roblox(self, roblox_user_id: Any) -> Optional[str]:
+        return self.by_roblox.get(str(roblox_user_id))
+
+    def link(self, discord_id: str, roblox_user_id: Any, roblox_username: str = "", **extra: Any) -> Dict[str, Any]:
+        discord_id = str(discord_id)
+        self._drop_pending(discord_id)
+        old = self.links.get(discord_id)
+        if old is not None:
+            self.by_roblox.pop(str(old.get("roblox_user_id")), None)
+        info = {"roblox_user_id": roblox_user_id, "roblox_username": roblox_username,
+                "linked_at": datetime.now().isoformat(), **extra}
+        self.links[discord_id] = info
+        self.by_roblox[str(roblox_user_id)] = discord_id
+        self.persist("links", discord_id, info)
+        return info
+
+    def unlink(self, discord_id: str) -> bool:
+        discord_id = str(discord_id)
+        info = self.links.pop(discord_id, None)
+        if info is None:
+            return False
+        if self.by_roblox.get(str(info.get("roblox_user_id"))) == discord_id:
+            del self.by_roblox[str(info.get("roblox_user_id"))]
+        self.persist("links", discord_id, None)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"links": len(self.links), "pending": len(self.pending), "heap": len(self._heap), "expired": self.expired}
@@ -0,0 +1,140 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 초 단위 히스토그램 경계 (Prometheus le). 1ms ~ 30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class Histogram:
+    # Prometheus 용 누적 버킷 + 백분위 계산용 최근 window 개 표본
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def percentiles(self, qs=QUANTILES) -> Dict[float, float]:
+        data = sorted(self.recent)
+        if not data:
+            return {q: 0.0 for q in qs}
+        return {q: data[min(len(data) - 1, int(q * len(data)))] for q in qs}
+
+
+class Metrics:
+    # 카운터/게이지/히스토그램 모음. 워커 스레드(저장)와 이벤트 루프에서 함께 기록하므로 잠금을 쓴다
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def describe(self, name: str, kind: str, text: str):
+        self._meta[name] = (kind, text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _key(labels)
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(window=self.window)
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_key(labels), 0)
+
+    def histograms(self, name: str) -> List[Tuple[Dict[str, str], Histogram]]:
+        with self._lock:
+            return [(dict(key), hist) for key, hist in self._histograms.get(name, {}).items()]
+
+    def summary(self, name: str, **labels) -> Optional[Dict[str, float]]:
+        # 관리자 명령용: count / p50 / p95 / p99 / max (초)
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(_key(labels))
+            if hist is None or not hist.count:
+                return None
+            p = hist.percentiles()
+            return {"count": hist.count, "p50": p[0.5], "p95": p[0.95], "p99": p[0.99], "max": hist.max}
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        out: List[str] = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(store):
+                    self._header(out, name, kind)
+                    for key, value in store[name].items():
+                        out.append(f"{name}{_fmt_labels(key)} {_fmt_value(value)}")
+            for name in sorted(self._histograms):
+                self._header(out, name, "histogram")
+                for key, hist in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                        cumulative += count
+                        out.append(f"{name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+                    out.append(f"{name}_sum{_fmt_labels(key)} {hist.sum!r}")
+                    out.append(f"{name}_count{_fmt_labels(key)} {hist.count}")
+        return "\n".join(out) + "\n"
+
+    def _header(self, out: List[str], name: str, kind: str):
+        meta = self._meta.get(name)
+        if meta:
+            out.append(f"# HELP {name} {meta[1]}")
+        out.append(f"# TYPE {name} {meta[0] if meta else kind}")
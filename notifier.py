@@ -0,0 +1,151 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+class TokenBucket:
+    # rate 개/초로 채워지고 capacity 개까지 몰아 쓸 수 있다. 429 를 받으면 block() 으로 그 시간 동안 멈춘다
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(0.001, float(rate))
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        # 지금 하나를 꺼내려면 몇 초 기다려야 하는지 (0 이면 바로 가능)
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: Optional[float] = None):
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= 1
+
+    def block(self, seconds: float, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.blocked_until = max(self.blocked_until, now + max(0.0, seconds))
+        self.tokens = 0.0
+
+
+class _Route:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.pending: Deque[List[Any]] = deque()
+        self.scheduled = False
+        self.sent = 0
+        self.failed = 0
+
+
+class Notifier:
+    # 공지 발송 대기열. enqueue 는 바로 돌아오고, 워커가 경로(채널)별 토큰 버킷 + 전체 버킷을 지키며 보낸다
+    # 같은 채널의 메시지는 순서대로 하나씩만 나가고, 다른 채널은 동시에 나간다
+    # send(route, payload) 가 retry_after 속성이 있는 예외(429)를 내면 그 채널을 그만큼 멈추고 다시 시도한다
+    def __init__(self, send: Callable[[Any, Any], Awaitable[Any]], max_pending: int = 1000, workers: int = 2,
+                 route_rate: float = 1.0, route_burst: int = 5, global_rate: float = 40.0, max_attempts: int = 3):
+        self.send = send
+        self.max_pending = max(1, int(max_pending))
+        self.workers = max(1, int(workers))
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self.max_attempts = max(1, int(max_attempts))
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.routes: Dict[Any, _Route] = {}
+        self.pending = 0
+        self.enqueued = 0
+        self.dropped = 0
+        self.retried = 0
+        self.sent = 0
+        self.failed = 0
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        for route, r in self.routes.items():
+            # 시작 전에 쌓인 메시지
+            if r.pending and not r.scheduled:
+                r.scheduled = True
+                self._ready.put_nowait(route)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def enqueue(self, route: Any, payload: Any) -> bool:
+        # 대기열이 가득 차면 버리고 False (호출한 작업은 기다리지 않는다)
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            return False
+        r = self.routes.get(route)
+        if r is None:
+            r = self.routes[route] = _Route(TokenBucket(self.route_rate, self.route_burst))
+        r.pending.append([payload, 0])
+        self.pending += 1
+        self.enqueued += 1
+        if not r.scheduled and self._ready is not None:
+            r.scheduled = True
+            self._ready.put_nowait(route)
+        return True
+
+    def _requeue(self, route: Any, r: _Route):
+        # 경로에 남은 메시지가 있으면 버킷이 허락하는 시각에 다시 준비 목록에 넣는다
+        if not r.pending:
+            r.scheduled = False
+            return
+        wait = r.bucket.delay()
+        if wait <= 0:
+            self._ready.put_nowait(route)
+        else:
+            asyncio.get_running_loop().call_later(wait, self._ready.put_nowait, route)
+
+    async def _worker(self):
+        while True:
+            route = await self._ready.get()
+            r = self.routes[route]
+            wait = r.bucket.delay()
+            if wait > 0:
+                self._requeue(route, r)
+                continue
+            wait = self.global_bucket.delay()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.global_bucket.delay()
+            self.global_bucket.take()
+            r.bucket.take()
+            item = r.pending[0]
+            try:
+                await self.send(route, item[0])
+                r.pending.popleft()
+                self.pending -= 1
+                r.sent += 1
+                self.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                item[1] += 1
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is not None:
+                    r.bucket.block(float(retry_after))
+                if item[1] >= self.max_attempts:
+                    print(f"[notifier] drop message for {route}: {e}")
+                    r.pending.popleft()
+                    self.pending -= 1
+                    r.failed += 1
+                    self.failed += 1
+                else:
+                    self.retried += 1
+                    if retry_after is None:
+                        r.bucket.block(2 ** item[1])
+            self._requeue(route, r)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self.pending, "max_pending": self.max_pending, "enqueued": self.enqueued,
+                "sent": self.sent, "failed": self.failed, "retried": self.retried, "dropped": self.dropped,
+                "routes": len(self.routes), "running": bool(self._tasks)}
@@ -0,0 +1,100 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+# 보고서에 이름을 남길 건너뛴 사용자 수 상한
+REPORT_SAMPLE = 20
+
+
+def plan_payroll(salaries: Dict[str, Any], users: Dict[str, Any], frozen: Iterable[str],
+                 source_acc: Optional[str], source_balance: Optional[int]) -> Dict[str, Any]:
+    # 이번 회차 지급 목록을 한 번에 만든다. 계좌 없음/동결/0원은 건너뛰고 보고서에 남긴다
+    frozen_set = set(frozen)
+    accounts: List[str] = []
+    amounts: List[int] = []
+    missing: List[str] = []
+    skipped_frozen: List[str] = []
+    for user_id, amount in salaries.items():
+        try:
+            amount = int(amount)
+        except (TypeError, ValueError):
+            amount = 0
+        if amount <= 0:
+            continue
+        row = users.get(str(user_id))
+        acc = row.get("계좌번호") if isinstance(row, dict) else None
+        if not acc:
+            missing.append(str(user_id))
+            continue
+        if acc in frozen_set:
+            skipped_frozen.append(str(acc))
+            continue
+        if acc == source_acc:
+            # 지급 계좌 자신에게 주는 월급은 의미가 없다
+            continue
+        accounts.append(str(acc))
+        amounts.append(amount)
+    total = sum(amounts)
+    sufficient = source_acc is None or (source_balance is not None and source_balance >= total)
+    return {
+        "source": source_acc,
+        "source_balance": source_balance,
+        "accounts": accounts,
+        "amounts": amounts,
+        "count": len(accounts),
+        "total": total,
+        "missing": missing,
+        "frozen": skipped_frozen,
+        "sufficient": sufficient,
+        "shortfall": 0 if sufficient else total - int(source_balance or 0),
+    }
+
+
+def payroll_batch_items(plan: Dict[str, Any], memo: str = "월급 자동 지급",
+                        batch_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    # tax_engine.tax_batch_items 와 같은 구조: 요약 레코드 하나가 지급 계좌 차감과 모든 입금을 담고,
+    # 계좌별 항목은 거래내역용 기록이라 잔액을 다시 바꾸지 않는다. 지급 계좌가 없으면 SYSTEM 발행
+    # 항목은 PAYROLL 에서 직원에게 가는 것으로 적어서 지급 계좌 거래내역에는 요약 한 줄만 남는다
+    batch_id = batch_id or uuid.uuid4().hex[:12]
+    source = plan["source"] or "SYSTEM"
+    deltas: Dict[str, int] = {}
+    for acc, amt in zip(plan["accounts"], plan["amounts"]):
+        deltas[acc] = deltas.get(acc, 0) + amt
+    if plan["source"]:
+        deltas[plan["source"]] = deltas.get(plan["source"], 0) - plan["total"]
+    items = [{
+        "type": "월급 일괄지급",
+        "from_user": source,
+        "to_user": "PAYROLL",
+        "amount": plan["total"],
+        "fee": 0,
+        "memo": f"월급 {plan['count']}명 지급",
+        "deltas": deltas,
+        "batch": {"id": batch_id, "kind": "payroll", "role": "summary", "count": plan["count"]},
+    }]
+    for acc, amt in zip(plan["accounts"], plan["amounts"]):
+        items.append({
+            "type": "월급지급",
+            "from_user": "PAYROLL",
+            "to_user": acc,
+            "amount": amt,
+            "fee": 0,
+            "memo": memo,
+            "batch": {"id": batch_id, "kind": "payroll", "role": "line"},
+        })
+    return items
+
+
+def payroll_report(plan: Dict[str, Any], slot_date: str, source_after: Optional[int]) -> Dict[str, Any]:
+    return {
+        "date": slot_date,
+        "at": datetime.now().isoformat(),
+        "source": plan["source"],
+        "paid": plan["count"],
+        "total": plan["total"],
+        "source_after": source_after,
+        "missing": len(plan["missing"]),
+        "frozen": len(plan["frozen"]),
+        "missing_sample": plan["missing"][:REPORT_SAMPLE],
+        "frozen_sample": plan["frozen"][:REPORT_SAMPLE],
+    }
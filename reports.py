@@ -0,0 +1,160 @@
+import csv
+import gzip
+import io
+import tempfile
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pytz
+from openpyxl import Workbook
+
+SPECIAL_ACCOUNTS = ("SYSTEM", "ADMIN", "TREASURY", "MAP", "PAYROLL")
+KST = pytz.timezone("Asia/Seoul")
+EXPORT_COLUMNS = ["날짜", "시간", "거래유형", "송금자계좌", "송금자이름", "수금자계좌", "수금자이름", "거래금액", "수수료", "메모"]
+EXPORT_FORMATS = {"xlsx": ".xlsx", "csv": ".csv", "csv.gz": ".csv.gz"}
+
+# 워커(스레드/프로세스)에서 실행되는 함수들: 인자는 모두 pickle 가능한 값만 받는다
+
+
+def transaction_row(t: Dict[str, Any], names: Dict[str, str]) -> Dict[str, Any]:
+    try:
+        ts = datetime.fromisoformat(t["timestamp"])
+        # UTC 시간을 한국시간(KST)으로 변환
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        ts_kst = ts.astimezone(KST)
+        date_str = ts_kst.strftime("%Y-%m-%d")
+        time_str = ts_kst.strftime("%H:%M:%S")
+    except Exception:
+        date_str = "-"
+        time_str = "-"
+    fu = t.get("from_user")
+    tu = t.get("to_user")
+    return {
+        "날짜": date_str,
+        "시간": time_str,
+        "거래유형": t.get("type", ""),
+        "송금자계좌": fu,
+        "송금자이름": fu if fu in SPECIAL_ACCOUNTS else names.get(fu, "?"),
+        "수금자계좌": tu,
+        "수금자이름": tu if tu in SPECIAL_ACCOUNTS else names.get(tu, "?"),
+        "거래금액": int(t.get("amount", 0)),
+        "수수료": int(t.get("fee", 0)),
+        "메모": t.get("memo", ""),
+    }
+
+
+def iter_export_rows(txs: Iterable[Dict[str, Any]], names: Dict[str, str], since: Optional[datetime],
+                     targets: Optional[List[str]]) -> Iterator[List[Any]]:
+    # 기간/대상 필터를 읽으면서 적용하고 한 행씩 내보낸다
+    target_set = set(targets) if targets else None
+    for t in txs:
+        if target_set is not None and t.get("from_user") not in target_set and t.get("to_user") not in target_set:
+            continue
+        if since:
+            # 기간 색인(iter_range)으로 이미 걸러서 넘어오면 since 는 None 이라 파싱하지 않는다
+            try:
+                if datetime.fromisoformat(t["timestamp"]) < since:
+                    continue
+            except Exception:
+                continue
+        row = transaction_row(t, names)
+        yield [row[c] for c in EXPORT_COLUMNS]
+
+
+def _spooled(spool_bytes: int):
+    return tempfile.SpooledTemporaryFile(max_size=spool_bytes, mode="w+b")
+
+
+def _write_xlsx_part(rows: List[List[Any]], buf) -> int:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("거래내역")
+    ws.append(EXPORT_COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(buf)
+    return len(rows)
+
+
+def _write_csv_part(rows: Iterator[List[Any]], max_bytes: int, buf, compress: bool) -> Tuple[int, bool]:
+    raw = gzip.GzipFile(fileobj=buf, mode="wb") if compress else buf
+    text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    exhausted = True
+    # gzip 은 내부 버퍼 때문에 실제 크기보다 작게 보이므로 여유를 둔다
+    soft_limit = int(max_bytes * (0.9 if compress else 0.98))
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if buf.tell() >= soft_limit:
+            exhausted = False
+            break
+    text.flush()
+    text.detach()
+    if compress:
+        raw.close()
+    return count, exhausted
+
+
+def stream_export(txs: Iterable[Dict[str, Any]], names: Dict[str, str], since: Optional[datetime],
+                  targets: Optional[List[str]], fmt: str = "xlsx", max_bytes: int = 8 * 1024 * 1024,
+                  spool_bytes: int = 4 * 1024 * 1024, max_parts: int = 20) -> Tuple[List[Tuple[Any, int]], int, bool]:
+    # 첨부 한도(max_bytes)를 넘으면 여러 파일로 나눈다. 반환: ([(버퍼, 행수)], 총 행수, 잘렸는지)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt}")
+    rows = iter_export_rows(txs, names, since, targets)
+    # 크기를 넘어 다시 나눈 xlsx 파트에서 다음 파트로 넘긴 행
+    pending: Deque[List[Any]] = deque()
+    parts: List[Tuple[Any, int]] = []
+    total = 0
+    bytes_per_row = 120.0
+    # 첫 파트는 행당 크기를 모르므로 한도의 절반만 목표로 잡는다
+    target = 0.5
+    exhausted = False
+    while not exhausted and len(parts) < max_parts:
+        buf = _spooled(spool_bytes)
+        if fmt == "xlsx":
+            # xlsx 는 저장 전에는 크기를 알 수 없어서 직전 파트의 행당 크기로 행 수를 정하고,
+            # 저장한 뒤 한도를 넘었으면 앞쪽 절반만 다시 쓰고 나머지는 다음 파트로 넘긴다
+            limit = max(1, int(max_bytes * target / bytes_per_row))
+            chunk = [pending.popleft() for _ in range(min(limit, len(pending)))]
+            chunk.extend(islice(rows, limit - len(chunk)))
+            exhausted = len(chunk) < limit
+            count = _write_xlsx_part(chunk, buf)
+            while buf.tell() > max_bytes and count > 1:
+                keep = count // 2
+                pending.extendleft(reversed(chunk[keep:]))
+                chunk = chunk[:keep]
+                exhausted = False
+                buf.seek(0)
+                buf.truncate()
+                count = _write_xlsx_part(chunk, buf)
+            if count:
+                bytes_per_row = max(20.0, buf.tell() / count)
+            target = 0.85
+        else:
+            count, exhausted = _write_csv_part(rows, max_bytes, buf, fmt == "csv.gz")
+        buf.seek(0)
+        if count or not parts:
+            parts.append((buf, count))
+        else:
+            buf.close()
+        total += count
+    truncated = False
+    if not exhausted:
+        truncated = bool(pending) or next(rows, None) is not None
+    return parts, total, truncated
+
+
+def parse_csv_rows(text: str) -> List[Dict[str, Any]]:
+    try:
+        # 계좌번호 앞자리 0 이 사라지지 않도록 전부 문자열로 읽는다
+        df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+        return df.to_dict(orient="records")
+    except Exception:
+        return list(csv.DictReader(io.StringIO(text)))
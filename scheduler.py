@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# 너무 먼 예약도 이 간격마다 한 번 깨어나서 시계 변경(NTP 보정 등)을 반영한다
+MAX_SLEEP = 6 * 3600
+# 실패한 작업은 RETRY_BASE 초 뒤부터 실패할 때마다 두 배씩 (최대 RETRY_MAX) 미뤄서 다시 시도한다
+RETRY_BASE = 600
+RETRY_MAX = 6 * 3600
+
+
+def nth_weekday_after(after: float, tz, weekday: int, nth: int, hour: int = 0) -> float:
+    # after(epoch) 이후 처음 오는 "그 달 nth 번째 weekday 의 hour 시" (tz 기준, pytz 타임존)
+    local = datetime.fromtimestamp(after, tz).replace(tzinfo=None)
+    month = local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while True:
+        first = 1 + (weekday - month.weekday()) % 7
+        fire = tz.localize(month.replace(day=first + 7 * (nth - 1), hour=hour)).timestamp()
+        if fire > after:
+            return fire
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+class Job:
+    # next_fire(저장된 다음 예정 시각 or None, 현재 시각) -> 다음 실행 시각(epoch) 또는 None(비활성)
+    # run(예정 시각) 은 실제 작업을 하고 결과 요약(dict/str)을 돌려준다
+    def __init__(self, name: str, next_fire: Callable[[Optional[float], float], Optional[float]],
+                 run: Callable[[float], Awaitable[Any]]):
+        self.name = name
+        self.next_fire = next_fire
+        self.run = run
+        self.next_run: Optional[float] = None
+        self.version = 0
+        self.running = False
+        # 연속 실패 횟수 (성공하면 0)
+        self.failures = 0
+        self.history: deque = deque(maxlen=20)
+
+
+class Scheduler:
+    # (다음 실행 시각, 버전, 이름) 힙. 예약이 바뀌면 버전을 올려 넣고 예전 항목은 꺼낼 때 버린다
+    # 다음 예정 시각과 실행 기록은 snapshot() 으로 저장하고, 재시작 시 지난 예정은 바로 따라잡는다
+    # (몇 번까지 따라잡을지는 각 작업의 next_fire 가 기준 시각으로 정한다)
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._saved: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+
+    def load(self, state: Optional[Dict[str, Any]]):
+        self._saved = dict((state or {}).get("jobs") or {})
+
+    def add(self, job: Job):
+        saved = self._saved.get(job.name) or {}
+        job.history.extend(saved.get("history") or [])
+        self.jobs[job.name] = job
+        self._schedule(job, saved.get("next_run"))
+
+    def _schedule(self, job: Job, hint: Optional[float] = None):
+        job.version += 1
+        job.next_run = job.next_fire(hint, time.time())
+        if job.next_run is not None:
+            heapq.heappush(self._heap, (job.next_run, job.version, job.name))
+        self.dirty = True
+        if self._wake is not None:
+            self._wake.set()
+
+    def reschedule(self, name: str):
+        # 설정(주기/활성화)이 바뀌었을 때 호출
+        job = self.jobs.get(name)
+        if job is not None and not job.running:
+            self._schedule(job)
+
+    def _pop_due(self, now: float) -> Tuple[Optional[Job], Optional[float]]:
+        while self._heap:
+            at, version, name = self._heap[0]
+            job = self.jobs.get(name)
+            if job is None or version != job.version:
+                heapq.heappop(self._heap)
+                continue
+            if at > now:
+                return None, at
+            heapq.heappop(self._heap)
+            return job, at
+        return None, None
+
+    async def _run_job(self, job: Job, slot: float):
+        job.running = True
+        started = time.time()
+        record: Dict[str, Any] = {"slot": datetime.fromtimestamp(slot).isoformat(),
+                                  "started": datetime.fromtimestamp(started).isoformat(),
+                                  "late_s": round(max(0.0, started - slot), 1)}
+        try:
+            result = await job.run(slot)
+            record["status"] = "ok"
+            job.failures = 0
+            if result is not None:
+                record["result"] = result
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)[:300]
+            job.failures += 1
+            print(f"[scheduler] job {job.name} failed ({job.failures}x): {e}")
+        finally:
+            record["duration_ms"] = round((time.time() - started) * 1000, 1)
+            job.history.append(record)
+            job.running = False
+        # 다음 예정은 작업이 갱신한 기준 시각(마지막 지급일 등)으로 다시 계산한다
+        self._schedule(job)
+        if record["status"] == "error" and job.next_run is not None and job.next_run <= time.time():
+            # 실패한 작업이 곧바로 다시 돌지 않도록 미룬다 (계속 실패하면 간격을 늘림)
+            job.version += 1
+            job.next_run = time.time() + min(RETRY_MAX, RETRY_BASE * 2 ** (job.failures - 1))
+            heapq.heappush(self._heap, (job.next_run, job.version, job.name))
+
+    async def run_forever(self):
+        self._wake = asyncio.Event()
+        while True:
+            now = time.time()
+            job, at = self._pop_due(now)
+            if job is not None:
+                await self._run_job(job, at)
+                continue
+            self._wake.clear()
+            timeout = MAX_SLEEP if at is None else min(MAX_SLEEP, max(0.0, at - now))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return {"jobs": {name: {"next_run": job.next_run, "history": list(job.history)}
+                         for name, job in self.jobs.items()}}
+
+    def stats(self) -> List[Dict[str, Any]]:
+        out = []
+        for name, job in self.jobs.items():
+            last = job.history[-1] if job.history else None
+            out.append({"name": name, "next_run": job.next_run, "running": job.running, "last": last,
+                        "runs": len(job.history)})
+        return out
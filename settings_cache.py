@@ -0,0 +1,109 @@
+import os
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, NamedTuple, Optional
+
+
+class FeeConfig(NamedTuple):
+    enabled: bool = False
+    min_amount: int = 0
+    fee_rate: float = 0.0
+
+    def fee_for(self, amount: int) -> int:
+        if not self.enabled or amount < self.min_amount:
+            return 0
+        return int(amount * self.fee_rate)
+
+
+class SettingsSnapshot(NamedTuple):
+    version: int
+    admin_ids: FrozenSet[int]
+    frozen_accounts: FrozenSet[str]
+    fee: FeeConfig
+    treasury_account: Optional[str]
+
+
+def _build(version: int, settings: Dict[str, Any], base_admin_ids: FrozenSet[int]) -> SettingsSnapshot:
+    extras = set()
+    for x in settings.get("extra_admin_ids", []) or []:
+        if str(x).isdigit():
+            extras.add(int(x))
+    fee = settings.get("transaction_fee") or {}
+    try:
+        fee_config = FeeConfig(bool(fee.get("enabled")), int(fee.get("min_amount", 0) or 0),
+                               float(fee.get("fee_rate", 0.0) or 0.0))
+    except (TypeError, ValueError):
+        fee_config = FeeConfig()
+    treasury = settings.get("treasury_account") or {}
+    return SettingsSnapshot(
+        version=version,
+        admin_ids=base_admin_ids | frozenset(extras),
+        frozen_accounts=frozenset(str(a) for a in (settings.get("frozen_accounts") or {})),
+        fee=fee_config,
+        treasury_account=treasury.get("account_number") if isinstance(treasury, dict) else None,
+    )
+
+
+class SettingsCache:
+    # admin_settings 에서 자주 쓰는 값(관리자/동결/수수료)을 버전별 스냅샷으로 만들어 둔다
+    # save_settings 때 invalidate(), 파일이 밖에서 바뀌면 read_external() 로 읽고 apply_external() 로 반영
+    def __init__(self, ledger, name: str = "settings", base_admin_ids: Iterable[int] = (),
+                 path: Optional[str] = None):
+        self.ledger = ledger
+        self.name = name
+        self.base_admin_ids = frozenset(int(x) for x in base_admin_ids)
+        self.path = path
+        self.version = 1
+        self.external_reloads = 0
+        self._snapshot: Optional[SettingsSnapshot] = None
+        self._lock = threading.Lock()
+        self._mtime = self._stat()
+
+    def _stat(self) -> Optional[float]:
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def snapshot(self) -> SettingsSnapshot:
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = _build(self.version, self.ledger.get(self.name), self.base_admin_ids)
+            return self._snapshot
+
+    def read_external(self) -> Optional[Dict[str, Any]]:
+        # 워커 스레드에서 주기적으로 호출. mtime 이 바뀌었을 때만 파일을 읽어서 돌려준다 (반영은 apply_external)
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        if self.name in self.ledger.dirty:
+            # 아직 기록하지 않은 변경이 있으면 메모리 쪽이 우선 (다음 flush 때 덮어씀)
+            return None
+        try:
+            return self.ledger.read(self.name)
+        except Exception as e:
+            print(f"[settings] external reload failed: {e}")
+            return None
+
+    def apply_external(self, value: Dict[str, Any]) -> bool:
+        # 이벤트 루프에서 호출. 읽는 사이에 메모리가 바뀌었으면 그쪽을 우선한다
+        if self.name in self.ledger.dirty or not self.ledger.replace(self.name, value):
+            return False
+        self.external_reloads += 1
+        self.invalidate()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self.snapshot()
+        return {"version": snap.version, "admins": len(snap.admin_ids), "frozen": len(snap.frozen_accounts),
+                "external_reloads": self.external_reloads}
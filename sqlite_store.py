@@ -0,0 +1,436 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    uid TEXT PRIMARY KEY,
+    account_number TEXT,
+    balance INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_number ON accounts(account_number);
+CREATE TABLE IF NOT EXISTS account_mapping (
+    account_number TEXT PRIMARY KEY,
+    user_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mapping_user ON account_mapping(user_id);
+CREATE TABLE IF NOT EXISTS public_accounts (
+    name TEXT PRIMARY KEY,
+    account_number TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_public_number ON public_accounts(account_number);
+CREATE TABLE IF NOT EXISTS roblox_links (
+    discord_id TEXT PRIMARY KEY,
+    roblox_user_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_links_roblox ON roblox_links(roblox_user_id);
+CREATE TABLE IF NOT EXISTS roblox_pending (
+    discord_id TEXT PRIMARY KEY,
+    code TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_code ON roblox_pending(code);
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    type TEXT,
+    from_user TEXT,
+    to_user TEXT,
+    amount INTEGER NOT NULL DEFAULT 0,
+    fee INTEGER NOT NULL DEFAULT 0,
+    memo TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tx_timestamp ON transactions(timestamp);
+CREATE INDEX IF NOT EXISTS idx_tx_from ON transactions(from_user, seq);
+CREATE INDEX IF NOT EXISTS idx_tx_to ON transactions(to_user, seq);
+CREATE TABLE IF NOT EXISTS kv (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+TX_COLUMNS = ("seq", "timestamp", "type", "from_user", "to_user", "amount", "fee", "memo")
+STATE_KEY = "ledger_state.json"
+# 저널 항목의 upserts 로 함께 갱신할 수 있는 kv 문서 (원장 이름 -> kv 이름)
+KV_UPSERT_DOCS = {"settings": "admin_settings.json", "idempotency": "idempotency.json"}
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class SqliteStore:
+    # Ledger 의 load/save 와 TransactionJournal 인터페이스를 함께 제공.
+    # 거래 행과 잔액 변경을 한 트랜잭션으로 커밋하므로 users 를 따로 flush 할 필요가 없다.
+    stores_rows = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        row = self.conn.execute("SELECT MAX(seq) FROM transactions").fetchone()
+        self.last_seq = int(row[0] or 0)
+        # 마지막으로 DB 와 맞춘 accounts 행 (uid -> (계좌번호, 잔액, data)). None 이면 아직 모름 -> 전체 다시 쓰기
+        self._saved_users: Optional[Dict[str, Tuple[Any, int, str]]] = None
+        # 저널 기록이 직접 바꾼 계좌번호. 다음 users 저장에서 스냅샷과 같아 보여도 다시 비교한다
+        self._appended_accounts: set = set()
+        # 건너뛴 행이 있어 users 를 한 번 더 저장해야 하는지 (Ledger.flush 가 보고 다시 dirty 로 둔다)
+        self.users_pending = False
+
+    # --- 문서 단위 load/save (파일 경로의 basename 으로 테이블을 고른다)
+    def load(self, path: str) -> Any:
+        name = os.path.basename(path)
+        with self._lock:
+            if name == "users.json":
+                out = {}
+                saved = {}
+                for uid, number, balance, data in self.conn.execute("SELECT uid, account_number, balance, data FROM accounts"):
+                    row = json.loads(data)
+                    row["잔액"] = int(balance)
+                    out[uid] = row
+                    saved[uid] = (number, int(balance), _dumps(row))
+                self._saved_users = saved
+                self._appended_accounts.clear()
+                return out
+            if name == "account_mapping.json":
+                return {acc: json.loads(d) for acc, d in self.conn.execute("SELECT account_number, data FROM account_mapping")}
+            if name == "public_accounts.json":
+                return {n: json.loads(d) for n, d in self.conn.execute("SELECT name, data FROM public_accounts")}
+            if name == "roblox_links.json":
+                return {
+                    "links": {k: json.loads(d) for k, d in self.conn.execute("SELECT discord_id, data FROM roblox_links")},
+                    "pending": {k: json.loads(d) for k, d in self.conn.execute("SELECT discord_id, data FROM roblox_pending")},
+                }
+            row = self.conn.execute("SELECT data FROM kv WHERE name=?", (name,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(path)
+            return json.loads(row[0])
+
+    def save(self, path: str, data: Any):
+        name = os.path.basename(path)
+        if name == "users.json" and self._saved_users is not None:
+            self._save_users(data)
+            return
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                self._save_locked(cur, name, data)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _save_users(self, data: Dict[str, Any]):
+        # io 워커에서 호출된다. 직렬화/비교는 락 밖에서 하고, 바뀐 행만 짧은 트랜잭션으로 쓴다
+        # (전체를 다시 쓰는 동안 이벤트 루프의 append_many 가 락에서 기다리지 않도록)
+        saved = self._saved_users
+        rows = {str(uid): (row.get("계좌번호"), int(row.get("잔액", 0)), _dumps(row))
+                for uid, row in list(data.items()) if isinstance(row, dict)}
+        # rows 를 읽은 뒤에 집합을 넘겨받는다. 그 전에 저널이 커밋한 계좌는 메모리 반영 전일 수 있어 쓰지 않는다
+        with self._lock:
+            appended, self._appended_accounts = self._appended_accounts, set()
+        changed = {uid: r for uid, r in rows.items() if saved.get(uid) != r}
+        removed = [uid for uid in saved if uid not in rows]
+        if not changed and not removed and not appended:
+            self.users_pending = False
+            return
+        with self._lock:
+            # 저널이 직접 쓴 계좌는 DB 쪽이 최신이다. 스냅샷에서 빼서 다음 저장 때 다시 비교한다
+            journaled = appended | self._appended_accounts
+            skipped = [uid for uid, r in rows.items() if str(r[0]) in journaled]
+            for uid in skipped:
+                changed.pop(uid, None)
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.executemany("DELETE FROM accounts WHERE uid=?", [(uid,) for uid in removed])
+                cur.executemany("INSERT OR REPLACE INTO accounts(uid, account_number, balance, data) VALUES (?,?,?,?)",
+                                [(uid, *r) for uid, r in changed.items()])
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                self._appended_accounts |= appended
+                raise
+            for uid in removed:
+                saved.pop(uid, None)
+            for uid in skipped:
+                saved.pop(uid, None)
+            saved.update(changed)
+            self.users_pending = bool(skipped)
+
+    def _save_locked(self, cur, name: str, data: Any):
+        if name == "users.json":
+            rows = {str(uid): (row.get("계좌번호"), int(row.get("잔액", 0)), _dumps(row))
+                    for uid, row in data.items() if isinstance(row, dict)}
+            cur.execute("DELETE FROM accounts")
+            cur.executemany("INSERT INTO accounts(uid, account_number, balance, data) VALUES (?,?,?,?)",
+                            [(uid, *r) for uid, r in rows.items()])
+            self._saved_users = rows
+            self._appended_accounts.clear()
+        elif name == "account_mapping.json":
+            cur.execute("DELETE FROM account_mapping")
+            cur.executemany(
+                "INSERT INTO account_mapping(account_number, user_id, data) VALUES (?,?,?)",
+                [(str(acc), str(e.get("user_id")), _dumps(e)) for acc, e in data.items() if isinstance(e, dict)])
+        elif name == "public_accounts.json":
+            cur.execute("DELETE FROM public_accounts")
+            cur.executemany(
+                "INSERT INTO public_accounts(name, account_number, data) VALUES (?,?,?)",
+                [(n, e.get("account_number"), _dumps(e)) for n, e in data.items() if isinstance(e, dict)])
+        elif name == "roblox_links.json":
+            cur.execute("DELETE FROM roblox_links")
+            cur.execute("DELETE FROM roblox_pending")
+            cur.executemany(
+                "INSERT INTO roblox_links(discord_id, roblox_user_id, data) VALUES (?,?,?)",
+                [(str(k), str(v.get("roblox_user_id")), _dumps(v)) for k, v in data.get("links", {}).items()])
+            cur.executemany(
+                "INSERT INTO roblox_pending(discord_id, code, data) VALUES (?,?,?)",
+                [(str(k), str(v.get("code")), _dumps(v)) for k, v in data.get("pending", {}).items()])
+        else:
+            cur.execute("INSERT OR REPLACE INTO kv(name, data) VALUES (?,?)", (name, _dumps(data)))
+
+    def put_link(self, kind: str, discord_id: str, data: Optional[Dict[str, Any]]):
+        # 연동/대기 코드 한 건만 바꾼다 (문서 전체를 다시 쓰지 않음)
+        with self._lock:
+            if kind == "links":
+                if data is None:
+                    self.conn.execute("DELETE FROM roblox_links WHERE discord_id=?", (str(discord_id),))
+                else:
+                    self.conn.execute("INSERT OR REPLACE INTO roblox_links(discord_id, roblox_user_id, data) VALUES (?,?,?)",
+                                      (str(discord_id), str(data.get("roblox_user_id")), _dumps(data)))
+            elif data is None:
+                self.conn.execute("DELETE FROM roblox_pending WHERE discord_id=?", (str(discord_id),))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO roblox_pending(discord_id, code, data) VALUES (?,?,?)",
+                                  (str(discord_id), str(data.get("code")), _dumps(data)))
+
+    def ensure(self, path: str, default: Any):
+        try:
+            self.load(path)
+        except FileNotFoundError:
+            self.save(path, default)
+
+    # --- TransactionJournal 호환 인터페이스
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not entries:
+            return entries
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self.last_seq
+                for entry in entries:
+                    seq += 1
+                    entry["seq"] = seq
+                    extra = {k: v for k, v in entry.items() if k not in TX_COLUMNS}
+                    cur.execute(
+                        "INSERT INTO transactions(seq, timestamp, type, from_user, to_user, amount, fee, memo, extra) "
+                        "VALUES (?,?,?,?,?,?,?,?,?)",
+                        (seq, entry.get("timestamp"), entry.get("type"), entry.get("from_user"), entry.get("to_user"),
+                         int(entry.get("amount", 0)), int(entry.get("fee", 0)), entry.get("memo", ""),
+                         _dumps(extra) if extra else None))
+                    self._apply_locked(cur, entry)
+                cur.execute("INSERT OR REPLACE INTO kv(name, data) VALUES (?,?)", (STATE_KEY, _dumps({"journal_seq": seq})))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                for entry in entries:
+                    entry.pop("seq", None)
+                raise
+            self.last_seq = seq
+        return entries
+
+    def _apply_locked(self, cur, entry: Dict[str, Any]):
+        upserts = entry.get("upserts") or {}
+        for uid, row in upserts.get("users", {}).items():
+            cur.execute("INSERT OR REPLACE INTO accounts(uid, account_number, balance, data) VALUES (?,?,?,?)",
+                        (str(uid), row.get("계좌번호"), int(row.get("잔액", 0)), _dumps(row)))
+            self._appended_accounts.add(str(row.get("계좌번호")))
+        for acc, e in upserts.get("account_mapping", {}).items():
+            cur.execute("INSERT OR REPLACE INTO account_mapping(account_number, user_id, data) VALUES (?,?,?)",
+                        (str(acc), str(e.get("user_id")), _dumps(e)))
+        for name, e in upserts.get("public_accounts", {}).items():
+            cur.execute("INSERT OR REPLACE INTO public_accounts(name, account_number, data) VALUES (?,?,?)",
+                        (name, e.get("account_number"), _dumps(e)))
+        for acc, bal in (entry.get("balances") or {}).items():
+            cur.execute("UPDATE accounts SET balance=? WHERE account_number=?", (int(bal), str(acc)))
+            self._appended_accounts.add(str(acc))
+        for doc, kv_name in KV_UPSERT_DOCS.items():
+            # 설정 문서의 일부 키(예: 월급 마지막 지급일)를 거래와 같은 트랜잭션에서 갱신
+            if doc in upserts:
+                row = cur.execute("SELECT data FROM kv WHERE name=?", (kv_name,)).fetchone()
+                data = json.loads(row[0]) if row else {}
+                data.update(upserts[doc])
+                cur.execute("INSERT OR REPLACE INTO kv(name, data) VALUES (?,?)", (kv_name, _dumps(data)))
+
+    def _row_to_entry(self, row) -> Dict[str, Any]:
+        entry = dict(zip(TX_COLUMNS, row[:8]))
+        if row[8]:
+            entry.update(json.loads(row[8]))
+        return entry
+
+    def iter(self, from_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        last = from_seq
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT seq, timestamp, type, from_user, to_user, amount, fee, memo, extra "
+                    "FROM transactions WHERE seq > ? ORDER BY seq LIMIT 1000", (last,)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_entry(row)
+            last = rows[-1][0]
+
+    def iter_range(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        # idx_tx_timestamp 를 (timestamp, seq) 키셋 페이지로 따라가므로 결과 크기만큼만 읽는다
+        lo = since.isoformat() if since else ""
+        hi = until.isoformat() if until else None
+        last_ts, last_seq = lo, -1
+        while True:
+            sql = ("SELECT seq, timestamp, type, from_user, to_user, amount, fee, memo, extra FROM transactions "
+                   "WHERE (timestamp, seq) > (?, ?)")
+            params: List[Any] = [last_ts, last_seq]
+            if hi is not None:
+                sql += " AND timestamp < ?"
+                params.append(hi)
+            sql += " ORDER BY timestamp, seq LIMIT 1000"
+            with self._lock:
+                rows = self.conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_entry(row)
+            last_ts, last_seq = rows[-1][1], rows[-1][0]
+
+    def count_range(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+        sql = "SELECT COUNT(*) FROM transactions WHERE timestamp >= ?"
+        params: List[Any] = [since.isoformat() if since else ""]
+        if until:
+            sql += " AND timestamp < ?"
+            params.append(until.isoformat())
+        with self._lock:
+            return int(self.conn.execute(sql, params).fetchone()[0])
+
+    def recent_for_account(self, account: str, limit: int,
+                           before_seq: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        # idx_tx_from / idx_tx_to 에서 각각 최근 limit+1 건만 읽어 합친다
+        bound = before_seq if before_seq is not None else (1 << 62)
+        cols = "seq, timestamp, type, from_user, to_user, amount, fee, memo, extra"
+        with self._lock:
+            rows = {}
+            for col in ("from_user", "to_user"):
+                for row in self.conn.execute(
+                        f"SELECT {cols} FROM transactions WHERE {col} = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                        (account, bound, limit + 1)):
+                    rows[row[0]] = row
+        ordered = [rows[seq] for seq in sorted(rows, reverse=True)]
+        return [self._row_to_entry(r) for r in ordered[:limit]], len(ordered) > limit
+
+    def count_for_account(self, account: str) -> int:
+        with self._lock:
+            return int(self.conn.execute(
+                "SELECT COUNT(*) FROM transactions WHERE from_user = ? OR to_user = ?", (account, account)).fetchone()[0])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        return {"segments": 1, "entries": count, "non_monotonic_segments": 0, "active_segment": os.path.basename(self.path)}
+
+    def sync(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            try:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except Exception:
+                pass
+            self.conn.close()
+
+
+def migrate_from_json(db_path: str, base_dir: str = ".", journal_dir: str = "journal") -> Dict[str, int]:
+    # JSON 파일/저널을 한 번에 SQLite 로 옮긴다. 이미 거래가 들어있는 DB 에는 실행하지 않는다.
+    store = SqliteStore(db_path)
+    if store.last_seq:
+        store.close()
+        raise RuntimeError(f"{db_path} 에 이미 거래 기록이 있습니다 (seq={store.last_seq})")
+
+    def _read(name, default):
+        path = os.path.join(base_dir, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    counts = {}
+    for name, default in (("users.json", {}), ("account_mapping.json", {}), ("public_accounts.json", {}),
+                          ("admin_settings.json", None), ("roblox_links.json", {"links": {}, "pending": {}}),
+                          ("roblox_apis.json", {"maps": {}})):
+        data = _read(name, default)
+        if data is None:
+            continue
+        store.save(name, data)
+        counts[name] = len(data)
+
+    from journal import TransactionJournal
+    jdir = os.path.join(base_dir, journal_dir)
+    if os.path.isdir(jdir) and os.listdir(jdir):
+        source = TransactionJournal(jdir).iter()
+        # users.json 이 반영하지 못한 저널 꼬리는 봇 시작 시 재생되도록 기존 seq 를 유지
+        covered = int(_read("ledger_state.json", {}).get("journal_seq", 0))
+    else:
+        source = iter(_read("transactions.json", []))
+        covered = None
+    # users.json 의 잔액이 이미 최종값이므로 거래 행만 옮기고 잔액은 건드리지 않는다
+    batch: List[Dict[str, Any]] = []
+    moved = 0
+    with store._lock:
+        cur = store.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        for entry in source:
+            moved += 1
+            entry = dict(entry)
+            entry["seq"] = seq = int(entry.get("seq") or moved)
+            extra = {k: v for k, v in entry.items() if k not in TX_COLUMNS}
+            batch.append((seq, entry.get("timestamp"), entry.get("type"), entry.get("from_user"), entry.get("to_user"),
+                          int(entry.get("amount", 0)), int(entry.get("fee", 0)), entry.get("memo", ""),
+                          _dumps(extra) if extra else None))
+            if len(batch) >= 5000:
+                cur.executemany("INSERT INTO transactions VALUES (?,?,?,?,?,?,?,?,?)", batch)
+                batch = []
+        if batch:
+            cur.executemany("INSERT INTO transactions VALUES (?,?,?,?,?,?,?,?,?)", batch)
+        last = cur.execute("SELECT MAX(seq) FROM transactions").fetchone()[0] or 0
+        cur.execute("INSERT OR REPLACE INTO kv(name, data) VALUES (?,?)",
+                    (STATE_KEY, _dumps({"journal_seq": last if covered is None else covered})))
+        cur.execute("COMMIT")
+    store.last_seq = last
+    counts["transactions"] = moved
+    store.close()
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("usage: python sqlite_store.py migrate [db_path]")
+        sys.exit(1)
+    db = sys.argv[2] if len(sys.argv) > 2 else os.environ.get("SQLITE_PATH", "ssibal.db")
+    print(migrate_from_json(db))
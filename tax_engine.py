@@ -0,0 +1,65 @@
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def plan_tax(users: Dict[str, Any], frozen: Iterable[str], rate: float) -> Dict[str, Any]:
+    # 전체 잔액을 배열 하나로 모아서 한 번에 계산한다. int(bal * rate) 와 같은 결과가 나오도록 0 쪽으로 버림
+    accounts: List[str] = []
+    balances: List[int] = []
+    frozen_set = set(frozen)
+    for data in users.values():
+        if not isinstance(data, dict) or data.get("공용계좌"):
+            continue
+        acc = data.get("계좌번호")
+        if acc is None or acc in frozen_set:
+            continue
+        accounts.append(str(acc))
+        balances.append(int(data.get("잔액", 0)))
+    bal = np.asarray(balances, dtype=np.int64)
+    amounts = np.trunc(bal.astype(np.float64) * float(rate)).astype(np.int64)
+    taxed = np.flatnonzero(amounts > 0)
+    return {
+        "rate": float(rate),
+        "eligible": len(accounts),
+        "accounts": [accounts[i] for i in taxed],
+        "amounts": amounts[taxed].tolist(),
+        "balances": bal[taxed].tolist(),
+        "count": int(taxed.size),
+        "total": int(amounts[taxed].sum()) if taxed.size else 0,
+        "balance_total": int(bal.sum()) if bal.size else 0,
+    }
+
+
+def tax_batch_items(plan: Dict[str, Any], name: str, treasury_acc: Optional[str],
+                    batch_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    # 배치 레코드 하나가 모든 차감과 국고 입금을 함께 담는다 (저널 한 줄이라 원자적으로 반영/재생됨)
+    # 뒤따르는 계좌별 항목은 거래내역/내보내기용 기록이라 잔액을 다시 바꾸지 않는다
+    batch_id = batch_id or uuid.uuid4().hex[:12]
+    deltas: Dict[str, int] = {}
+    for acc, amt in zip(plan["accounts"], plan["amounts"]):
+        deltas[acc] = deltas.get(acc, 0) - amt
+    if treasury_acc and plan["total"]:
+        deltas[treasury_acc] = deltas.get(treasury_acc, 0) + plan["total"]
+    items = [{
+        "type": f"{name} 일괄징수",
+        "from_user": "SYSTEM",
+        "to_user": treasury_acc or "TREASURY",
+        "amount": plan["total"],
+        "fee": 0,
+        "memo": f"{name} {plan['count']}계좌 징수",
+        "deltas": deltas,
+        "batch": {"id": batch_id, "kind": "tax", "role": "summary", "count": plan["count"], "rate": plan["rate"]},
+    }]
+    for acc, amt in zip(plan["accounts"], plan["amounts"]):
+        items.append({
+            "type": name,
+            "from_user": acc,
+            "to_user": "TREASURY",
+            "amount": amt,
+            "fee": 0,
+            "memo": f"{name} 징수",
+            "batch": {"id": batch_id, "kind": "tax", "role": "line"},
+        })
+    return items
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class TransferError(Exception):
+    pass
+
+
+class _Gate:
+    # 일반 송금은 shared, 세금/월급/CSV 처럼 전체 계좌를 건드리는 작업은 exclusive
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._exclusive_waiting = 0
+
+    async def acquire_shared(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._exclusive and not self._exclusive_waiting)
+            self._shared += 1
+
+    async def release_shared(self):
+        async with self._cond:
+            self._shared -= 1
+            self._cond.notify_all()
+
+    async def acquire_exclusive(self):
+        async with self._cond:
+            self._exclusive_waiting += 1
+            try:
+                await self._cond.wait_for(lambda: not self._exclusive and self._shared == 0)
+            finally:
+                self._exclusive_waiting -= 1
+            self._exclusive = True
+
+    async def release_exclusive(self):
+        async with self._cond:
+            self._exclusive = False
+            self._cond.notify_all()
+
+
+class TransferExecutor:
+    def __init__(self, sample_size: int = 512):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refs: Dict[str, int] = {}
+        self._gate = None
+        self.waiting = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.acquired = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits: deque = deque(maxlen=sample_size)
+
+    def _gate_obj(self) -> _Gate:
+        # asyncio 객체는 실행 중인 루프 안에서 만든다
+        if self._gate is None:
+            self._gate = _Gate()
+        return self._gate
+
+    def _ref(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._refs[key] = self._refs.get(key, 0) + 1
+        return lock
+
+    def _unref(self, key: str):
+        n = self._refs.get(key, 0) - 1
+        if n <= 0:
+            self._refs.pop(key, None)
+            self._locks.pop(key, None)
+        else:
+            self._refs[key] = n
+
+    def _record_wait(self, waited: float):
+        self.acquired += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.recent_waits.append(waited)
+
+    @asynccontextmanager
+    async def hold(self, accounts: Iterable[Any]):
+        # 항상 정렬된 순서로 잠가서 교착을 막는다
+        keys: List[str] = sorted({str(a) for a in accounts if a is not None})
+        gate = self._gate_obj()
+        self.submitted += 1
+        self.waiting += 1
+        started = time.perf_counter()
+        acquired: List[str] = []
+        gate_held = False
+        try:
+            await gate.acquire_shared()
+            gate_held = True
+            for key in keys:
+                lock = self._ref(key)
+                try:
+                    await lock.acquire()
+                except BaseException:
+                    self._unref(key)
+                    raise
+                acquired.append(key)
+        except BaseException:
+            self.waiting -= 1
+            self.failed += 1
+            for key in reversed(acquired):
+                self._locks[key].release()
+                self._unref(key)
+            if gate_held:
+                await gate.release_shared()
+            raise
+        self.waiting -= 1
+        self._record_wait(time.perf_counter() - started)
+        self.running += 1
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.running -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            for key in reversed(acquired):
+                self._locks[key].release()
+                self._unref(key)
+            await gate.release_shared()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        gate = self._gate_obj()
+        self.submitted += 1
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await gate.acquire_exclusive()
+        except BaseException:
+            self.waiting -= 1
+            self.failed += 1
+            raise
+        self.waiting -= 1
+        self._record_wait(time.perf_counter() - started)
+        self.running += 1
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.running -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            await gate.release_exclusive()
+
+    async def run(self, accounts: Iterable[Any], fn: Callable[[], Any]) -> Any:
+        async with self.hold(accounts):
+            result = fn()
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.recent_waits)
+
+        def pct(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(len(waits) * p))] * 1000
+
+        return {
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "locked_accounts": len(self._locks),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_avg_ms": (self.wait_total / self.acquired * 1000) if self.acquired else 0.0,
+            "wait_p50_ms": pct(0.50),
+            "wait_p95_ms": pct(0.95),
+            "wait_max_ms": self.wait_max * 1000,
+        }
@@ -0,0 +1,201 @@
+import json
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SIDECAR_SUFFIX = ".idx"
+_MAGIC = b"SSTX"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBxxxQQqq")  # magic, version, count, end_offset, first_seq, last_seq
+
+
+def ts_key(value: Any) -> float:
+    # 저널의 timestamp(ISO 문자열, 대부분 naive)를 비교용 epoch 초로 바꾼다
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except Exception:
+        return float("-inf")
+
+
+def partition_of(timestamp: Optional[str]) -> str:
+    # 월 단위 파티션 키 (예: "2026-10" -> "202610")
+    if not timestamp or len(timestamp) < 7:
+        return "000000"
+    return timestamp[:4] + timestamp[5:7]
+
+
+class SegmentIndex:
+    # 세그먼트 하나에 대한 (timestamp, 바이트 offset, 송금/수금 계좌) 목록. append 순서 그대로 유지한다
+    # 한 세그먼트의 seq 는 연속이므로 i 번째 항목의 seq 는 first_seq + i
+    def __init__(self, index: int, path: str):
+        self.index = index
+        self.path = path
+        self.ts = array("d")
+        self.off = array("Q")
+        self.frm = array("I")
+        self.to = array("I")
+        self.accounts: List[str] = []
+        self._account_ids: Dict[str, int] = {}
+        self.end = 0
+        self.first_seq = 0
+        self.last_seq = 0
+        self.min_ts = float("inf")
+        self.max_ts = float("-inf")
+        self.monotonic = True
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @property
+    def sidecar_path(self) -> str:
+        return self.path + SIDECAR_SUFFIX
+
+    def _account_id(self, account: Any) -> int:
+        key = "" if account is None else str(account)
+        i = self._account_ids.get(key)
+        if i is None:
+            i = self._account_ids[key] = len(self.accounts)
+            self.accounts.append(key)
+        return i
+
+    def add(self, ts: float, offset: int, end: int, seq: int, from_user: Any = None, to_user: Any = None):
+        if self.ts and ts < self.ts[-1]:
+            self.monotonic = False
+        self.ts.append(ts)
+        self.off.append(offset)
+        self.frm.append(self._account_id(from_user))
+        self.to.append(self._account_id(to_user))
+        self.end = end
+        if seq:
+            if not self.first_seq:
+                self.first_seq = seq
+            self.last_seq = seq
+        if ts < self.min_ts:
+            self.min_ts = ts
+        if ts > self.max_ts:
+            self.max_ts = ts
+
+    def scan(self):
+        with open(self.path, "rb") as f:
+            pos = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                entry = json.loads(line)
+                self.add(ts_key(entry.get("timestamp")), pos, pos + len(line), int(entry.get("seq", 0)),
+                         entry.get("from_user"), entry.get("to_user"))
+                pos += len(line)
+            self.end = pos
+
+    def save_sidecar(self):
+        tmp = self.sidecar_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(self.ts), self.end, self.first_seq, self.last_seq))
+            f.write(self.ts.tobytes())
+            f.write(self.off.tobytes())
+            f.write(self.frm.tobytes())
+            f.write(self.to.tobytes())
+            f.write(json.dumps(self.accounts, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        os.replace(tmp, self.sidecar_path)
+
+    def load_sidecar(self) -> bool:
+        try:
+            with open(self.sidecar_path, "rb") as f:
+                magic, version, count, end, first_seq, last_seq = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC or version != _VERSION or end != os.path.getsize(self.path):
+                    return False
+                ts = array("d")
+                ts.frombytes(f.read(8 * count))
+                off = array("Q")
+                off.frombytes(f.read(8 * count))
+                frm = array("I")
+                frm.frombytes(f.read(4 * count))
+                to = array("I")
+                to.frombytes(f.read(4 * count))
+                accounts = json.loads(f.read() or b"[]")
+        except (OSError, struct.error, ValueError):
+            return False
+        if len(ts) != count or len(off) != count or len(frm) != count or len(to) != count:
+            return False
+        self.ts, self.off, self.frm, self.to, self.end = ts, off, frm, to, end
+        self.accounts = accounts
+        self._account_ids = {a: i for i, a in enumerate(accounts)}
+        self.first_seq, self.last_seq = first_seq, last_seq
+        if count:
+            self.min_ts, self.max_ts = min(ts), max(ts)
+            self.monotonic = all(ts[i] <= ts[i + 1] for i in range(count - 1))
+        return True
+
+    def positions(self, lo: float, hi: float) -> Tuple[Sequence[int], bool]:
+        # [lo, hi) 구간에 드는 위치들. 단조 증가면 이분 탐색, 아니면 이 세그먼트만 훑는다
+        if not self.ts or self.max_ts < lo or self.min_ts >= hi:
+            return [], True
+        if self.monotonic:
+            a = bisect_left(self.ts, lo)
+            b = bisect_left(self.ts, hi)
+            return range(a, b), True
+        return [i for i, t in enumerate(self.ts) if lo <= t < hi], False
+
+    def byte_range(self, a: int, b: int) -> Tuple[int, int]:
+        start = self.off[a]
+        stop = self.off[b] if b < len(self.off) else self.end
+        return start, stop
+
+
+class PostingIndex:
+    # 계좌번호 -> 그 계좌가 등장한 거래 seq 목록 (오름차순). 최근 N건은 뒤에서 N개만 읽으면 된다
+    def __init__(self):
+        self.lists: Dict[str, array] = {}
+
+    def add(self, seq: int, from_user: Any, to_user: Any):
+        for account in (from_user, to_user):
+            if not account:
+                continue
+            postings = self.lists.get(account)
+            if postings is None:
+                postings = self.lists[account] = array("Q")
+            if not postings or postings[-1] != seq:
+                postings.append(seq)
+
+    def add_segment(self, si: "SegmentIndex"):
+        accounts = si.accounts
+        for i in range(len(si)):
+            self.add(si.first_seq + i, accounts[si.frm[i]], accounts[si.to[i]])
+
+    def count(self, account: str) -> int:
+        return len(self.lists.get(account, ()))
+
+    def page(self, account: str, limit: int, before_seq: Optional[int] = None) -> Tuple[List[int], bool]:
+        # before_seq 보다 오래된 최근 limit 건의 seq (최신순)와, 그보다 더 오래된 거래가 남았는지
+        postings = self.lists.get(account)
+        if not postings:
+            return [], False
+        stop = len(postings) if before_seq is None else bisect_left(postings, before_seq)
+        start = max(0, stop - limit)
+        return [postings[i] for i in range(stop - 1, start - 1, -1)], start > 0
+
+
+def load_segment_index(index: int, path: str, sealed: bool) -> SegmentIndex:
+    si = SegmentIndex(index, path)
+    if sealed and si.load_sidecar():
+        return si
+    si.scan()
+    if sealed:
+        try:
+            si.save_sidecar()
+        except OSError as e:
+            print(f"[tx_index] sidecar write failed {path}: {e}")
+    return si
+
+
+def index_stats(indexes: Dict[int, SegmentIndex]) -> Dict[str, Any]:
+    return {
+        "segments": len(indexes),
+        "entries": sum(len(si) for si in indexes.values()),
+        "non_monotonic_segments": sum(1 for si in indexes.values() if not si.monotonic),
+    }
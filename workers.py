@@ -0,0 +1,70 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class WorkerQueueFull(Exception):
+    pass
+
+
+class _Lane:
+    def __init__(self, name: str, executor: Executor, max_pending: int):
+        self.name = name
+        self.executor = executor
+        self.max_pending = max(1, int(max_pending))
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    async def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        # 큐가 가득 차면 기다리지 않고 바로 거절해서 호출한 명령이 "바쁨" 응답을 줄 수 있게 한다
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise WorkerQueueFull(self.name)
+        self.pending += 1
+        self.submitted += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self.pending, "max_pending": self.max_pending, "submitted": self.submitted,
+                "rejected": self.rejected, "failed": self.failed}
+
+
+class Workers:
+    # io: 디스크 읽기/쓰기, report: pandas/openpyxl 같은 CPU 작업 (process 모드면 별도 프로세스)
+    def __init__(self, io_threads: int = 4, report_workers: int = 2, max_pending: int = 64,
+                 report_mode: str = "thread"):
+        self.io = _Lane("io", ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="ssibal-io"), max_pending)
+        self.report_in_process = report_mode == "process"
+        if self.report_in_process:
+            report_executor: Executor = ProcessPoolExecutor(max_workers=report_workers)
+        else:
+            report_executor = ThreadPoolExecutor(max_workers=report_workers, thread_name_prefix="ssibal-report")
+        self.report = _Lane("report", report_executor, max(1, max_pending // 4))
+
+    async def run_io(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.io.submit(fn, *args, **kwargs)
+
+    async def run_report(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.report.submit(fn, *args, **kwargs)
+
+    async def run_streaming(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        # 제너레이터나 파일 버퍼를 주고받는 작업은 프로세스 경계를 넘을 수 없으므로 스레드 레인에서 실행
+        lane = self.io if self.report_in_process else self.report
+        return await lane.submit(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"io": self.io.stats(), "report": self.report.stats()}
+
+    def shutdown(self):
+        self.io.executor.shutdown(wait=True)
+        self.report.executor.shutdown(wait=False, cancel_futures=True)